@@ -1,18 +1,28 @@
 import copy
 import json
+import threading
 from datetime import datetime
 from logging import getLogger
-from typing import Dict, List
+from typing import Dict, Iterable, List
 
 from benedict import benedict
-from fireREST import FMC
 from fireREST.mapping import ICMP_TYPE, IP_PROTOCOL, STATE
 from fireREST.exceptions import GenericApiError
 from openpyxl import Workbook
 from openpyxl.styles import Alignment, Font, PatternFill
 
 from firecli.api.afa import AFA
+from firecli.api.cache import FmcCache
 from firecli.api.compliance import ZoneCompliance
+from firecli.api.fmc import FMC, TokenStore
+from firecli.api.session import (
+    DEFAULT_RATE,
+    MemoizingSession,
+    ResponseMemo,
+    SessionPool,
+    ThrottledSession,
+    rate_limiter,
+)
 
 logger = getLogger(__name__)
 
@@ -21,42 +31,155 @@ class API(object):
     def __init__(self, cfg: Dict):
         self.cfg = cfg
         self._afa = None
+        self._cache = None
         self._fmc = None
+        self._lock = threading.Lock()
 
     @property
     def fmc(self):
-        if not self._fmc:
-            self._fmc = FMC(
-                hostname=self.cfg['fmc']['hostname'],
-                username=self.cfg['fmc']['username'],
-                password=self.cfg['fmc']['password'],
-                domain=self.cfg['fmc']['domain'],
-                timeout=self.cfg['fmc']['timeout'],
-                dry_run=self.cfg['dry_run'],
-            )
+        with self._lock:
+            if not self._fmc:
+                token_store = TokenStore(self.cfg['cache_dir']) if self.cfg['fmc'].get('persist_token') else None
+                self._fmc = FMC(
+                    hostname=self.cfg['fmc']['hostname'],
+                    username=self.cfg['fmc']['username'],
+                    password=self.cfg['fmc']['password'],
+                    protocol=self.cfg['fmc'].get('protocol', 'https'),
+                    verify_cert=self.cfg['fmc'].get('verify_cert', False),
+                    domain=self.cfg['fmc']['domain'],
+                    timeout=self.cfg['fmc']['timeout'],
+                    dry_run=self.cfg['dry_run'],
+                    token_store=token_store,
+                    session=self.fmc_sessions(),
+                    concurrency=self.cfg['fmc'].get('concurrency', 1),
+                )
         return self._fmc
 
+    def fmc_sessions(self):
+        """Pool of per-thread fmc sessions that share the rate limiter and memoized responses
+        """
+        limiter = self.limiter('fmc')
+        max_age = self.cfg['fmc'].get('memoize_max_age', 60)
+        if max_age:
+            memo = ResponseMemo(max_age=max_age)
+            return SessionPool(lambda: MemoizingSession(limiter=limiter, memo=memo))
+        return SessionPool(lambda: ThrottledSession(limiter))
+
+    def limiter(self, name: str):
+        """Process-wide rate limiter of the `fmc` or `afa` appliance, None if `rate_limit` is disabled
+        """
+        rate = self.cfg[name].get('rate_limit', DEFAULT_RATE)
+        if not rate:
+            return None
+        return rate_limiter(self.cfg[name]['hostname'], rate=rate)
+
+    def log_stats(self):
+        """Log how many fmc api GET requests were answered by memoized responses and how often requests were
+        throttled
+        """
+        for name, client in (('fmc', self._fmc and self._fmc.conn), ('afa', self._afa)):
+            limiter = getattr(getattr(client, 'session', None), 'limiter', None)
+            if limiter is not None:
+                logger.debug(
+                    'Rate limited %s api requests: %s requests, %s throttled, %.1f seconds waited',
+                    name,
+                    limiter.stats['requests'],
+                    limiter.stats['throttled'],
+                    limiter.stats['waited'],
+                )
+        stats = getattr(self._fmc.conn.session, 'stats', None) if self._fmc else None
+        if stats is not None:
+            logger.debug(
+                'Memoized fmc api responses: %s hits, %s misses, %s invalidations',
+                stats['hits'],
+                stats['misses'],
+                stats['invalidations'],
+            )
+
     @property
     def afa(self):
-        if not self._afa:
-            self._afa = AFA(
-                hostname=self.cfg['afa']['hostname'],
-                username=self.cfg['afa']['username'],
-                password=self.cfg['afa']['password'],
-                timeout=self.cfg['afa']['timeout'],
-            )
+        with self._lock:
+            if not self._afa:
+                limiter = self.limiter('afa')
+                self._afa = AFA(
+                    hostname=self.cfg['afa']['hostname'],
+                    username=self.cfg['afa']['username'],
+                    password=self.cfg['afa']['password'],
+                    protocol=self.cfg['afa'].get('protocol', 'https'),
+                    verify_cert=self.cfg['afa'].get('verify_cert', False),
+                    timeout=self.cfg['afa']['timeout'],
+                    session=SessionPool(lambda: ThrottledSession(limiter)),
+                )
         return self._afa
 
+    @property
+    def cache(self):
+        if not self._cache:
+            self._cache = FmcCache.from_cfg(self.cfg)
+            self._cache.load()
+        return self._cache
+
+    def cached(self, name: str):
+        """Get fmc cache if cached type `name` (e.g. accesspolicy) was downloaded within `cache_max_age` seconds.
+        Returns None if the type is not cached, stale or cache reads are disabled, so callers can fall back to the
+        live api
+        """
+        max_age = self.cfg.get('cache_max_age') or 0
+        if max_age <= 0:
+            return None
+        if self.cache.fresh(name, max_age):
+            logger.debug('Reading %s from cache', name)
+            return self.cache
+        logger.debug('Cached %s is missing or older than %s seconds. Reading from api', name, max_age)
+        return None
+
+    def cached_get(self, name: str, uuid=None, item_name=None):
+        """Get item of cached type `name` by id or name from cache if it is fresh enough
+
+        :return: copy of cached item as returned by the api or None if item is not cached or stale
+        """
+        cache = self.cached(name)
+        if cache is None:
+            return None
+        subcache = cache.subcache(name)
+        item = subcache.get(uuid) if uuid else subcache.get_by_name(name, item_name)
+        return copy.deepcopy(subcache.api_item(item)) if item is not None else None
+
+    def cached_items(self, name: str):
+        """Get all items of cached type `name` from cache if it is fresh enough
+
+        :return: copy of cached items or None if type is not cached or stale
+        """
+        cache = self.cached(name)
+        if cache is None:
+            return None
+        items = cache.subcache(name).items(name)
+        return copy.deepcopy(items) if items is not None else None
+
+    def cached_device_config(self, name: str, device_id: str):
+        """Get configuration of type `name` (e.g. ipv4staticroute, subinterface) of a device from cache if it is
+        fresh enough
+
+        :return: copy of cached configuration or None if configuration is not cached or stale
+        """
+        cache = self.cached(name)
+        if cache is None:
+            return None
+        items = cache.subcache(name).device_config(name, device_id)
+        return copy.deepcopy(items) if items is not None else None
+
     @staticmethod
-    def filtered_accessrules(policy_id: str, accessrules: List, policy_filter: str):
+    def filtered_accessrules(policy_id: str, accessrules: Iterable, policy_filter: str):
+        """Filter inherited (parent) or own (child) accessrules of a policy. Accessrules are filtered lazily
+        """
         if policy_filter == 'parent':
-            return [
+            return (
                 accessrule for accessrule in accessrules if accessrule['metadata']['accessPolicy']['id'] != policy_id
-            ]
+            )
         if policy_filter == 'child':
-            return [
+            return (
                 accessrule for accessrule in accessrules if accessrule['metadata']['accessPolicy']['id'] == policy_id
-            ]
+            )
         return accessrules
 
     @staticmethod
@@ -538,9 +661,12 @@ class API(object):
         return diff
 
     def sync_device_subinterfaces(self, src_device_id: str, dst_device_id: str, dry_run=False):
-        """Synchronize the subinterface configuration between two ftd ha pairs
+        """Synchronize the subinterface configuration between two ftd ha pairs. Source configuration is read from
+        cache if it is fresh enough, destination configuration is always read from fmc
         """
-        src_interfaces = self.fmc.device.devicerecord.subinterface.get(container_uuid=src_device_id)
+        src_interfaces = self.cached_device_config('subinterface', src_device_id)
+        if src_interfaces is None:
+            src_interfaces = self.fmc.device.devicerecord.subinterface.get(container_uuid=src_device_id)
         dst_interfaces = self.fmc.device.devicerecord.subinterface.get(container_uuid=dst_device_id)
         diff = self.get_subinterface_diff(src_interfaces, dst_interfaces)
         if not self.diff_empty(diff):
@@ -609,9 +735,12 @@ class API(object):
             logger.info('Monitored interface configuration is in sync. Skipping synchronization')
 
     def sync_device_staticroutes(self, src_device_id: str, dst_device_id: str, dry_run=False):
-        """Synchronize the static routing configuration between two ftd ha pairs
+        """Synchronize the static routing configuration between two ftd ha pairs. Source configuration is read from
+        cache if it is fresh enough, destination configuration is always read from fmc
         """
-        src = self.fmc.device.devicerecord.routing.ipv4staticroute.get(container_uuid=src_device_id)
+        src = self.cached_device_config('ipv4staticroute', src_device_id)
+        if src is None:
+            src = self.fmc.device.devicerecord.routing.ipv4staticroute.get(container_uuid=src_device_id)
         dst = self.fmc.device.devicerecord.routing.ipv4staticroute.get(container_uuid=dst_device_id)
         diff = self.get_staticroute_diff(src, dst)
         if not self.diff_empty(diff):
@@ -710,35 +839,48 @@ class API(object):
             logger.info('Successfully scheduled configuration deployment')
 
     def expanded_accessrules(self, accessrules, objects, device):
-        accessrules = [benedict(accessrule) for accessrule in accessrules]
-        for accessrule in accessrules:
-            if 'sourceNetworks.objects' in accessrule:
-                for k, v in enumerate(accessrule['sourceNetworks']['objects']):
-                    accessrule['sourceNetworks']['objects'][k] = self.expanded_obj(v, objects, device)
-            if 'destinationNetworks.objects' in accessrule:
-                for k, v in enumerate(accessrule['destinationNetworks']['objects']):
-                    accessrule['destinationNetworks']['objects'][k] = self.expanded_obj(v, objects, device)
-            if 'sourcePorts.objects' in accessrule:
-                for k, v in enumerate(accessrule['sourcePorts']['objects']):
-                    accessrule['sourcePorts']['objects'][k] = self.expanded_obj(v, objects, device)
-            if 'destinationPorts.objects' in accessrule:
-                for k, v in enumerate(accessrule['destinationPorts']['objects']):
-                    accessrule['destinationPorts']['objects'][k] = self.expanded_obj(v, objects, device)
-            if 'urls.objects' in accessrule:
-                for k, v in enumerate(accessrule['urls']['objects']):
-                    accessrule['urls']['objects'][k] = self.expanded_obj(v, objects, device)
-        return accessrules
+        """Replace object references in accessrules with the cached objects including device overrides
 
-    def expanded_obj(self, obj: Dict, objects: Dict, device: str):
-        for item in objects[obj['type'].lower()]:
-            if item['id'] == obj['id']:
-                if 'group' not in obj['type'].lower():
-                    return self.override_obj(item, device)
-                else:
-                    obj = self.override_obj(item, device)
-                    if 'objects' in obj:
-                        for nested_obj_id, nested_obj in enumerate(obj['objects']):
-                            obj['objects'][nested_obj_id] = self.expanded_obj(nested_obj, objects, device)
+        :param objects: object cache that is used to lookup referenced objects
+        :type objects: firecli.api.cache.ObjectCache
+        """
+        return [self.expanded_accessrule(accessrule, objects, device) for accessrule in accessrules]
+
+    def iter_expanded_accessrules(self, accessrules: Iterable, objects, device: str):
+        """Same as `expanded_accessrules`, but expands one accessrule at a time while `accessrules` is iterated
+        """
+        for accessrule in accessrules:
+            yield self.expanded_accessrule(accessrule, objects, device)
+
+    def expanded_accessrule(self, accessrule: Dict, objects, device: str):
+        accessrule = benedict(accessrule)
+        if 'sourceNetworks.objects' in accessrule:
+            for k, v in enumerate(accessrule['sourceNetworks']['objects']):
+                accessrule['sourceNetworks']['objects'][k] = self.expanded_obj(v, objects, device)
+        if 'destinationNetworks.objects' in accessrule:
+            for k, v in enumerate(accessrule['destinationNetworks']['objects']):
+                accessrule['destinationNetworks']['objects'][k] = self.expanded_obj(v, objects, device)
+        if 'sourcePorts.objects' in accessrule:
+            for k, v in enumerate(accessrule['sourcePorts']['objects']):
+                accessrule['sourcePorts']['objects'][k] = self.expanded_obj(v, objects, device)
+        if 'destinationPorts.objects' in accessrule:
+            for k, v in enumerate(accessrule['destinationPorts']['objects']):
+                accessrule['destinationPorts']['objects'][k] = self.expanded_obj(v, objects, device)
+        if 'urls.objects' in accessrule:
+            for k, v in enumerate(accessrule['urls']['objects']):
+                accessrule['urls']['objects'][k] = self.expanded_obj(v, objects, device)
+        return accessrule
+
+    def expanded_obj(self, obj: Dict, objects, device: str):
+        item = objects.get(obj['id'])
+        if item is None:
+            return obj
+        if 'group' not in obj['type'].lower():
+            return self.override_obj(item, device)
+        obj = self.override_obj(item, device)
+        if 'objects' in obj:
+            for nested_obj_id, nested_obj in enumerate(obj['objects']):
+                obj['objects'][nested_obj_id] = self.expanded_obj(nested_obj, objects, device)
         return obj
 
     @staticmethod
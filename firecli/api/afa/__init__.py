@@ -1,5 +1,7 @@
 import json
 import logging
+import threading
+import time
 from http.client import responses as http_responses
 from typing import Dict, Union
 from urllib.parse import urlencode
@@ -12,12 +14,30 @@ from requests.auth import HTTPBasicAuth
 logger = logging.getLogger(__name__)
 logger.addHandler(logging.NullHandler())
 
+# http methods that are sent again if the request failed
+IDEMPOTENT_METHODS = {'get', 'put', 'delete'}
+# status codes of responses to idempotent requests that are sent again
+RETRY_STATUS = {500, 502, 503, 504}
 
-class AFA:
 
-    """API Connection object used to interact with AlgoSec Firewall Analyzer REST API"""
+class AFA:
 
-    def __init__(self, hostname: str, username: str, password: str, protocol='https', verify_cert=False, timeout=120):
+    """API Connection object used to interact with AlgoSec Firewall Analyzer REST API. Authentication happens on the
+    first request and again once the session expired"""
+
+    def __init__(
+        self,
+        hostname: str,
+        username: str,
+        password: str,
+        protocol='https',
+        verify_cert=False,
+        timeout=120,
+        session: requests.Session = None,
+        retries=3,
+        backoff=1.0,
+        pool_size=10,
+    ):
         """Initialize connection object. It is highly recommended to use a
         dedicated user for api operations
 
@@ -33,6 +53,16 @@ class AFA:
         :type verify_cert: bool, optional
         :param timeout: timeout value for http requests. Defaults to `120` seconds
         :type timeout: int, optional
+        :param session: session used for http requests, e.g. a `firecli.api.session.ThrottledSession`. Defaults to a
+                        new `requests.Session` that keeps up to `pool_size` connections alive
+        :type session: requests.Session, optional
+        :param retries: number of times idempotent requests are sent again after connection errors and server
+                        errors. Defaults to `3`
+        :type retries: int, optional
+        :param backoff: seconds to wait before the first retry, doubled for each further retry. Defaults to `1.0`
+        :type backoff: float, optional
+        :param pool_size: number of connections kept alive for parallel requests. Defaults to `10`
+        :type pool_size: int, optional
         """
         if not verify_cert:
             urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
@@ -41,11 +71,60 @@ class AFA:
         self.protocol = protocol
         self.username = username
         self.password = password
-        self.session = requests.Session()
+        if session is None:
+            session = requests.Session()
+            session.mount(f'{protocol}://', requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+        self.session = session
         self.token = None
         self.timeout = timeout
         self.verify_cert = verify_cert
-        self.login()
+        self.retries = retries
+        self.backoff = backoff
+        self.sleep = time.sleep
+        self._auth_lock = threading.Lock()
+
+    def _session_token(self):
+        """Current session token. Authenticates if there is no session yet
+        """
+        with self._auth_lock:
+            if self.token is None:
+                self.login()
+            return self.token
+
+    def _expire(self, token: str):
+        # requests of other threads may have failed with the same token, but only the first one discards it
+        with self._auth_lock:
+            if self.token == token:
+                self.token = None
+
+    def _send(self, method: str, url: str, params: Dict, token: str, auth=None, data=None):
+        return self.session.request(
+            method=method,
+            url=url,
+            params={**params, 'session': token},
+            data=json.dumps(data),
+            auth=auth,
+            headers=self.headers,
+            timeout=self.timeout,
+            verify=self.verify_cert,
+        )
+
+    def _log(self, method: str, url: str, params: Dict, data, response: requests.Response):
+        level = logging.ERROR if response.status_code >= 400 else logging.INFO
+        if logger.isEnabledFor(level):
+            msg = {
+                'method': method.upper(),
+                'url': url,
+                'params': urlencode(params) if params else '',
+                'data': data if data else '',
+                'status': f'{http_responses[response.status_code]} ({response.status_code})',
+            }
+            logger.log(level, '\n%s', json.dumps(msg, indent=4))
+        if level == logging.INFO and logger.isEnabledFor(logging.DEBUG):
+            try:
+                logger.debug('\n"response": %s', json.dumps(response.json(), sort_keys=True, indent=4))
+            except json.JSONDecodeError:
+                pass
 
     def _request(self, method: str, url: str, params=None, auth=None, data=None):
         """Base operation used for all http api calls
@@ -63,39 +142,39 @@ class AFA:
         :return: api response
         :rtype: requests.Response
         """
-        if not params:
-            params = {}
-        if self.token:
-            params['session'] = self.token
-
-        response = self.session.request(
-            method=method,
-            url=url,
-            params=params,
-            data=json.dumps(data),
-            auth=auth,
-            headers=self.headers,
-            timeout=self.timeout,
-            verify=self.verify_cert,
-        )
-        msg = {
-            'method': method.upper(),
-            'url': url,
-            'params': urlencode(params) if params else '',
-            'data': data if data else '',
-            'status': f'{http_responses[response.status_code]} ({response.status_code})',
-        }
-        if response.status_code >= 400:
-            logger.error('\n%s', json.dumps(msg, indent=4))
-        else:
-            logger.info('\n%s', json.dumps(msg, indent=4))
+        params = dict(params) if params else {}
+        idempotent = method.lower() in IDEMPOTENT_METHODS
+        reauthenticated = False
+        attempt = 0
+        while True:
+            token = self._session_token()
             try:
-                logger.debug('\n"response": %s', json.dumps(response.json(), sort_keys=True, indent=4))
-            except json.JSONDecodeError:
-                pass
-
+                response = self._send(method, url, params, token, auth=auth, data=data)
+            except (requests.ConnectionError, requests.Timeout) as exc:
+                if not idempotent or attempt >= self.retries:
+                    raise
+                self._retry(attempt, method, url, exc)
+                attempt += 1
+                continue
+            if response.status_code == 401 and not reauthenticated:
+                logger.info('Session of AlgoSec Appliance (%s) expired. Authenticating again', self.hostname)
+                self._expire(token)
+                reauthenticated = True
+                continue
+            if response.status_code in RETRY_STATUS and idempotent and attempt < self.retries:
+                self._retry(attempt, method, url, response.status_code)
+                attempt += 1
+                continue
+            break
+
+        self._log(method, url, params, data, response)
         return response
 
+    def _retry(self, attempt: int, method: str, url: str, reason):
+        delay = self.backoff * 2 ** attempt
+        logger.warning('%s %s failed (%s). Retrying in %.1f seconds', method.upper(), url, reason, delay)
+        self.sleep(delay)
+
     def get(self, url: str, params=None, _items=None):
         """GET operation
 
@@ -169,6 +248,6 @@ class AFA:
     def get_risky_rules(self, device: str):
         """Get risky rules of latest risk report in json format
         """
-        url = f'https://{self.hostname}/fa/server/risks/riskyRules'
+        url = f'{self.protocol}://{self.hostname}/fa/server/risks/riskyRules'
         params = {'entity': device, 'entityType': 'device', 'responseType': 'json'}
         return self.get(url=url, params=params)
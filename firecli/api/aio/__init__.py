@@ -0,0 +1,94 @@
+import asyncio
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from logging import getLogger
+from typing import Awaitable, Callable, Iterable
+
+from fireREST import FMC
+
+logger = getLogger(__name__)
+
+# requests that are in flight at the same time unless configured otherwise
+DEFAULT_CONCURRENCY = 8
+
+
+class AsyncResource(object):
+    """Awaitable view of a fireREST namespace or resource. Methods of the wrapped object return coroutines, e.g.
+    `await aio.object.host.override.get(container_uuid=uuid)`. Child resources are wrapped as well
+    """
+
+    def __init__(self, client, wrapped):
+        self._client = client
+        self._wrapped = wrapped
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._wrapped, name)
+        if callable(attr):
+            return partial(self._client.call, attr)
+        if hasattr(attr, 'get'):
+            return AsyncResource(self._client, attr)
+        return attr
+
+
+class AsyncFMC(object):
+    """asyncio interface to an `FMC` for bulk operations that send many independent requests. Requests use the
+    resources, pagination and authentication of `fmc` and are sent from a thread pool, so at most `concurrency`
+    requests are in flight at the same time. Requests still pass through the rate limiter of the fmc session
+    """
+
+    def __init__(self, fmc: FMC, concurrency=DEFAULT_CONCURRENCY):
+        self.fmc = fmc
+        self.concurrency = max(concurrency, 1)
+        self._executor = None
+        self._semaphores = weakref.WeakKeyDictionary()
+
+    def __getattr__(self, name: str):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return AsyncResource(self, getattr(self.fmc, name))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='firecli-aio')
+        return self._executor
+
+    def _semaphore(self):
+        loop = asyncio.get_running_loop()
+        if loop not in self._semaphores:
+            self._semaphores[loop] = asyncio.Semaphore(self.concurrency)
+        return self._semaphores[loop]
+
+    async def call(self, func: Callable, *args, **kwargs):
+        """Call the blocking function `func` without blocking the event loop
+        """
+        async with self._semaphore():
+            return await asyncio.get_running_loop().run_in_executor(self.executor, partial(func, *args, **kwargs))
+
+    def run(self, coroutine: Awaitable):
+        """Run `coroutine` from synchronous code and return its result
+        """
+        return asyncio.run(coroutine)
+
+    def map(self, func: Callable, items: Iterable):
+        """Call the blocking function `func` for each item concurrently
+
+        :return: list of results in the order of `items`
+        """
+
+        async def gather():
+            return await asyncio.gather(*(self.call(func, item) for item in items))
+
+        return self.run(gather())
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
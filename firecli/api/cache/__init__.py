@@ -1,18 +1,181 @@
+import hashlib
 import json
+from abc import ABC, abstractmethod
+from collections.abc import MutableMapping
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from datetime import datetime
+from functools import partial, reduce
+from itertools import islice
 from logging import getLogger
 from pathlib import Path
+from typing import Dict, Iterator
 
 from fireREST import FMC
+from fireREST.exceptions import GenericApiError, ResourceNotFoundError
+
+from firecli.api.cache.audit import AUDIT_MARGIN, AuditChanges
+from firecli.api.cache.snapshot import SnapshotStore
+from firecli.api.cache.store import STORES, Checkpoint, cache_root
+from firecli.api.override import PER_TARGET, grouped_overrides, override_strategy, override_targets, target_overrides
 
 logger = getLogger()
 
+OBJECT_TYPES = [
+    'country',
+    'fqdn',
+    'host',
+    'icmpv4object',
+    'icmpv6object',
+    'network',
+    'networkgroup',
+    'range',
+    'protocolportobject',
+    'portobjectgroup',
+    'url',
+    'urlgroup',
+    'vlantag',
+    'vlangrouptag',
+]
+OVERRIDABLE_OBJECT_TYPES = ['host', 'range', 'network', 'networkgroup']
+POLICY_TYPES = ['accesspolicy', 'prefilterpolicy']
+# fireREST resource of each cached device type
+DEVICE_TYPES = {
+    'devicerecord': 'device.devicerecord',
+    'ftdhapair': 'devicehapair.ftdhapair',
+    'policyassignment': 'assignment.policyassignment',
+}
+# fireREST resource of configuration that is downloaded separately for each device record
+DEVICE_CONFIG_TYPES = {
+    'ipv4staticroute': 'device.devicerecord.routing.ipv4staticroute',
+    'subinterface': 'device.devicerecord.subinterface',
+}
+
+
+def resource(fmc: FMC, path: str):
+    """Resolve dotted resource path (e.g. device.devicerecord) to fireREST resource
+    """
+    return reduce(getattr, path.split('.'), fmc)
+
+
+def audit_changes(fmc: FMC, since: datetime, until: datetime):
+    """Read changes between `since` and `until` from the fmc audit log. The log is read AUDIT_MARGIN seconds before
+    `since` to compensate clock differences between firecli and fmc
+
+    :return: AuditChanges and number of audit records that were read
+    """
+    records = fmc.audit.auditrecord.get(
+        params={'starttime': int(since.timestamp()) - AUDIT_MARGIN, 'endtime': int(until.timestamp())}
+    )
+    return AuditChanges.from_records(records), len(records)
+
+
+class LazyCache(MutableMapping):
+    """Mapping of cached types that reads each type from the store on first access. Types are only read from the
+    generation that was loaded. If another process saved a new generation in the meantime, `changed` is called
+    before the type is read. It must `reset` the mapping and reload the index, so lookups never mix generations
+    """
+
+    def __init__(self, store, changed=None):
+        self.store = store
+        self.changed = changed
+        self.reset()
+
+    def reset(self):
+        """Discard types that have been read and switch to the generation that is currently saved
+        """
+        with self.store.lock(shared=True):
+            self.names = self.store.names()
+            self.generation = self.store.generation()
+        self.data = dict()
+
+    def sync(self):
+        """Switch to the currently saved generation if another process saved the cache since it was loaded. Callers
+        hold the store lock until they have read from the new generation
+
+        :return: True if a new generation was loaded
+        """
+        generation = self.store.generation()
+        if generation == self.generation:
+            return False
+        logger.info(
+            'Cache in %s was updated since it was loaded (generation %s -> %s). Reloading cache',
+            self.store.directory,
+            self.generation,
+            generation,
+        )
+        if self.changed is not None:
+            self.changed()
+        if self.generation != generation:
+            self.reset()
+        return True
+
+    def __getitem__(self, name: str):
+        if name not in self.data:
+            with self.store.lock(shared=True):
+                self.sync()
+                if name not in self.names:
+                    raise KeyError(name)
+                self.data[name] = self.store.read(name)
+        return self.data[name]
+
+    def read_all(self):
+        """Read all types that have not been read yet from the same generation
+
+        :return: dict of type name and cached items
+        """
+        with self.store.lock(shared=True):
+            self.sync()
+            return {name: self[name] for name in list(self.names)}
+
+    def __setitem__(self, name: str, value):
+        if name not in self.names:
+            self.names.append(name)
+        self.data[name] = value
+
+    def __delitem__(self, name: str):
+        self.names.remove(name)
+        self.data.pop(name, None)
 
-class Cache(object):
-    def __init__(self, directory: str, api=None):
+    def __iter__(self):
+        return iter(list(self.names))
+
+    def __len__(self):
+        return len(self.names)
+
+    @property
+    def loaded(self):
+        """Names of types that have been read from the store
+        """
+        return list(self.data.keys())
+
+
+class Cache(ABC):
+    # names of cached types
+    TYPES = []
+    # key of data that is downloaded separately for each cached item (e.g. overrides)
+    CHILDREN = None
+    # add items of CHILDREN to id index
+    INDEX_CHILDREN = False
+    # save CHILDREN of each item to a separate shard file
+    SHARDED = False
+    # keys of data that is derived from CHILDREN and reused together with them
+    DERIVED = []
+
+    def __init__(self, directory: str, api=None, workers=1, backend='json', fmt='json', root: str = None):
         self.api = api
         self.directory = self._init_directory(directory)
         self.cache = None
         self.cache_type = 'generic'
+        # FmcCache the cache is a sub-cache of
+        self.parent = None
+        self.workers = workers
+        self.fetched = dict()
+        self.previous = dict()
+        # ids of items per type whose children changed according to the audit log, None if children are not reused
+        self.audited = dict()
+        self.index = None
+        self.store = STORES[backend](self.directory, self.CHILDREN, fmt, self.SHARDED, root=root)
+        self.checkpoint = Checkpoint(self.directory)
 
     @staticmethod
     def _init_directory(directory: str):
@@ -21,108 +184,922 @@ class Cache(object):
             path.mkdir(parents=True, exist_ok=True)
         return path
 
-    def download(self):
+    def content_hash(self, item: Dict):
+        """Hash of an api object excluding data that is downloaded separately for each item
+        """
+        item = {k: v for k, v in item.items() if k != self.CHILDREN and k not in self.DERIVED}
+        return hashlib.sha256(json.dumps(item, ensure_ascii=False, sort_keys=True).encode()).hexdigest()
+
+    def reuse_children(self, name: str, item: Dict):
+        """Copy children of an unchanged item from the previous cache generation. Adding or removing children (e.g.
+        rules) does not always change the item itself, so children of items that were modified according to the
+        audit log are downloaded again
+
+        :return: True if item is unchanged and children have been copied, False otherwise
+        """
+        if self.audited is None or item['id'] in self.audited.get(name, set()):
+            return False
+        previous = self.previous.get(name, {}).get(item['id'])
+        if previous and previous['hash'] == self.content_hash(item) and self.CHILDREN in previous['item']:
+            for key in [self.CHILDREN] + self.DERIVED:
+                if key in previous['item']:
+                    item[key] = previous['item'][key]
+            return True
+        return False
+
+    def audited_children(self):
+        """Ids of items whose children changed since the last download according to the fmc audit log
+
+        :return: dict of type name and ids or None if changes cannot be read from the audit log
+        """
+        if self.CHILDREN is None or not self.fetched:
+            return dict()
+        since = min(datetime.fromisoformat(fetched) for fetched in self.fetched.values())
+        try:
+            changes, _count = audit_changes(self.api.fmc, since, datetime.now())
+        except GenericApiError as exc:
+            logger.warning('Audit log cannot be read (%s). Downloading all %s again', exc, self.CHILDREN)
+            return None
+        if not changes.complete:
+            logger.info(
+                'Audit log contains changes that cannot be mapped to cached items. Downloading all %s again',
+                self.CHILDREN,
+            )
+            return None
+        return changes.modified
+
+    def download(self, resume=False):
         return
 
-    def load(self):
+    def _save_children(self, futures: Dict, failed=False):
+        """Save results of child downloads to their item as they complete and add them to the checkpoint. Futures
+        map to a tuple of checkpoint key, item and key of the item the result is saved to. Completed children are
+        checkpointed even if other downloads fail. The first error is raised once all downloads completed, unless the
+        download `failed` already
+        """
+        error = None
+        try:
+            for future in as_completed(futures):
+                if future.exception() is not None:
+                    error = error or future.exception()
+                    continue
+                key, item, field = futures[future]
+                item[field] = future.result()
+                self.checkpoint.add_children(key, item[field])
+        finally:
+            self.checkpoint.flush()
+        if error is not None and not failed:
+            raise error
+
+    def refresh(self):
+        """Download cache again, but reuse children of items that did not change since the last download
+
+        :return: number of items that changed since the last download
+        """
+        self.clear_responses()
+        manifest = self.load_manifest()
         cache = dict()
-        for f in self.directory.iterdir():
-            if f.is_file() and f.suffix == '.json':
-                logger.debug('Loading cache file %s', f)
-                with open(f, 'r') as data:
-                    cache[f.stem] = json.load(data)
-        self.cache = cache
+        if manifest:
+            self.load()
+            cache = self.read_all()
+        self.previous = {
+            name: {
+                item['id']: {'hash': manifest[name]['items'].get(item['id']), 'item': item}
+                for item in items
+                if 'id' in item
+            }
+            for name, items in cache.items()
+            if name in manifest
+        }
+        if not self.previous:
+            logger.info('No manifest found for %s cache. Downloading complete cache', self.cache_type)
+        self.audited = self.audited_children() if self.previous else dict()
+        self.download()
+        changed = [
+            item['id']
+            for name, items in self.cache.items()
+            for item in items
+            if 'id' in item and self.changed(name, item)
+        ]
+        logger.info('Refreshed %s cache. %s items changed since last download', self.cache_type, len(changed))
+        self.previous = dict()
+        self.audited = dict()
+        return len(changed)
+
+    def changed(self, name: str, item: Dict):
+        """Check whether `item` changed since the previous cache generation. Items whose children were downloaded
+        again instead of being reused from the previous generation are changed as well
+        """
+        previous = self.previous.get(name, {}).get(item['id'])
+        if previous is None or previous['hash'] != self.content_hash(item):
+            return True
+        return any(previous['item'].get(key) is not item.get(key) for key in [self.CHILDREN] + self.DERIVED if key)
+
+    def clear_responses(self):
+        """Discard api responses memoized by the fmc session, so a refresh never reads listings that were memoized
+        by a previous refresh of the same run (e.g. by cache watch)
+        """
+        session = getattr(getattr(self.api.fmc, 'conn', None), 'session', None)
+        clear = getattr(session, 'clear', None)
+        if callable(clear):
+            clear()
+
+    @abstractmethod
+    def resource(self, name: str):
+        """fireREST resource of cached type `name`
+        """
+
+    def fetch_children(self, name: str, item: Dict):
+        """Download data that is cached separately for `item` (e.g. overrides) and save it to the item
+        """
+        return
+
+    def apply_changes(self, changes: AuditChanges, fetched: str):
+        """Download items that were created or modified according to `changes` and remove deleted items.
+        Unchanged items and their children are kept. All types are marked as downloaded at `fetched`
+
+        :return: number of changed items
+        """
+        if self.cache is None or isinstance(self.cache, LazyCache):
+            self.load()
+            self.cache = self.read_all()
+        changed = 0
+        for name in self.TYPES:
+            modified = changes.modified.get(name, set())
+            deleted = changes.deleted.get(name, set())
+            items = self.cache.get(name, [])
+            if name in changes.created or name not in self.cache:
+                previous = {item['id']: item for item in items if 'id' in item}
+                items = self.resource(name).get()
+                for item in items:
+                    old = previous.get(item['id'])
+                    if old is not None and item['id'] not in modified:
+                        for key in [self.CHILDREN] + self.DERIVED:
+                            if key in old:
+                                item[key] = old[key]
+                    else:
+                        self.fetch_children(name, item)
+                        changed += 1
+                changed += len(set(previous) - {item['id'] for item in items})
+            else:
+                positions = {item['id']: position for position, item in enumerate(items) if 'id' in item}
+                for uuid in sorted(modified - deleted):
+                    try:
+                        item = self.resource(name).get(uuid=uuid)
+                    except ResourceNotFoundError:
+                        deleted = deleted | {uuid}
+                        continue
+                    self.fetch_children(name, item)
+                    if uuid in positions:
+                        items[positions[uuid]] = item
+                    else:
+                        items.append(item)
+                    changed += 1
+            remaining = [item for item in items if item.get('id') not in deleted]
+            changed += len(items) - len(remaining)
+            self.cache[name] = remaining
+            self.fetched[name] = fetched
+        self.index = None
+        return changed
+
+    def manifest(self):
+        """Summary of cached types used to detect changes during `refresh`
+        """
+        return {
+            name: {
+                'fetched': self.fetched.get(name),
+                'count': len(items),
+                'items': {item['id']: self.content_hash(item) for item in items if 'id' in item},
+            }
+            for name, items in self.cache.items()
+        }
+
+    def load_manifest(self):
+        return self.store.load_metadata('manifest') or dict()
+
+    def items(self, name: str):
+        """Get all cached items of type `name`
+
+        :return: list of cached items or None if type is not cached
+        """
+        if self.cache is None:
+            self.load()
+        return self.cache[name] if name in self.cache else None
+
+    def iter_items(self, name: str):
+        """Yield saved items of type `name` one at a time without loading the complete type. Children of items
+        (e.g. rules) are not included
+        """
+        for item in self.store.iter_read(name):
+            item.pop(self.CHILDREN, None)
+            yield item
+
+    def fresh(self, name: str, max_age: int):
+        """Check if cached type `name` was downloaded less than `max_age` seconds ago
+        """
+        if name not in self.fetched:
+            return False
+        age = datetime.now() - datetime.fromisoformat(self.fetched[name])
+        return age.total_seconds() <= max_age
+
+    def api_item(self, item: Dict):
+        """Cached item without data that is downloaded separately for each item (e.g. rules of a policy), so it has
+        the same shape as the item returned by the api
+        """
+        return {k: v for k, v in item.items() if k != self.CHILDREN and k not in self.DERIVED}
+
+    def children_of(self, item: Dict):
+        """Ids of items that are referenced by an item, e.g. nested objects of a group
+        """
+        return [obj['id'] for obj in item.get('objects', []) if 'id' in obj]
+
+    def build_index(self):
+        """Create id, name and parent/children indexes for all cached items. Items are referenced by their path
+        within the cache, e.g. ['host', 0]
+        """
+        index = {'id': dict(), 'name': dict(), 'children': dict()}
+        for name, items in self.cache.items():
+            index['name'][name] = dict()
+            for position, item in enumerate(items):
+                if 'id' not in item:
+                    continue
+                index['id'][item['id']] = [name, position]
+                if 'name' in item:
+                    index['name'][name][item['name']] = item['id']
+                children = self.children_of(item)
+                if children:
+                    index['children'][item['id']] = children
+                if self.INDEX_CHILDREN and isinstance(item.get(self.CHILDREN), list):
+                    for child_position, child in enumerate(item[self.CHILDREN]):
+                        if 'id' in child:
+                            index['id'].setdefault(child['id'], [name, position, self.CHILDREN, child_position])
+        return index
+
+    def _query_store(self):
+        """Lookups are sent to queryable stores unless the cache holds data that has not been saved yet
+        """
+        return self.store.QUERYABLE and (self.cache is None or isinstance(self.cache, LazyCache))
+
+    def _index(self):
+        if self.cache is None:
+            self.load()
+        if self.index is None:
+            self.index = self.build_index()
+        return self.index
+
+    def get(self, uuid: str):
+        """Get cached item by id. Queryable stores are accessed directly unless the cache holds unsaved data
+
+        :return: cached item or None if item is not cached
+        """
+        if self._query_store():
+            return self.store.get(uuid)
+        path = self._index()['id'].get(uuid)
+        if path is None:
+            return None
+        if isinstance(self.cache, LazyCache) and path[0] not in self.cache.loaded:
+            # the index only matches the loaded generation, so it is looked up again if a new generation was saved
+            with self.store.lock(shared=True):
+                if self.cache.sync():
+                    return self.get(uuid)
+                return self._lookup(path)
+        return self._lookup(path)
+
+    def _lookup(self, path: list):
+        if self.SHARDED and isinstance(self.cache, LazyCache) and path[0] not in self.cache.loaded:
+            item = self.store.read_item(*path[:2])
+            path = path[2:]
+        else:
+            item = self.cache
+        for key in path:
+            item = item[key]
+        return item
+
+    def get_by_name(self, name: str, item_name: str):
+        """Get cached item of type `name` by its name
+
+        :return: cached item or None if item is not cached
+        """
+        if self._query_store():
+            return self.store.get_by_name(name, item_name)
+        uuid = self._index()['name'].get(name, {}).get(item_name)
+        return self.get(uuid) if uuid else None
+
+    def children(self, uuid: str):
+        """Get cached items that are referenced by item `uuid`
+        """
+        if self._query_store():
+            item = self.store.get(uuid)
+            children = [self.store.get(child) for child in self.children_of(item)] if item else []
+            return [child for child in children if child]
+        return [self.get(child) for child in self._index()['children'].get(uuid, []) if self.get(child)]
+
+    def load(self):
+        """Load cache from store. Cached types are read on first access
+        """
+        with self.store.lock(shared=True):
+            self.cache = LazyCache(self.store, self._generation_changed)
+            self._load_metadata()
         return self.cache
 
+    def _load_metadata(self):
+        self.index = self.store.load_metadata('index')
+        self.fetched = {name: item['fetched'] for name, item in self.load_manifest().items()}
+
+    def _generation_changed(self):
+        if self.parent is not None:
+            self.parent.reload()
+        else:
+            self.reload()
+
+    def reload(self):
+        """Discard types that have been read and load the index of the currently saved generation. Called while
+        holding the store lock once another process saved a new generation. Unsaved data is kept
+        """
+        if isinstance(self.cache, LazyCache):
+            self.cache.reset()
+            self._load_metadata()
+
+    def read_all(self):
+        """All cached types. Types that have not been read yet are read from the loaded generation
+        """
+        if isinstance(self.cache, LazyCache):
+            return self.cache.read_all()
+        return dict(self.cache)
+
+    def prepare(self):
+        """Prepare lazily loaded types, the manifest and index for `write`, so concurrent readers are only blocked
+        while files are written
+
+        :return: types, manifest and index to write
+        """
+        cache = self.read_all()
+        manifest = self.manifest()
+        if not self.store.QUERYABLE:
+            self.index = self.build_index()
+        return cache, manifest, self.index
+
+    def write(self, cache: Dict, manifest: Dict, index: Dict):
+        """Write prepared cache to the store. Called while holding the exclusive lock
+        """
+        self.store.save(cache)
+        self.store.save_metadata('manifest', manifest)
+        if not self.store.QUERYABLE:
+            self.store.save_metadata('index', index)
+
     def save(self):
-        for name, data in self.cache.items():
-            filename = f'{name}.json'
-            filepath = Path.joinpath(self.directory, filename)
-            with open(filepath, 'w') as f:
-                f.write(json.dumps(data, indent=4, ensure_ascii=False, sort_keys=True))
+        """Save cache as a new generation. Lazily loaded types, the manifest and index are prepared before the
+        cache directory is locked, so concurrent readers are only blocked while files are written
+        """
+        prepared = self.prepare()
+        with self.store.lock():
+            self.write(*prepared)
+            self.store.publish()
+        self.checkpoint.clear()
 
 
 class ObjectCache(Cache):
-    def __init__(self, directory: str, api=None):
-        self.api = api
-        self.directory = self._init_directory(f'{directory}/objects')
-        self.cache = None
+    TYPES = OBJECT_TYPES
+    CHILDREN = 'overrides'
+
+    def __init__(self, directory: str, api=None, workers=1, backend='json', fmt='json'):
+        super().__init__(f'{directory}/objects', api, workers, backend, fmt, root=directory)
         self.cache_type = 'object'
 
-    def download(self):
+    def download(self, resume=False):
+        """Download all cached object types and the overrides of overridable objects. Up to `workers` requests
+        are performed in parallel. Override downloads are scheduled as soon as the listing of their type completed.
+        Overrides of a type are downloaded per object or per override target, whichever needs fewer requests.
+        Overrides of objects that are unchanged since the previous generation are reused during `refresh`.
+        Completed types and overrides are checkpointed and not downloaded again if `resume` is set
+        """
         fmc = self.api.fmc  # type: FMC
-        cache = {
-            'country': fmc.object.country.get(),
-            'fqdn': fmc.object.fqdn.get(),
-            'host': fmc.object.host.get(),
-            'icmpv4object': fmc.object.icmpv4object.get(),
-            'icmpv6object': fmc.object.icmpv6object.get(),
-            'network': fmc.object.network.get(),
-            'networkgroup': fmc.object.networkgroup.get(),
-            'range': fmc.object.range.get(),
-            'protocolportobject': fmc.object.protocolportobject.get(),
-            'portobjectgroup': fmc.object.portobjectgroup.get(),
-            'url': fmc.object.url.get(),
-            'urlgroup': fmc.object.urlgroup.get(),
-            'vlantag': fmc.object.vlantag.get(),
-            'vlangrouptag': fmc.object.vlangrouptag.get(),
-        }
-        for obj in cache['host']:
-            if 'overridable' in obj:
-                if obj['overridable']:
-                    obj['overrides'] = fmc.object.host.override.get(container_uuid=obj['id'])
-        for obj in cache['range']:
-            if 'overridable' in obj:
-                if obj['overridable']:
-                    obj['overrides'] = fmc.object.range.override.get(container_uuid=obj['id'])
-        for obj in cache['network']:
-            if 'overridable' in obj:
-                if obj['overridable']:
-                    obj['overrides'] = fmc.object.network.override.get(container_uuid=obj['id'])
-        for obj in cache['networkgroup']:
-            if 'overridable' in obj:
-                if obj['overridable']:
-                    obj['overrides'] = fmc.object.networkgroup.override.get(container_uuid=obj['id'])
-        self.cache = cache
+        checkpoint = self.checkpoint.begin(resume)
+        restored = checkpoint.children()
+        cache = dict()
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            pending = dict()
+            completed = list()
+            for name in OBJECT_TYPES:
+                listing = checkpoint.listing(name)
+                if listing is None:
+                    pending[executor.submit(getattr(fmc.object, name).get)] = name
+                else:
+                    cache[name], self.fetched[name] = listing
+                    completed.append(name)
+            overrides = dict()
+            target_futures = list()
+            targets = None
+            try:
+                while pending or completed:
+                    if not completed:
+                        done, _not_done = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            name = pending.pop(future)
+                            cache[name] = future.result()
+                            self.fetched[name] = datetime.now().isoformat()
+                            checkpoint.save_listing(name, cache[name], self.fetched[name])
+                            logger.debug('Downloaded %s %s objects', len(cache[name]), name)
+                            completed.append(name)
+                    name = completed.pop(0)
+                    if name not in OVERRIDABLE_OBJECT_TYPES:
+                        continue
+                    candidates = list()
+                    for obj in cache[name]:
+                        if not obj.get('overridable'):
+                            continue
+                        if obj['id'] in restored:
+                            obj['overrides'] = restored[obj['id']]
+                        else:
+                            candidates.append(obj)
+                    reused = executor.map(partial(self.reuse_children, name), candidates)
+                    objs = [obj for obj, is_reused in zip(candidates, reused) if not is_reused]
+                    if not objs:
+                        continue
+                    if targets is None:
+                        targets = override_targets(fmc)
+                    resource = getattr(fmc.object, name)
+                    if override_strategy(len(objs), targets, len(cache[name])) == PER_TARGET:
+                        logger.debug('Downloading overrides of %s %s objects per target', len(objs), name)
+                        futures = [executor.submit(target_overrides, resource, target) for target in targets]
+                        target_futures.append((objs, futures))
+                    else:
+                        for obj in objs:
+                            future = executor.submit(resource.override.get, container_uuid=obj['id'])
+                            overrides[future] = (obj['id'], obj, 'overrides')
+                for objs, futures in target_futures:
+                    grouped = grouped_overrides(future.result() for future in futures)
+                    for obj in objs:
+                        obj['overrides'] = grouped.get(obj['id'], [])
+                        self.checkpoint.add_children(obj['id'], obj['overrides'])
+            except BaseException:
+                self._save_children(overrides, failed=True)
+                raise
+            self._save_children(overrides)
+        self.cache = {name: cache[name] for name in OBJECT_TYPES}
+
+    def resource(self, name: str):
+        return getattr(self.api.fmc.object, name)
+
+    def fetch_children(self, name: str, item: Dict):
+        if name in OVERRIDABLE_OBJECT_TYPES and item.get('overridable'):
+            item['overrides'] = self.resource(name).override.get(container_uuid=item['id'])
 
 
 class PolicyCache(Cache):
-    def __init__(self, directory: str, api=None):
-        self.api = api
-        self.directory = self._init_directory(f'{directory}/policies')
-        self.cache = None
+    TYPES = POLICY_TYPES
+    CHILDREN = 'rules'
+    INDEX_CHILDREN = True
+    SHARDED = True
+    # sections of the effective rule list of a policy as [id of policy the rules are saved to, number of rules]
+    SEGMENTS = 'ruleSegments'
+    DERIVED = [SEGMENTS]
+
+    def __init__(self, directory: str, api=None, workers=1, backend='json', fmt='json'):
+        super().__init__(f'{directory}/policies', api, workers, backend, fmt, root=directory)
         self.cache_type = 'policy'
 
-    def download(self):
+    def download(self, resume=False):
+        """Download all cached policy types including their rules. Up to `workers` requests are performed in
+        parallel. Rules of policies that are unchanged since the previous generation are reused during `refresh`,
+        unless a policy they inherit rules from changed. Completed types and rules are checkpointed and not
+        downloaded again if `resume` is set. Inherited rules are saved once to the policy that owns them
+        """
+        fmc = self.api.fmc  # type: FMC
+        checkpoint = self.checkpoint.begin(resume)
+        restored = checkpoint.children()
+        cache = dict()
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            policies = dict()
+            for name in POLICY_TYPES:
+                listing = checkpoint.listing(name)
+                if listing is None:
+                    policies[name] = executor.submit(getattr(fmc.policy, name).get)
+                else:
+                    cache[name], self.fetched[name] = listing
+            for name, future in policies.items():
+                cache[name] = future.result()
+                self.fetched[name] = datetime.now().isoformat()
+                checkpoint.save_listing(name, cache[name], self.fetched[name])
+            pending = list()
+            reused = dict()
+            candidates = list()
+            for name in POLICY_TYPES:
+                for policy in cache[name]:
+                    if policy['id'] in restored:
+                        policy['rules'] = restored[policy['id']]
+                    else:
+                        candidates.append((name, policy))
+            checked = executor.map(lambda candidate: self.reuse_children(*candidate), candidates)
+            for (name, policy), is_reused in zip(candidates, checked):
+                if is_reused:
+                    reused[policy['id']] = (name, policy)
+                else:
+                    pending.append((name, policy))
+            pending.extend(self._inheriting(reused))
+            accessrules = dict()
+            for name, policy in pending:
+                accessrule = getattr(fmc.policy, name).accessrule
+                future = executor.submit(accessrule.get, container_uuid=policy['id'])
+                accessrules[future] = (policy['id'], policy, 'rules')
+            self._save_children(accessrules)
+        self.cache = {name: cache[name] for name in POLICY_TYPES}
+        self.split_rules()
+
+    def _inheriting(self, reused: Dict):
+        """Remove policies that inherit rules from a policy that is not reused from `reused`. Rules of these
+        policies have to be downloaded again
+
+        :return: list of removed policies and their type
+        """
+        removed = list()
+        while True:
+            inheriting = [
+                uuid
+                for uuid, (_name, policy) in reused.items()
+                if any(owner != uuid and owner not in reused for owner, _count in policy.get(self.SEGMENTS, []))
+            ]
+            if not inheriting:
+                return removed
+            for uuid in inheriting:
+                name, policy = reused.pop(uuid)
+                for key in [self.CHILDREN] + self.DERIVED:
+                    policy.pop(key, None)
+                removed.append((name, policy))
+
+    @staticmethod
+    def owner(rule: Dict, policy_id: str):
+        """Id of the policy that owns `rule` of policy `policy_id`. Rules of parent policies are inherited by
+        their child policies
+        """
+        return rule.get('metadata', {}).get('accessPolicy', {}).get('id', policy_id)
+
+    def split_rules(self):
+        """Save each rule once to the policy that owns it. Rules of policies without SEGMENTS are the effective
+        rules downloaded from fmc, including rules inherited from parent policies. Inherited rules are removed if
+        the parent policy is cached with the same rules and SEGMENTS are saved to reconstruct the effective rules
+        """
+        policies = {policy['id']: policy for name in POLICY_TYPES for policy in self.cache.get(name, [])}
+        own = {
+            uuid: [rule['id'] for rule in policy.get(self.CHILDREN, []) if self.owner(rule, uuid) == uuid]
+            for uuid, policy in policies.items()
+        }
+        for uuid, policy in policies.items():
+            if self.SEGMENTS in policy or self.CHILDREN not in policy:
+                continue
+            inherited = dict()
+            for rule in policy[self.CHILDREN]:
+                owner = self.owner(rule, uuid)
+                if owner != uuid:
+                    inherited.setdefault(owner, []).append(rule['id'])
+            shared = {owner for owner, ids in inherited.items() if owner in policies and own[owner] == ids}
+            rules = list()
+            segments = list()
+            for rule in policy[self.CHILDREN]:
+                owner = self.owner(rule, uuid)
+                source = owner if owner in shared else uuid
+                if source == uuid:
+                    rules.append(rule)
+                if segments and segments[-1][0] == source:
+                    segments[-1][1] += 1
+                else:
+                    segments.append([source, 1])
+            policy[self.CHILDREN] = rules
+            policy[self.SEGMENTS] = segments
+        self.index = None
+
+    def apply_changes(self, changes: AuditChanges, fetched: str):
+        """Policies that inherit rules from a modified or deleted policy are downloaded again as well
+        """
+        if self.cache is None or isinstance(self.cache, LazyCache):
+            self.load()
+            self.cache = self.read_all()
+        affected = reduce(set.union, list(changes.modified.values()) + list(changes.deleted.values()), set())
+        reused = {
+            policy['id']: (name, policy)
+            for name in POLICY_TYPES
+            for policy in self.cache.get(name, [])
+            if policy['id'] not in affected
+        }
+        for name, policy in self._inheriting(reused):
+            changes.modified.setdefault(name, set()).add(policy['id'])
+        changed = super().apply_changes(changes, fetched)
+        self.split_rules()
+        return changed
+
+    def resource(self, name: str):
+        return getattr(self.api.fmc.policy, name)
+
+    def saved_child_count(self, item: Dict):
+        """Number of effective rules of `item` including rules that are saved to the policy they are inherited from
+        """
+        if self.SEGMENTS in item:
+            return sum(count for _owner, count in item[self.SEGMENTS])
+        return len(item.get(self.CHILDREN, []))
+
+    def fetch_children(self, name: str, item: Dict):
+        item['rules'] = self.resource(name).accessrule.get(container_uuid=item['id'])
+
+    def children_of(self, item: Dict):
+        return [rule['id'] for rule in item.get('rules', []) if 'id' in rule]
+
+    @staticmethod
+    def _owned(rules: Iterator, uuid: str):
+        for rule in rules:
+            if PolicyCache.owner(rule, uuid) == uuid:
+                yield rule
+
+    def effective_rules(self, policy: Dict, saved):
+        """Yield the effective rules of `policy` in order. Inherited rules are read from the policy that owns them
+        using `saved`, which returns an iterator over the rules saved to a policy
+        """
+        segments = policy.get(self.SEGMENTS)
+        if segments is None:
+            yield from saved(policy['id'])
+            return
+        sources = dict()
+        for uuid, count in segments:
+            if uuid not in sources:
+                sources[uuid] = saved(uuid) if uuid == policy['id'] else self._owned(saved(uuid), uuid)
+            yield from islice(sources[uuid], count)
+
+    def rule_count(self, uuid: str):
+        """Number of effective rules of policy `uuid`
+
+        :return: number of rules or None if rules of the policy are not cached
+        """
+        item = self.get(uuid)
+        if item is None or self.CHILDREN not in item:
+            return None
+        return self.saved_child_count(item)
+
+    def children(self, uuid: str):
+        """Get effective rules of policy `uuid`. Only the shards of the requested policy and its parents are read
+        """
+        item = self.get(uuid)
+        if item is None:
+            return []
+
+        def saved(owner):
+            policy = item if owner == uuid else self.get(owner)
+            return iter(policy.get(self.CHILDREN, []) if policy else [])
+
+        return list(self.effective_rules(item, saved))
+
+    def _type_of(self, uuid: str):
+        if self.store.QUERYABLE:
+            return self.store.type_of(uuid)
+        path = self._index()['id'].get(uuid)
+        return path[0] if path and len(path) == 2 else None
+
+    def _saved_rules(self, uuid: str):
+        name = self._type_of(uuid)
+        return self.store.iter_children(name, uuid) if name else iter([])
+
+    def iter_rules(self, uuid: str):
+        """Get iterator over the effective rules of policy `uuid` that reads one saved rule at a time, so rules of
+        large policies can be processed with bounded memory
+
+        :return: iterator or None if policy is not cached
+        """
+        name = self._type_of(uuid)
+        if name is None:
+            return None
+        policy = next((item for item in self.iter_items(name) if item.get('id') == uuid), None)
+        if policy is None:
+            return None
+        return self.effective_rules(policy, self._saved_rules)
+
+
+class DeviceCache(Cache):
+    TYPES = list(DEVICE_TYPES) + list(DEVICE_CONFIG_TYPES)
+
+    def __init__(self, directory: str, api=None, workers=1, backend='json', fmt='json'):
+        super().__init__(f'{directory}/devices', api, workers, backend, fmt, root=directory)
+        self.cache_type = 'device'
+
+    def download(self, resume=False):
+        """Download device records, ha pairs and policy assignments. Static routes and subinterfaces of each device
+        record are saved to the device record using the name of the type as key. Up to `workers` requests are
+        performed in parallel. Completed types and device configuration are checkpointed and not downloaded again
+        if `resume` is set
+        """
         fmc = self.api.fmc  # type: FMC
-        cache = {'accesspolicy': fmc.policy.accesspolicy.get(), 'prefilterpolicy': fmc.policy.prefilterpolicy.get()}
-        for key, accesspolicy in enumerate(cache['accesspolicy']):
-            accessrules = fmc.policy.accesspolicy.accessrule.get(container_uuid=accesspolicy['id'])
-            cache['accesspolicy'][key]['rules'] = accessrules
+        checkpoint = self.checkpoint.begin(resume)
+        restored = checkpoint.children()
+        cache = dict()
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            listings = dict()
+            for name, path in DEVICE_TYPES.items():
+                listing = checkpoint.listing(name)
+                if listing is None:
+                    listings[name] = executor.submit(resource(fmc, path).get)
+                else:
+                    cache[name], self.fetched[name] = listing
+            for name, future in listings.items():
+                cache[name] = future.result()
+                self.fetched[name] = datetime.now().isoformat()
+                checkpoint.save_listing(name, cache[name], self.fetched[name])
+            config = dict()
+            for device in cache['devicerecord']:
+                for name, path in DEVICE_CONFIG_TYPES.items():
+                    key = f'{name}:{device["id"]}'
+                    if key in restored:
+                        device[name] = restored[key]
+                    else:
+                        future = executor.submit(resource(fmc, path).get, container_uuid=device['id'])
+                        config[future] = (key, device, name)
+            self._save_children(config)
+            for name in DEVICE_CONFIG_TYPES:
+                self.fetched[name] = datetime.now().isoformat()
+        self.cache = {name: cache[name] for name in DEVICE_TYPES}
+
+    def resource(self, name: str):
+        return resource(self.api.fmc, {**DEVICE_TYPES, **DEVICE_CONFIG_TYPES}[name])
+
+    def api_item(self, item: Dict):
+        return {k: v for k, v in item.items() if k not in DEVICE_CONFIG_TYPES}
+
+    def manifest(self):
+        """Device configuration is saved to the device records, so its download time is recorded separately
+        """
+        manifest = super().manifest()
+        devices = self.cache.get('devicerecord', [])
+        for name in DEVICE_CONFIG_TYPES:
+            if name in self.fetched:
+                manifest[name] = {
+                    'fetched': self.fetched[name],
+                    'count': sum(len(device.get(name, [])) for device in devices),
+                    'items': dict(),
+                }
+        return manifest
 
-        for key, prefilterpolicy in enumerate(cache['prefilterpolicy']):
-            accessrules = fmc.policy.prefilterpolicy.accessrule.get(container_uuid=prefilterpolicy['id'])
-            cache['prefilterpolicy'][key]['rules'] = accessrules
+    def device_config(self, name: str, device_id: str):
+        """Get cached configuration of type `name` (e.g. ipv4staticroute, subinterface) of a device record
 
-        self.cache = cache
+        :return: list of configuration items or None if device configuration is not cached
+        """
+        device = self.get(device_id)
+        if device is None or name not in device:
+            return None
+        return device[name]
 
 
 class FmcCache(Cache):
-    def __init__(self, directory: str, api=None):
+    def __init__(self, directory: str, api=None, workers=1, backend='json', fmt='json', history=0):
         self.api = api
         self.directory = self._init_directory(directory)
-        self.cache = {'objects': ObjectCache(directory, api), 'policies': PolicyCache(directory, api)}
+        self.history = history
+        self.snapshots = SnapshotStore(directory)
+        self.root = cache_root(self.directory)
+        self.cache = {
+            'objects': ObjectCache(directory, api, workers, backend, fmt),
+            'policies': PolicyCache(directory, api, workers, backend, fmt),
+            'devices': DeviceCache(directory, api, workers, backend, fmt),
+        }
+        for _key, item in self.cache.items():
+            item.parent = self
         self.cache_type = 'FMC'
+        self.workers = workers
 
-    def download(self):
-        for _key, item in self.cache.items():
-            item.download()
+    @classmethod
+    def from_cfg(cls, cfg: Dict, api=None, workers=1):
+        """Create cache using the cache settings of the firecli configuration
+        """
+        return cls(
+            cfg['cache_dir'],
+            api,
+            workers,
+            backend=cfg.get('cache_backend', 'json'),
+            fmt=cfg.get('cache_format', 'json'),
+            history=cfg.get('cache_history', 0),
+        )
 
-    def load(self):
+    def download(self, resume=False):
         for _key, item in self.cache.items():
+            item.download(resume)
+
+    def refresh(self):
+        return sum(item.refresh() for item in self.cache.values())
+
+    def resource(self, name: str):
+        return self.subcache(name).resource(name)
+
+    def audit_refresh(self):
+        """Refresh objects and policies using the fmc audit log. Only items that were created, modified or deleted
+        since the last download are downloaded again. The complete cache is refreshed if it has not been initialized
+        or if the audit log contains changes that cannot be mapped to cached items. Devices are always refreshed
+
+        :return: number of items that changed since the last download
+        """
+        self.clear_responses()
+        audited = [self.cache['objects'], self.cache['policies']]
+        for item in audited:
             item.load()
+        if any(set(item.TYPES) - set(item.fetched) for item in audited):
+            logger.info('Cache has not been initialized completely. Refreshing complete cache')
+            return self.refresh()
+        since = min(datetime.fromisoformat(fetched) for item in audited for fetched in item.fetched.values())
+        now = datetime.now()
+        changes, records = audit_changes(self.api.fmc, since, now)
+        if not changes.complete:
+            logger.info('Audit log contains changes that cannot be mapped to cached items. Refreshing complete cache')
+            return self.refresh()
+        logger.info('Found %s changes in %s audit records since %s', len(changes), records, since.isoformat())
+        changed = sum(item.apply_changes(changes, now.isoformat()) for item in audited)
+        logger.info('Refreshed object and policy cache from audit log. %s items changed', changed)
+        return changed + self.cache['devices'].refresh()
+
+    def load(self):
+        """Load all sub-caches from the same generation
+        """
+        with self.root.lock(shared=True):
+            for _key, item in self.cache.items():
+                item.load()
         return self.cache
 
-    def save(self):
+    def reload(self):
+        """Reload all sub-caches once another process saved a new generation, so types of different sub-caches are
+        never read from different generations
+        """
+        for _key, item in self.cache.items():
+            item.reload()
+
+    def save(self, keys=None, snapshot=True):
+        """Save sub-caches `keys` (default: all sub-caches) as a single new generation. Sub-caches that are not
+        saved keep the data of the previous generation. A snapshot of the saved cache is kept if `history` and
+        `snapshot` are set. Only the `history` newest snapshots are kept
+        """
+        items = [self.cache[key] for key in keys] if keys is not None else list(self.cache.values())
+        prepared = [(item, item.prepare()) for item in items]
+        with self.root.lock():
+            for item, data in prepared:
+                item.write(*data)
+            self.root.publish()
+        for item, _data in prepared:
+            item.checkpoint.clear()
+        if snapshot:
+            self.snapshot()
+
+    def snapshot(self):
+        """Save a snapshot of all sub-caches if `history` is set. Sub-caches that have not been loaded are read from
+        the store. Only the `history` newest snapshots are kept
+
+        :return: number of the new snapshot or None if `history` is not set
+        """
+        if not self.history:
+            return None
+        with self.root.lock(shared=True):
+            for _key, item in self.cache.items():
+                if item.cache is None:
+                    item.load()
+            generation = self.snapshots.save(self.cache)
+        self.snapshots.prune(self.history)
+        return generation
+
+    def load_snapshot(self, generation: int):
+        """Replace the cached data of all sub-caches with snapshot `generation`, e.g. to create reports of a
+        previous state of the configuration. The data is kept in memory until the cache is saved
+        """
+        for key, data in self.snapshots.load(generation).items():
+            self.cache[key].cache = data['cache']
+            self.cache[key].fetched = data['fetched']
+            self.cache[key].index = None
+        return self
+
+    def subcache(self, name: str):
+        """Get sub-cache that holds cached type `name`, e.g. PolicyCache for accesspolicy
+        """
+        for _key, item in self.cache.items():
+            if name in item.TYPES:
+                return item
+        raise KeyError(name)
+
+    def fresh(self, name: str, max_age: int):
+        return self.subcache(name).fresh(name, max_age)
+
+    def get(self, uuid: str):
+        """Get cached object, policy, rule or device by id
+        """
+        for _key, item in self.cache.items():
+            result = item.get(uuid)
+            if result is not None:
+                return result
+        return None
+
+    def get_by_name(self, name: str, item_name: str):
+        """Get cached object or policy of type `name` (e.g. host, accesspolicy) by its name
+        """
+        for _key, item in self.cache.items():
+            result = item.get_by_name(name, item_name)
+            if result is not None:
+                return result
+        return None
+
+    def children(self, uuid: str):
+        """Get cached items referenced by a group object or rules of a policy
+        """
         for _key, item in self.cache.items():
-            item.save()
+            if item.get(uuid) is not None:
+                return item.children(uuid)
+        return []
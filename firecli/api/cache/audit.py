@@ -0,0 +1,82 @@
+import re
+from logging import getLogger
+from typing import Dict, List
+
+logger = getLogger(__name__)
+
+# seconds the audit log is read before the last download to compensate clock differences between firecli and fmc
+AUDIT_MARGIN = 60
+
+# cached type of each fmc api resource path
+RESOURCE_TYPES = {
+    'countries': 'country',
+    'fqdns': 'fqdn',
+    'hosts': 'host',
+    'icmpv4objects': 'icmpv4object',
+    'icmpv6objects': 'icmpv6object',
+    'networks': 'network',
+    'networkgroups': 'networkgroup',
+    'ranges': 'range',
+    'protocolportobjects': 'protocolportobject',
+    'portobjectgroups': 'portobjectgroup',
+    'urls': 'url',
+    'urlgroups': 'urlgroup',
+    'vlantags': 'vlantag',
+    'vlangrouptags': 'vlangrouptag',
+    'accesspolicies': 'accesspolicy',
+    'prefilterpolicies': 'prefilterpolicy',
+}
+
+# audit message of a configuration change performed using the fmc api
+API_CHANGE = re.compile(
+    r'\b(?P<method>POST|PUT|DELETE)\b.*?/(?:object|policy)/(?P<resource>\w+)'
+    r'(?:/(?P<uuid>[0-9a-fA-F-]{36}))?(?:/(?P<child>\w+))?'
+)
+# audit message of a configuration change that does not reference an api resource
+OTHER_CHANGE = re.compile(r'\b(add|creat|delet|modif|remov|sav|updat)', re.IGNORECASE)
+
+
+class AuditChanges(object):
+    """Cached items that were created, modified or deleted according to fmc audit records. Changes performed using
+    the api reference the changed resource and are mapped to cached types and ids. Changes to children (e.g.
+    accessrules, overrides) mark their parent as modified. Creations do not reference the new id, so the listing
+    of the type has to be downloaded again. `complete` is False if a record describes a change that cannot be
+    mapped to cached items
+    """
+
+    def __init__(self):
+        self.created = set()
+        self.modified = dict()
+        self.deleted = dict()
+        self.complete = True
+
+    @classmethod
+    def from_records(cls, records: List[Dict]):
+        changes = cls()
+        for record in records:
+            changes.add(record)
+        return changes
+
+    def add(self, record: Dict):
+        message = record.get('message', '')
+        match = API_CHANGE.search(message)
+        if not match:
+            if OTHER_CHANGE.search(message):
+                logger.debug('Audit record "%s" cannot be mapped to cached items', message)
+                self.complete = False
+            return
+        name = RESOURCE_TYPES.get(match.group('resource'))
+        if name is None:
+            return
+        uuid = match.group('uuid')
+        if uuid is None:
+            self.created.add(name)
+        elif match.group('method') == 'DELETE' and match.group('child') is None:
+            self.deleted.setdefault(name, set()).add(uuid)
+        else:
+            self.modified.setdefault(name, set()).add(uuid)
+
+    def __len__(self):
+        return len(self.created) + sum(len(ids) for ids in self.modified.values()) + sum(
+            len(ids) for ids in self.deleted.values()
+        )
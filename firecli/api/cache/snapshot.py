@@ -0,0 +1,214 @@
+import hashlib
+import json
+import re
+from datetime import datetime
+from logging import getLogger
+from pathlib import Path
+from typing import Dict
+
+from firecli.api.cache.store import Store, atomic_write
+
+logger = getLogger(__name__)
+
+MANIFEST = re.compile(r'^manifest-(?P<generation>\d+)\.json$')
+
+
+class SnapshotStore(Store):
+    """Keep previous generations of the cache without saving complete copies. Items and their children (e.g.
+    objects, overrides, policies and rules) are saved once to a blob named by the hash of their content. Each
+    snapshot is a manifest that lists the id and hash of every item in order, so unchanged items only add a hash
+    to the manifest of a new snapshot.
+
+    Manifests map each sub-cache (objects, policies, devices) to the time its types were downloaded and to a list
+    of `[id, hash]` or `[id, hash, [child hashes]]` entries per type
+    """
+
+    DIRECTORY = 'snapshots'
+
+    def __init__(self, directory: str):
+        super().__init__(Path(directory, self.DIRECTORY))
+        self.blobs = Path.joinpath(self.directory, 'blobs')
+
+    @staticmethod
+    def content_hash(data: bytes):
+        return hashlib.sha256(data).hexdigest()
+
+    def _blob_path(self, digest: str):
+        return Path.joinpath(self.blobs, digest[:2], digest)
+
+    def _save_blob(self, item: Dict):
+        """Save item to its blob unless a blob with the same content exists
+
+        :return: hash of the item
+        """
+        data = json.dumps(item, ensure_ascii=False, sort_keys=True, separators=(',', ':')).encode()
+        digest = self.content_hash(data)
+        path = self._blob_path(digest)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            atomic_write(path, data, sync=False)
+        return digest
+
+    def _save_item(self, item: Dict, children=None):
+        """Save item and its `children` to blobs
+
+        :return: manifest entry of the item
+        """
+        entry = [item.get('id'), self._save_blob({k: v for k, v in item.items() if k != children})]
+        if children is not None and children in item:
+            entry.append([self._save_blob(child) for child in item[children]])
+        return entry
+
+    def _read_blob(self, digest: str):
+        with open(self._blob_path(digest), 'rb') as f:
+            return json.loads(f.read())
+
+    def _manifest_path(self, generation: int):
+        return Path.joinpath(self.directory, f'manifest-{generation:06d}.json')
+
+    def manifest(self, generation: int):
+        """Manifest of snapshot `generation`
+
+        :return: manifest or None if the snapshot does not exist
+        """
+        path = self._manifest_path(generation)
+        if not self.directory.is_dir():
+            return None
+        with self.lock(shared=True):
+            if not path.exists():
+                return None
+            with open(path, 'r') as f:
+                return json.load(f)
+
+    def generations(self):
+        """Numbers of all saved snapshots, oldest first
+        """
+        if not self.directory.is_dir():
+            return []
+        matches = (MANIFEST.match(path.name) for path in self.directory.iterdir())
+        return sorted(int(match.group('generation')) for match in matches if match)
+
+    def save(self, caches: Dict):
+        """Save a new snapshot of `caches`, a dict of sub-cache name and sub-cache
+
+        :return: number of the new snapshot
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        manifest = {'saved': datetime.now().isoformat(), 'caches': dict()}
+        with self.lock():
+            for key, cache in caches.items():
+                types = dict()
+                for name, items in cache.read_all().items():
+                    types[name] = [self._save_item(item, cache.CHILDREN) for item in items]
+                manifest['caches'][key] = {'fetched': dict(cache.fetched), 'children': cache.CHILDREN, 'types': types}
+            generation = self.generation() + 1
+            manifest['generation'] = generation
+            atomic_write(self._manifest_path(generation), json.dumps(manifest, sort_keys=True).encode())
+            self.save_metadata('generation', {'generation': generation, 'saved': manifest['saved']})
+        logger.info('Saved cache snapshot %s', generation)
+        return generation
+
+    def prune(self, keep: int):
+        """Remove all but the `keep` newest snapshots and blobs that are no longer referenced by any snapshot
+
+        :return: number of removed blobs
+        """
+        with self.lock():
+            generations = self.generations()
+            for generation in generations[: max(len(generations) - keep, 0)]:
+                self._manifest_path(generation).unlink()
+            referenced = set()
+            for generation in self.generations():
+                for cache in self.manifest(generation)['caches'].values():
+                    for entries in cache['types'].values():
+                        for entry in entries:
+                            referenced.add(entry[1])
+                            referenced.update(entry[2] if len(entry) > 2 else [])
+            removed = 0
+            if self.blobs.is_dir():
+                for path in self.blobs.glob('*/*'):
+                    if path.name not in referenced:
+                        path.unlink()
+                        removed += 1
+        logger.debug('Removed %s unreferenced blobs from cache snapshots', removed)
+        return removed
+
+    def snapshots(self):
+        """Summary of all saved snapshots including the number of items of each sub-cache, oldest first
+        """
+        result = list()
+        for generation in self.generations():
+            manifest = self.manifest(generation)
+            result.append(
+                {
+                    'generation': generation,
+                    'saved': manifest['saved'],
+                    'items': {
+                        key: sum(len(entries) for entries in cache['types'].values())
+                        for key, cache in manifest['caches'].items()
+                    },
+                }
+            )
+        return result
+
+    def load(self, generation: int):
+        """Read snapshot `generation`
+
+        :return: dict of sub-cache name and a dict with the `fetched` times and the `cache` of the sub-cache
+        """
+        manifest = self.manifest(generation)
+        if manifest is None:
+            raise KeyError(generation)
+        result = dict()
+        for key, cache in manifest['caches'].items():
+            types = dict()
+            for name, entries in cache['types'].items():
+                items = list()
+                for entry in entries:
+                    item = self._read_blob(entry[1])
+                    if len(entry) > 2:
+                        item[cache['children']] = [self._read_blob(digest) for digest in entry[2]]
+                    items.append(item)
+                types[name] = items
+            result[key] = {'fetched': cache['fetched'], 'cache': types}
+        return result
+
+    def diff(self, old: int, new: int):
+        """Compare two snapshots using their manifests only. Items are modified if their hash or the hashes of their
+        children changed
+
+        :return: dict of type name and a dict with ids of `created`, `modified` and `deleted` items
+        """
+        manifests = [self.manifest(generation) for generation in (old, new)]
+        if None in manifests:
+            raise KeyError(old if manifests[0] is None else new)
+        old_items, new_items = [
+            {
+                name: {entry[0]: entry[1:] for entry in entries if entry[0] is not None}
+                for cache in manifest['caches'].values()
+                for name, entries in cache['types'].items()
+            }
+            for manifest in manifests
+        ]
+        result = dict()
+        for name in sorted(set(old_items) | set(new_items)):
+            before = old_items.get(name, {})
+            after = new_items.get(name, {})
+            changes = {
+                'created': sorted(uuid for uuid in after if uuid not in before),
+                'modified': sorted(uuid for uuid in after if uuid in before and after[uuid] != before[uuid]),
+                'deleted': sorted(uuid for uuid in before if uuid not in after),
+            }
+            if any(changes.values()):
+                result[name] = changes
+        return result
+
+    def load_metadata(self, name: str):
+        path = Path.joinpath(self.directory, f'.{name}.json')
+        if not path.exists():
+            return None
+        with open(path, 'r') as f:
+            return json.load(f)
+
+    def save_metadata(self, name: str, data: Dict):
+        atomic_write(Path.joinpath(self.directory, f'.{name}.json'), json.dumps(data, sort_keys=True).encode())
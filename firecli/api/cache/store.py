@@ -0,0 +1,671 @@
+import codecs
+import fcntl
+import gzip
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+from abc import ABC, abstractmethod
+from contextlib import closing, contextmanager
+from datetime import datetime
+from logging import getLogger
+from pathlib import Path
+from typing import Dict, Iterator, List
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = getLogger(__name__)
+
+# number of bytes that are read at once when streaming cache files
+STREAM_CHUNK_SIZE = 64 * 1024
+
+GZIP_MAGIC = b'\x1f\x8b'
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+# file suffix of each supported cache file format
+FORMATS = {
+    'json': '.json',
+    'compact': '.json',
+    'gzip': '.json.gz',
+    'zstd': '.json.zst',
+    'msgpack': '.msgpack',
+}
+
+
+def available_formats():
+    """Cache file formats that are supported by the installed libraries
+    """
+    unavailable = {'zstd': zstandard, 'msgpack': msgpack}
+    return [fmt for fmt in FORMATS if unavailable.get(fmt, True) is not None]
+
+
+def dumps(data, fmt='json'):
+    """Serialize cached data to bytes in the requested file format
+    """
+    if fmt not in available_formats():
+        raise ValueError(f'Cache format "{fmt}" is not supported. Available formats: {available_formats()}')
+    if fmt == 'msgpack':
+        return msgpack.packb(data, use_bin_type=True)
+    if fmt == 'json':
+        return json.dumps(data, indent=4, ensure_ascii=False, sort_keys=True).encode()
+    raw = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode()
+    if fmt == 'gzip':
+        return gzip.compress(raw, compresslevel=6)
+    if fmt == 'zstd':
+        return zstandard.ZstdCompressor().compress(raw)
+    return raw
+
+
+def loads(raw: bytes):
+    """Deserialize cached data. The file format is detected automatically
+    """
+    if raw.startswith(GZIP_MAGIC):
+        return json.loads(gzip.decompress(raw))
+    if raw.startswith(ZSTD_MAGIC):
+        if zstandard is None:
+            raise ValueError('Cache file is zstd compressed, but zstandard is not installed')
+        return json.loads(zstandard.ZstdDecompressor().decompress(raw))
+    if raw.lstrip()[:1] in (b'[', b'{'):
+        return json.loads(raw)
+    if msgpack is None:
+        raise ValueError('Cache file is msgpack encoded, but msgpack is not installed')
+    return msgpack.unpackb(raw, raw=False)
+
+
+def _iter_json(stream, chunk_size=STREAM_CHUNK_SIZE):
+    """Decode the items of a json list one at a time. Only the current item and the read buffer are kept in memory.
+    The read size is doubled while an item does not fit into the buffer
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder('utf-8')()
+    buffer, pos, size, started, eof = '', 0, chunk_size, False, False
+    while True:
+        while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+            pos += 1
+        if pos < len(buffer):
+            if not started:
+                if buffer[pos] != '[':
+                    raise ValueError('Cache file does not contain a list')
+                started = True
+                pos += 1
+                continue
+            if buffer[pos] == ']':
+                return
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+                if end < len(buffer) or eof:
+                    yield item
+                    pos = end
+                    size = chunk_size
+                    continue
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                size *= 2
+        if eof:
+            raise ValueError('Unexpected end of cache file')
+        chunk = stream.read(size)
+        eof = not chunk
+        buffer = buffer[pos:] + utf8.decode(chunk, final=eof)
+        pos = 0
+
+
+def iter_items(f) -> Iterator:
+    """Deserialize the items of a cached list one at a time from binary file `f`. The file format is detected
+    automatically
+    """
+    head = f.read(4)
+    f.seek(0)
+    if head.startswith(GZIP_MAGIC):
+        yield from _iter_json(gzip.GzipFile(fileobj=f))
+    elif head.startswith(ZSTD_MAGIC):
+        if zstandard is None:
+            raise ValueError('Cache file is zstd compressed, but zstandard is not installed')
+        yield from _iter_json(zstandard.ZstdDecompressor().stream_reader(f))
+    elif head.lstrip()[:1] in (b'[', b'{', b''):
+        yield from _iter_json(f)
+    else:
+        if msgpack is None:
+            raise ValueError('Cache file is msgpack encoded, but msgpack is not installed')
+        unpacker = msgpack.Unpacker(f, raw=False)
+        for _ in range(unpacker.read_array_header()):
+            yield unpacker.unpack()
+
+
+def atomic_write(path: Path, data: bytes, sync=True):
+    """Write data to a temporary file in the same directory and rename it into place, so readers either see the
+    previous or the new file content but never a partially written file. The file is flushed to disk before it is
+    renamed unless `sync` is False
+    """
+    fd, tmp = tempfile.mkstemp(dir=str(path.parent), prefix=f'.{path.name}.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            if sync:
+                os.fsync(f.fileno())
+        os.replace(tmp, str(path))
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+
+class CacheRoot(object):
+    """Lock file and generation marker of a cache directory. Processes that use the same cache directory
+    synchronise using the lock file. Writers hold an exclusive lock while a new generation is saved, readers hold a
+    shared lock only while reading, so downloads of concurrent runs are not serialised. All stores of a cache
+    (e.g. objects, policies, devices) share the lock and generation of the cache root, so every saved generation
+    is consistent across all cached types
+    """
+
+    LOCKFILE = '.lock'
+    GENERATION = '.generation.json'
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+        self._mutex = threading.RLock()
+        self._depth = 0
+
+    @contextmanager
+    def lock(self, shared=False):
+        """Hold the cache directory lock. Nested calls reuse the lock that is already held
+        """
+        with self._mutex:
+            if self._depth:
+                self._depth += 1
+                try:
+                    yield
+                finally:
+                    self._depth -= 1
+                return
+            with open(Path.joinpath(self.directory, self.LOCKFILE), 'a') as f:
+                fcntl.flock(f.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+                self._depth = 1
+                try:
+                    yield
+                finally:
+                    self._depth = 0
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def generation(self):
+        """Number of the currently saved cache generation. 0 if the cache was never saved
+        """
+        path = Path.joinpath(self.directory, self.GENERATION)
+        with self.lock(shared=True):
+            if not path.exists():
+                return 0
+            with open(path, 'r') as f:
+                return json.load(f).get('generation', 0)
+
+    def publish(self):
+        """Mark the saved cache as new generation. Called last while holding the exclusive lock
+        """
+        with self.lock():
+            generation = self.generation() + 1
+            data = {'generation': generation, 'saved': datetime.now().isoformat()}
+            atomic_write(Path.joinpath(self.directory, self.GENERATION), json.dumps(data, sort_keys=True).encode())
+        return generation
+
+
+_roots = dict()
+_roots_lock = threading.Lock()
+
+
+def cache_root(directory: Path):
+    """Process-wide CacheRoot of `directory`, so stores of the same cache reuse a lock that is already held
+    """
+    key = str(Path(directory).resolve())
+    with _roots_lock:
+        if key not in _roots:
+            _roots[key] = CacheRoot(Path(directory))
+        return _roots[key]
+
+
+class Store(ABC):
+    """Base class of all stores. Stores save the cached types of one sub-cache to `directory`. Locking and
+    generation tracking are shared with all stores of cache `root`, which defaults to `directory`
+    """
+
+    QUERYABLE = False
+
+    def __init__(self, directory: Path, children=None, fmt='json', root: Path = None):
+        self.directory = directory
+        self.children = children
+        self.fmt = fmt
+        self.root = cache_root(root if root is not None else directory)
+
+    def lock(self, shared=False):
+        """Hold the lock of the cache root
+        """
+        return self.root.lock(shared)
+
+    def generation(self):
+        return self.root.generation()
+
+    def publish(self):
+        return self.root.publish()
+
+    @abstractmethod
+    def load_metadata(self, name: str):
+        """Read metadata `name` (e.g. manifest, index)
+
+        :return: saved data or None if metadata has not been saved
+        """
+
+    @abstractmethod
+    def save_metadata(self, name: str, data: Dict):
+        """Save metadata `name`. Metadata is replaced atomically
+        """
+
+
+class JsonStore(Store):
+    """Store each cached type in a separate file. Files are json documents, optionally compressed, or msgpack
+    encoded depending on `fmt`. Metadata is stored in hidden json files. Files are replaced atomically.
+
+    If `sharded` is set, children of each item (e.g. rules of a policy) are saved to a separate shard file
+    `<type>/<id>` and the type file only contains the items themselves, so single items can be read without
+    parsing the children of all other items
+    """
+
+    def __init__(self, directory: Path, children=None, fmt='json', sharded=False, root: Path = None):
+        super().__init__(directory, children, fmt, root)
+        self.sharded = sharded and children is not None
+
+    @staticmethod
+    def _files(directory: Path):
+        """Map of file names without suffix to cache files in `directory` regardless of the format they were
+        saved in
+        """
+        files = dict()
+        if not directory.is_dir():
+            return files
+        for f in sorted(directory.iterdir()):
+            if f.is_file() and not f.name.startswith('.'):
+                for suffix in set(FORMATS.values()):
+                    if f.name.endswith(suffix):
+                        files.setdefault(f.name[: -len(suffix)], []).append(f)
+        return files
+
+    @staticmethod
+    def _newest(files: List[Path]):
+        return max(files, key=lambda f: f.stat().st_mtime)
+
+    def _read_file(self, files: List[Path]):
+        path = self._newest(files)
+        logger.debug('Loading cache file %s', path)
+        with open(path, 'rb') as f:
+            return loads(f.read())
+
+    def _write_file(self, directory: Path, name: str, data, stale: List[Path]):
+        filepath = Path.joinpath(directory, f'{name}{FORMATS[self.fmt]}')
+        atomic_write(filepath, dumps(data, self.fmt))
+        for f in stale:
+            if f != filepath:
+                f.unlink()
+
+    def _attach_shard(self, item: Dict, shards: Dict):
+        if 'id' in item and item['id'] in shards:
+            item[self.children] = self._read_file(shards[item['id']])
+        return item
+
+    def names(self):
+        return list(self._files(self.directory).keys())
+
+    def read(self, name: str):
+        with self.lock(shared=True):
+            items = self._read_file(self._files(self.directory)[name])
+            if self.sharded:
+                shards = self._files(Path.joinpath(self.directory, name))
+                items = [self._attach_shard(item, shards) for item in items]
+            return items
+
+    def read_item(self, name: str, position: int):
+        """Read a single item of type `name` including its children. Only the shard of the item is read
+        """
+        with self.lock(shared=True):
+            item = self._read_file(self._files(self.directory)[name])[position]
+            if self.sharded and 'id' in item:
+                shard = self._files(Path.joinpath(self.directory, name)).get(item['id'])
+                if shard:
+                    item[self.children] = self._read_file(shard)
+            return item
+
+    def _open(self, directory: Path, name: str):
+        """Open newest cache file `name` in `directory`. Files are replaced atomically, so an open file keeps
+        returning the content it had when it was opened
+
+        :return: binary file or None if file does not exist
+        """
+        with self.lock(shared=True):
+            files = self._files(directory).get(name)
+            if not files:
+                return None
+            path = self._newest(files)
+            logger.debug('Streaming cache file %s', path)
+            return open(path, 'rb')
+
+    def iter_read(self, name: str):
+        """Yield items of type `name` one at a time. Children are only included if they are not sharded
+        """
+        f = self._open(self.directory, name)
+        if f is None:
+            raise KeyError(name)
+        with f:
+            yield from iter_items(f)
+
+    def iter_children(self, name: str, uuid: str):
+        """Yield children of item `uuid` of type `name` one at a time
+        """
+        f = self._open(Path.joinpath(self.directory, name), uuid) if self.sharded else None
+        if f is not None:
+            with f:
+                yield from iter_items(f)
+            return
+        for item in self.iter_read(name):
+            if item.get('id') == uuid:
+                yield from item.get(self.children, [])
+                return
+
+    def load(self):
+        with self.lock(shared=True):
+            return {name: self.read(name) for name in self.names()}
+
+    def save(self, cache: Dict):
+        with self.lock():
+            files = self._files(self.directory)
+            for name, items in cache.items():
+                if self.sharded:
+                    shard_dir = Path.joinpath(self.directory, name)
+                    shard_dir.mkdir(exist_ok=True)
+                    shards = self._files(shard_dir)
+                    for item in items:
+                        if self.children in item:
+                            self._write_file(shard_dir, item['id'], item[self.children], shards.pop(item['id'], []))
+                    for stale in shards.values():
+                        for f in stale:
+                            f.unlink()
+                    items = [{k: v for k, v in item.items() if k != self.children} for item in items]
+                self._write_file(self.directory, name, items, files.get(name, []))
+
+    def load_metadata(self, name: str):
+        path = Path.joinpath(self.directory, f'.{name}.json')
+        with self.lock(shared=True):
+            if not path.exists():
+                return None
+            with open(path, 'r') as f:
+                return json.load(f)
+
+    def save_metadata(self, name: str, data: Dict):
+        with self.lock():
+            atomic_write(
+                Path.joinpath(self.directory, f'.{name}.json'),
+                json.dumps(data, ensure_ascii=False, sort_keys=True).encode(),
+            )
+
+
+class SqliteStore(Store):
+    """Store cached items in a sqlite database. Items are saved to the `items` table, data that is downloaded
+    separately for each item (e.g. overrides, rules) is saved to a table named after the children key. Both tables
+    are indexed by id, type and name. Children are additionally indexed by parent (e.g. policy) and device so
+    commands can query single rows without loading the complete cache. Saves are performed in a single transaction.
+    Children are always stored in separate rows, so `sharded` has no effect
+    """
+
+    QUERYABLE = True
+    FILENAME = 'cache.sqlite3'
+
+    def __init__(self, directory: Path, children=None, fmt='json', sharded=False, root: Path = None):
+        super().__init__(directory, children, fmt, root)
+        self.path = Path.joinpath(directory, self.FILENAME)
+        with self._session(shared=False) as conn:
+            conn.executescript(self._schema())
+
+    def _connect(self):
+        return sqlite3.connect(str(self.path))
+
+    @contextmanager
+    def _session(self, shared=True):
+        """Connection that holds the directory lock. Exclusive sessions are committed as a single transaction
+        """
+        with self.lock(shared=shared), closing(self._connect()) as conn:
+            if shared:
+                yield conn
+            else:
+                with conn:
+                    yield conn
+
+    def _schema(self):
+        schema = (
+            'CREATE TABLE IF NOT EXISTS metadata (name TEXT PRIMARY KEY, data TEXT);'
+            'CREATE TABLE IF NOT EXISTS items ('
+            'type TEXT, position INTEGER, id TEXT, name TEXT, has_children INTEGER, data TEXT, '
+            'PRIMARY KEY (type, position));'
+            'CREATE INDEX IF NOT EXISTS items_id ON items (id);'
+            'CREATE INDEX IF NOT EXISTS items_name ON items (type, name);'
+        )
+        if self.children:
+            schema += (
+                f'CREATE TABLE IF NOT EXISTS {self.children} ('
+                'type TEXT, parent TEXT, position INTEGER, id TEXT, name TEXT, device TEXT, data TEXT, '
+                'PRIMARY KEY (parent, position));'
+                f'CREATE INDEX IF NOT EXISTS {self.children}_id ON {self.children} (id);'
+                f'CREATE INDEX IF NOT EXISTS {self.children}_name ON {self.children} (type, name);'
+                f'CREATE INDEX IF NOT EXISTS {self.children}_device ON {self.children} (device);'
+            )
+        return schema
+
+    @staticmethod
+    def _device(child: Dict):
+        """Target device of an override. Returns None for other children
+        """
+        try:
+            return child['overrides']['target']['id']
+        except (KeyError, TypeError):
+            return None
+
+    def names(self):
+        with self._session() as conn:
+            return [row[0] for row in conn.execute('SELECT DISTINCT type FROM items ORDER BY type')]
+
+    def _item(self, conn, row):
+        item = json.loads(row[1])
+        if self.children and row[2]:
+            item[self.children] = [
+                json.loads(data)
+                for (data,) in conn.execute(
+                    f'SELECT data FROM {self.children} WHERE parent = ? ORDER BY position', (row[0],)
+                )
+            ]
+        return item
+
+    def read(self, name: str):
+        with self._session() as conn:
+            rows = conn.execute(
+                'SELECT id, data, has_children FROM items WHERE type = ? ORDER BY position', (name,)
+            ).fetchall()
+            return [self._item(conn, row) for row in rows]
+
+    def load(self):
+        return {name: self.read(name) for name in self.names()}
+
+    def save(self, cache: Dict):
+        with self._session(shared=False) as conn:
+            conn.execute('DELETE FROM items')
+            if self.children:
+                conn.execute(f'DELETE FROM {self.children}')
+            for name, items in cache.items():
+                for position, item in enumerate(items):
+                    has_children = self.children in item if self.children else False
+                    data = {k: v for k, v in item.items() if k != self.children}
+                    conn.execute(
+                        'INSERT INTO items VALUES (?, ?, ?, ?, ?, ?)',
+                        (name, position, item.get('id'), item.get('name'), has_children, json.dumps(data)),
+                    )
+                    if has_children:
+                        conn.executemany(
+                            f'INSERT INTO {self.children} VALUES (?, ?, ?, ?, ?, ?, ?)',
+                            [
+                                (
+                                    name,
+                                    item.get('id'),
+                                    child_position,
+                                    child.get('id'),
+                                    child.get('name'),
+                                    self._device(child),
+                                    json.dumps(child),
+                                )
+                                for child_position, child in enumerate(item[self.children])
+                            ],
+                        )
+
+    def iter_read(self, name: str):
+        """Yield items of type `name` one at a time without their children
+        """
+        with closing(self._connect()) as conn:
+            for (data,) in conn.execute('SELECT data FROM items WHERE type = ? ORDER BY position', (name,)):
+                yield json.loads(data)
+
+    def iter_children(self, name: str, uuid: str):
+        """Yield children of item `uuid` one at a time
+        """
+        with closing(self._connect()) as conn:
+            for (data,) in conn.execute(
+                f'SELECT data FROM {self.children} WHERE type = ? AND parent = ? ORDER BY position', (name, uuid)
+            ):
+                yield json.loads(data)
+
+    def type_of(self, uuid: str):
+        """Get cached type of item `uuid`. Returns None if item is not cached
+        """
+        with self._session() as conn:
+            row = conn.execute('SELECT type FROM items WHERE id = ?', (uuid,)).fetchone()
+            return row[0] if row else None
+
+    def get(self, uuid: str):
+        """Get item or child by id
+        """
+        with self._session() as conn:
+            row = conn.execute('SELECT id, data, has_children FROM items WHERE id = ?', (uuid,)).fetchone()
+            if row:
+                return self._item(conn, row)
+            if self.children:
+                row = conn.execute(f'SELECT data FROM {self.children} WHERE id = ?', (uuid,)).fetchone()
+                if row:
+                    return json.loads(row[0])
+        return None
+
+    def get_by_name(self, name: str, item_name: str):
+        """Get item of type `name` by its name
+        """
+        with self._session() as conn:
+            row = conn.execute(
+                'SELECT id, data, has_children FROM items WHERE type = ? AND name = ?', (name, item_name)
+            ).fetchone()
+            return self._item(conn, row) if row else None
+
+    def children_by_device(self, device: str):
+        """Get all children that target a specific device (e.g. object overrides)
+        """
+        with self._session() as conn:
+            return [
+                json.loads(data)
+                for (data,) in conn.execute(
+                    f'SELECT data FROM {self.children} WHERE device = ? ORDER BY parent, position', (device,)
+                )
+            ]
+
+    def load_metadata(self, name: str):
+        with self._session() as conn:
+            row = conn.execute('SELECT data FROM metadata WHERE name = ?', (name,)).fetchone()
+            return json.loads(row[0]) if row else None
+
+    def save_metadata(self, name: str, data: Dict):
+        with self._session(shared=False) as conn:
+            conn.execute('INSERT OR REPLACE INTO metadata VALUES (?, ?)', (name, json.dumps(data)))
+
+
+class Checkpoint(object):
+    """Intermediate results of a cache download. Listings of completed types and batches of completed children
+    (e.g. overrides, rules) are saved to the hidden `.checkpoint` directory while downloading, so an interrupted
+    download can be resumed. The checkpoint is removed once the cache has been saved
+    """
+
+    DIRECTORY = '.checkpoint'
+    # number of buffered children that are saved together in one batch file
+    BATCH_SIZE = 1000
+
+    def __init__(self, directory: Path):
+        self.directory = Path.joinpath(directory, self.DIRECTORY)
+        self.batch = dict()
+
+    def begin(self, resume=False):
+        """Start a download. Existing checkpoints are discarded unless the download is resumed
+        """
+        if not resume:
+            self.clear()
+        elif self.directory.exists():
+            logger.info('Resuming download from checkpoint %s', self.directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        return self
+
+    def _write(self, name: str, data):
+        atomic_write(
+            Path.joinpath(self.directory, f'{name}.json'), json.dumps(data, separators=(',', ':')).encode()
+        )
+
+    def listing(self, name: str):
+        """Get checkpointed listing of type `name`
+
+        :return: tuple of items and download time or None if type has not been checkpointed
+        """
+        path = Path.joinpath(self.directory, f'listing-{name}.json')
+        if not path.exists():
+            return None
+        with open(path, 'r') as f:
+            data = json.load(f)
+        return data['items'], data['fetched']
+
+    def save_listing(self, name: str, items: List, fetched: str):
+        self._write(f'listing-{name}', {'fetched': fetched, 'items': items})
+
+    def children(self):
+        """Get all checkpointed children by key (e.g. id of the parent item)
+        """
+        children = dict()
+        for path in sorted(self.directory.glob('children-*.json')):
+            with open(path, 'r') as f:
+                children.update(json.load(f))
+        return children
+
+    def add_children(self, key: str, children: List):
+        """Add children of an item to the current batch. Batches are saved once they hold BATCH_SIZE children
+        """
+        self.batch[key] = children
+        if sum(len(items) for items in self.batch.values()) >= self.BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        """Save buffered children to a new batch file
+        """
+        if self.batch:
+            self._write(f'children-{len(list(self.directory.glob("children-*.json"))):06d}', self.batch)
+            self.batch = dict()
+
+    def clear(self):
+        self.batch = dict()
+        if self.directory.exists():
+            shutil.rmtree(self.directory)
+
+
+STORES = {'json': JsonStore, 'sqlite': SqliteStore}
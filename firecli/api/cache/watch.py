@@ -0,0 +1,93 @@
+import random
+import time
+from logging import getLogger
+
+from firecli.api.cache import FmcCache
+
+logger = getLogger(__name__)
+
+
+class CacheWatcher(object):
+    """Refresh the sub-caches of a FmcCache periodically. All sub-caches refreshed in one round are saved as a
+    single new cache generation. A snapshot of the complete cache is saved after each refresh round that changed
+    items if `history` is set.
+
+    Every sub-cache is scheduled separately. The refresh interval of a sub-cache is halved (down to `interval`) if
+    items or their children changed since its last refresh and doubled (up to `max_interval`) if nothing changed, so
+    frequently changing types such as policies are refreshed more often. Sub-caches that are due at the same time are
+    refreshed in PRIORITY order. Intervals are randomized by `jitter` to avoid refreshing in lockstep with other
+    schedulers
+    """
+
+    PRIORITY = ['policies', 'objects', 'devices']
+
+    def __init__(
+        self,
+        cache: FmcCache,
+        interval: int,
+        max_interval: int = None,
+        jitter: float = 0.1,
+        clock=time.monotonic,
+        sleep=time.sleep,
+    ):
+        self.cache = cache
+        self.min_interval = interval
+        self.max_interval = max(max_interval or interval, interval)
+        self.jitter = jitter
+        self.clock = clock
+        self.sleep = sleep
+        self.intervals = {key: interval for key in cache.cache}
+        self.due = {key: clock() for key in cache.cache}
+
+    def _jittered(self, interval: float):
+        return interval * (1 + random.uniform(-self.jitter, self.jitter))
+
+    def _order(self):
+        return sorted(
+            self.cache.cache, key=lambda key: self.PRIORITY.index(key) if key in self.PRIORITY else len(self.PRIORITY)
+        )
+
+    def refresh(self, key: str):
+        """Refresh sub-cache `key` and schedule its next refresh. The refreshed sub-cache is saved by `run_pending`
+
+        :return: number of changed items or None if the refresh failed
+        """
+        item = self.cache.cache[key]
+        try:
+            changed = item.refresh()
+        except Exception as exc:  # noqa: B902
+            logger.error('Failed to refresh %s cache: %s', item.cache_type, str(exc))
+            changed = None
+        if changed:
+            self.intervals[key] = max(self.min_interval, self.intervals[key] / 2)
+        else:
+            self.intervals[key] = min(self.max_interval, self.intervals[key] * 2)
+        self.due[key] = self.clock() + self._jittered(self.intervals[key])
+        logger.info('Next refresh of %s cache in %.0f seconds', item.cache_type, self.due[key] - self.clock())
+        return changed
+
+    def run_pending(self):
+        """Refresh all sub-caches that are due and save the refreshed sub-caches as a single new generation
+
+        :return: keys of the refreshed sub-caches
+        """
+        refreshed = [key for key in self._order() if self.due[key] <= self.clock()]
+        results = {key: self.refresh(key) for key in refreshed}
+        saved = [key for key in refreshed if results[key] is not None]
+        if saved:
+            changed = sum(results[key] for key in saved)
+            try:
+                self.cache.save(saved, snapshot=bool(changed) or not self.cache.snapshots.generations())
+            except Exception as exc:  # noqa: B902
+                logger.error('Failed to save %s cache: %s', ', '.join(saved), str(exc))
+        return refreshed
+
+    def run(self, count: int = 0):
+        """Refresh sub-caches when they are due. Runs until interrupted or until `count` refresh rounds completed
+        """
+        rounds = 0
+        while not count or rounds < count:
+            if self.run_pending():
+                rounds += 1
+                continue
+            self.sleep(max(0, min(self.due.values()) - self.clock()))
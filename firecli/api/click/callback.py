@@ -6,7 +6,6 @@ import yaml
 
 from firecli.api import cfg
 
-from fireREST import FMC
 from fireREST.exceptions import ResourceNotFoundError
 
 
@@ -44,30 +43,36 @@ def validate_and_load_yaml(ctx, param, value):
 
 
 def resolve_device_name(ctx, param, value):
-    """Click callback used to resolve device name to FMC api object
+    """Click callback used to resolve device name to FMC api object. Devices are read from cache if it is fresh
+    enough
     """
-    fmc = ctx.obj.api.fmc  # type: FMC
+    api = ctx.obj.api
     name = copy.copy(value)
     if value:
         try:
-            devicehapair = fmc.devicehapair.ftdhapair.get(name=value)
+            devicehapair = api.cached_get('ftdhapair', item_name=value) or api.fmc.devicehapair.ftdhapair.get(
+                name=value
+            )
             value = devicehapair['primary']
             value['name'] = name
         except ResourceNotFoundError:
             try:
-                value = fmc.device.devicerecord.get(name=value)
+                value = api.cached_get('devicerecord', item_name=value) or api.fmc.device.devicerecord.get(
+                    name=value
+                )
             except ResourceNotFoundError:
                 raise click.BadParameter(f'"{value}" not found. Make sure device exists...')
     return value
 
 
 def resolve_accesspolicy_name(ctx, param, value):
-    """Click callback used to resolve accesspolicy name to FMC api object
+    """Click callback used to resolve accesspolicy name to FMC api object. Accesspolicies are read from cache if it
+    is fresh enough
     """
-    fmc = ctx.obj.api.fmc  # type: FMC
+    api = ctx.obj.api
     if value:
         try:
-            return fmc.policy.accesspolicy.get(name=value)
+            return api.cached_get('accesspolicy', item_name=value) or api.fmc.policy.accesspolicy.get(name=value)
         except ResourceNotFoundError:
             raise click.BadParameter(f'"{value}" not found. Make sure accesspolicy exists...')
     return value
@@ -1,5 +1,5 @@
 from logging import getLogger
-from typing import Dict, List
+from typing import Dict, Iterable, List
 
 import netaddr
 
@@ -9,7 +9,7 @@ logger = getLogger()
 
 
 class ZoneCompliance(object):
-    def __init__(self, zones: List, matrix: Dict, accessrules: List):
+    def __init__(self, zones: List, matrix: Dict, accessrules: Iterable):
         self.zones = self.parse_zones(zones)
         self.matrix = matrix
         self.accessrules = accessrules
@@ -104,6 +104,9 @@ class ZoneCompliance(object):
         return report
 
     def check_compliance(self):
+        """Check accessrules for compliance violations. Accessrules are checked one at a time while they are
+        iterated, so they can be streamed from cache
+        """
         report = list()
         for accessrule in self.accessrules:
             report.append(self.check_accessrule(accessrule))
@@ -0,0 +1,194 @@
+import importlib
+import json
+import pkgutil
+import threading
+import time
+from logging import getLogger
+from pathlib import Path
+
+import fireREST
+import fireREST.fmc
+import requests
+from fireREST import defaults
+from packaging import version
+
+from firecli.api.cache.store import atomic_write
+
+logger = getLogger(__name__)
+
+# seconds an fmc access token is valid after it has been generated or refreshed
+TOKEN_LIFETIME = 30 * 60
+# tokens are not reused if they expire within the given number of seconds
+TOKEN_MARGIN = 60
+# tokens refreshed within the given number of seconds are not refreshed again by other workers
+REFRESH_GRACE = 5
+
+
+def namespaces():
+    """fireREST namespace classes (e.g. Object, Policy) by the attribute name used by `fireREST.FMC`
+    """
+    result = dict()
+    for module in pkgutil.iter_modules(fireREST.fmc.__path__):
+        namespace = importlib.import_module(f'{fireREST.fmc.__name__}.{module.name}')
+        for name, cls in vars(namespace).items():
+            if isinstance(cls, type) and name.lower() == module.name:
+                result[module.name] = cls
+    return result
+
+
+class TokenStore(object):
+    """Save fmc auth tokens to a file, so successive firecli runs reuse a valid token instead of authenticating
+    again. Tokens are saved per fmc and user. The file is only readable by the current user
+    """
+
+    FILENAME = '.tokens.json'
+
+    def __init__(self, directory: str, clock=time.time):
+        self.path = Path(directory, self.FILENAME)
+        self.clock = clock
+
+    @staticmethod
+    def key(hostname: str, username: str):
+        return f'{username}@{hostname}'
+
+    def _read(self):
+        if not self.path.exists():
+            return dict()
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except ValueError:
+            logger.warning('Ignoring invalid token store %s', self.path)
+            return dict()
+
+    def load(self, hostname: str, username: str):
+        """Get saved token of `username` on fmc `hostname`
+
+        :return: token or None if no token is saved or the saved token expires soon
+        """
+        token = self._read().get(self.key(hostname, username))
+        if token is None or self.clock() - token['issued'] > TOKEN_LIFETIME - TOKEN_MARGIN:
+            return None
+        return token
+
+    def save(self, hostname: str, username: str, token: dict):
+        tokens = self._read()
+        tokens[self.key(hostname, username)] = token
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write(self.path, json.dumps(tokens, sort_keys=True).encode())
+
+    def discard(self, hostname: str, username: str):
+        tokens = self._read()
+        if tokens.pop(self.key(hostname, username), None) is not None:
+            atomic_write(self.path, json.dumps(tokens, sort_keys=True).encode())
+
+
+class Connection(fireREST.fmc.Connection):
+    """fireREST connection that reuses auth tokens from `token_store` if set. A new token is generated if no valid
+    token is saved. Generated and refreshed tokens are saved to `token_store`. All requests including the
+    authentication are sent using `session` if set. Tokens are refreshed by one worker at a time
+    """
+
+    def __init__(self, *args, token_store: TokenStore = None, session: requests.Session = None, **kwargs):
+        self.token_store = token_store
+        self.custom_session = session
+        # reentrant, as fireREST refreshes the token again if the refresh request itself is rejected with a 401
+        self._refresh_lock = threading.RLock()
+        self.issued = None
+        self.saved_version = None
+        super().__init__(*args, **kwargs)
+        self.save_token()
+
+    @property
+    def username(self):
+        return getattr(self.cred, 'username', None)
+
+    def login(self):
+        # fireREST creates its own session right before authenticating
+        if self.custom_session is not None:
+            self.session = self.custom_session
+        token = self.token_store.load(self.hostname, self.username) if self.token_store and not self.cdo else None
+        if token is None:
+            super().login()
+            self.issued = time.time()
+            self.save_token()
+            return
+        logger.info('Reusing saved authentication token for Firepower Management Center (%s)', self.hostname)
+        self.headers['X-auth-access-token'] = token['access_token']
+        self.headers['X-auth-refresh-token'] = token['refresh_token']
+        self.domains = token['domains']
+        self.refresh_counter = token['refresh_counter']
+        self.issued = token['issued']
+        self.saved_version = token.get('version')
+
+    def refresh(self):
+        with self._refresh_lock:
+            # workers that were rejected with the same expired token must not refresh it again
+            if self.issued is not None and time.time() - self.issued < REFRESH_GRACE:
+                return
+            # a refresh is only required if the current token is invalid, so it must not be reused by other runs
+            if self.token_store and not self.cdo:
+                self.token_store.discard(self.hostname, self.username)
+            super().refresh()
+            self.issued = time.time()
+            self.save_token()
+
+    def get_version(self):
+        if self.saved_version:
+            return version.parse(self.saved_version)
+        return super().get_version()
+
+    def save_token(self):
+        if not self.token_store or self.cdo or 'X-auth-access-token' not in self.headers:
+            return
+        self.token_store.save(
+            self.hostname,
+            self.username,
+            {
+                'access_token': self.headers['X-auth-access-token'],
+                'refresh_token': self.headers['X-auth-refresh-token'],
+                'domains': self.domains,
+                'refresh_counter': self.refresh_counter,
+                'issued': self.issued,
+                'version': str(self.version) if getattr(self, 'version', None) else None,
+            },
+        )
+
+
+class FMC(fireREST.FMC):
+    """fireREST client that authenticates using a `Connection` that can reuse saved auth tokens and send requests
+    using a custom `session`, e.g. a `firecli.api.session.ThrottledSession`. Bulk operations send up to
+    `concurrency` requests at the same time using `firecli.api.aio.AsyncFMC`
+    """
+
+    def __init__(
+        self,
+        hostname: str,
+        username: str,
+        password: str,
+        protocol=defaults.API_PROTOCOL,
+        verify_cert=False,
+        domain=defaults.API_DEFAULT_DOMAIN,
+        timeout=defaults.API_REQUEST_TIMEOUT,
+        dry_run=defaults.DRY_RUN,
+        token_store: TokenStore = None,
+        session: requests.Session = None,
+        concurrency=1,
+    ):
+        self.concurrency = concurrency
+        self.conn = Connection(
+            hostname,
+            username,
+            password,
+            protocol=protocol,
+            verify_cert=verify_cert,
+            domain=domain,
+            timeout=timeout,
+            dry_run=dry_run,
+            token_store=token_store,
+            session=session,
+        )
+        self.domain = self.conn.domain
+        self.version = self.conn.version
+        for name, namespace in namespaces().items():
+            setattr(self, name, namespace(self.conn))
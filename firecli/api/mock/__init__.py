@@ -0,0 +1,525 @@
+import json
+import random
+import re
+import ssl
+import subprocess
+import threading
+import time
+import uuid
+from base64 import b64decode
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from logging import getLogger
+from math import ceil
+from pathlib import Path
+from typing import Dict, List
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+from fireREST import defaults
+
+logger = getLogger(__name__)
+
+DOMAIN_ID = 'e276abec-e0f2-11e3-8169-6d9ed49b625f'
+DOMAIN_NAME = 'Global'
+SERVER_VERSION = '7.0.1 (build 84)'
+# items per page if a listing does not set `limit`
+PAGE_LIMIT = 25
+# prefixes of fmc api urls that are removed to get the path of a resource
+PREFIXES = [
+    f'{defaults.API_CONFIG_URL}/domain/{DOMAIN_ID}',
+    f'{defaults.API_PLATFORM_URL}/domain/{DOMAIN_ID}',
+    defaults.API_PLATFORM_URL,
+]
+AFA_LOGIN_URL = '/fa/server/connection/login'
+AFA_RISKY_RULES_URL = '/fa/server/risks/riskyRules'
+# path and type of generated objects
+OBJECT_PATHS = {
+    'host': ('/object/hosts', 'Host'),
+    'network': ('/object/networks', 'Network'),
+    'range': ('/object/ranges', 'Range'),
+    'networkgroup': ('/object/networkgroups', 'NetworkGroup'),
+    'url': ('/object/urls', 'Url'),
+}
+OVERRIDABLE = ['host', 'network', 'range', 'networkgroup']
+RISKS = [
+    ('C00001', 'Any service can access internal networks'),
+    ('C00002', 'Internet access to sensitive ports'),
+    ('C00003', 'Rule allows any destination'),
+]
+UUID = re.compile(r'^[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}$')
+
+
+def _ref(item: Dict):
+    return {'id': item['id'], 'name': item['name'], 'type': item['type']}
+
+
+def _value(name: str, index: int):
+    if name == 'host':
+        return f'198.18.{index // 250 % 250}.{index % 250 + 1}'
+    if name == 'network':
+        return f'10.{index // 250 % 250}.{index % 250}.0/24'
+    if name == 'range':
+        return f'172.16.{index % 250}.1-172.16.{index % 250}.100'
+    return f'https://www{index}.example.com'
+
+
+def generate(objects=100, rules=100, devices=2, policies=1, overrides=0.5, risky=0.1, seed=0):
+    """Synthetic fmc and afa data for `MockServer`. Objects are split evenly across object types and rules across
+    accesspolicies. Each device is assigned to one of the policies. A share of `overrides` of the overridable
+    objects is overridden on every device and a share of `risky` of the rules is reported as risky by afa
+
+    :return: dict with fmc items by resource path (e.g. /object/hosts) and afa risky rules by device name
+    """
+    rng = random.Random(seed)
+
+    def uid():
+        return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+    fmc = {
+        '/info/domain': [{'id': DOMAIN_ID, 'name': DOMAIN_NAME, 'type': 'Domain'}],
+        '/info/serverversion': [{'serverVersion': SERVER_VERSION, 'type': 'ServerVersion'}],
+        '/audit/auditrecords': [],
+        '/devicehapairs/ftddevicehapairs': [],
+        '/deployment/deploymentrequests': [],
+    }
+    fmc['/devices/devicerecords'] = [
+        {
+            'id': uid(),
+            'name': f'ftd{index + 1:02d}.example.com',
+            'hostName': f'198.19.0.{index + 1}',
+            'model': 'Cisco Firepower Threat Defense for VMware',
+            'type': 'Device',
+        }
+        for index in range(devices)
+    ]
+    targets = [_ref(device) for device in fmc['/devices/devicerecords']]
+
+    names = list(OBJECT_PATHS)
+    for name in names:
+        fmc[OBJECT_PATHS[name][0]] = []
+    for index in range(objects):
+        name = names[index % len(names)]
+        path, kind = OBJECT_PATHS[name]
+        item = {'id': uid(), 'name': f'FireCLI-{kind}-{index}', 'type': kind, 'overridable': False}
+        if name == 'networkgroup':
+            members = fmc[OBJECT_PATHS['host'][0]][-3:]
+            item['objects'] = [_ref(member) for member in members]
+        else:
+            item['value'] = _value(name, index)
+        if name in OVERRIDABLE and rng.random() < overrides:
+            item['overridable'] = True
+            fmc[f'{path}/{item["id"]}/overrides'] = [
+                {
+                    'id': item['id'],
+                    'name': item['name'],
+                    'type': kind,
+                    'overrides': {'parent': _ref(item), 'target': target},
+                    **(
+                        {'literals': [{'type': 'Host', 'value': _value('host', index + offset)}]}
+                        if name == 'networkgroup'
+                        else {'value': _value(name, index + offset)}
+                    ),
+                }
+                for offset, target in enumerate(targets, start=1)
+            ]
+        fmc[path].append(item)
+
+    fmc['/policy/accesspolicies'] = [
+        {
+            'id': uid(),
+            'name': f'FireCLI-AccessPolicy-{index}',
+            'type': 'AccessPolicy',
+            'defaultAction': {'action': 'BLOCK', 'type': 'AccessPolicyDefaultAction'},
+        }
+        for index in range(policies)
+    ]
+    fmc['/assignment/policyassignments'] = []
+    hosts = fmc[OBJECT_PATHS['host'][0]] or [{'id': uid(), 'name': 'any-ipv4', 'type': 'Network'}]
+    networks = fmc[OBJECT_PATHS['network'][0]] or hosts
+    afa = {target['name']: [] for target in targets}
+    for index, policy in enumerate(fmc['/policy/accesspolicies']):
+        path = f'/policy/accesspolicies/{policy["id"]}'
+        count = rules // policies + (1 if index < rules % policies else 0)
+        fmc[f'{path}/accessrules'] = [
+            {
+                'id': uid(),
+                'name': f'FireCLI-AccessRule-{index}-{number}',
+                'type': 'AccessRule',
+                'action': rng.choice(['ALLOW', 'TRUST', 'BLOCK']),
+                'enabled': True,
+                'sourceNetworks': {'objects': [_ref(rng.choice(hosts))]},
+                'destinationNetworks': {'objects': [_ref(rng.choice(networks))]},
+                'metadata': {
+                    'ruleIndex': number + 1,
+                    'section': 'Mandatory',
+                    'category': '--Undefined--',
+                    'accessPolicy': _ref(policy),
+                    'domain': {'id': DOMAIN_ID, 'name': DOMAIN_NAME, 'type': 'Domain'},
+                },
+            }
+            for number in range(count)
+        ]
+        assigned = targets[index::policies]
+        fmc['/assignment/policyassignments'].append(
+            {'id': policy['id'], 'type': 'PolicyAssignment', 'policy': _ref(policy), 'targets': assigned}
+        )
+        fmc[f'{path}/operational/hitcounts'] = [
+            {
+                'type': 'HitCount',
+                'rule': _ref(rule),
+                'hitCount': rng.randint(0, 100000),
+                'firstHitTimeStamp': '2021-01-01T00:00:00Z',
+                'lastHitTimeStamp': '2021-06-01T00:00:00Z',
+                'metadata': {'policy': _ref(policy), 'device': target},
+            }
+            for target in assigned
+            for rule in fmc[f'{path}/accessrules']
+        ]
+        for target in assigned:
+            for rule in fmc[f'{path}/accessrules']:
+                if rng.random() < risky:
+                    code, title = rng.choice(RISKS)
+                    afa[target['name']].append(
+                        {'ruleId': rule['id'].replace('-', '_'), 'risks': [{'code': code, 'title': title}]}
+                    )
+    fmc['/deployment/deployabledevices'] = [
+        {'name': target['name'], 'device': target, 'type': 'DeployableDevice', 'canBeDeployed': True}
+        for target in targets[::2]
+    ]
+    return {'fmc': fmc, 'afa': afa}
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    """Request handler that passes requests to the `MockServer` of its http server"""
+
+    def _handle(self):
+        url = urlsplit(self.path)
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        status, headers, payload = self.server.mock.handle(
+            self.command, url.path, dict(parse_qsl(url.query)), self.headers, body
+        )
+        data = json.dumps(payload).encode() if payload is not None else b''
+        self.send_response(status)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    do_GET = do_POST = do_PUT = do_DELETE = _handle
+
+    def log_message(self, format, *args):
+        logger.debug('%s - %s', self.address_string(), format % args)
+
+
+def self_signed_certificate(directory: str, hostname='127.0.0.1'):
+    """Create a self-signed certificate and key for `hostname` in `directory` using the openssl command line tool,
+    e.g. to serve the mock over https
+
+    :return: paths of certificate and key file
+    """
+    certfile = str(Path(directory, 'mock.crt'))
+    keyfile = str(Path(directory, 'mock.key'))
+    subprocess.run(
+        [
+            'openssl',
+            'req',
+            '-x509',
+            '-newkey',
+            'rsa:2048',
+            '-nodes',
+            '-days',
+            '1',
+            '-subj',
+            f'/CN={hostname}',
+            '-keyout',
+            keyfile,
+            '-out',
+            certfile,
+        ],
+        check=True,
+        capture_output=True,
+    )
+    return certfile, keyfile
+
+
+class MockServer(object):
+    """Local stand-in for a Firepower Management Center and an AlgoSec Firewall Analyzer that serves `data` of
+    `generate` over http, so firecli can be tested and benchmarked offline. It implements authentication, paging,
+    overrides, hitcounts, deployments, audit records and risky rules. Every request is delayed by `latency`
+    seconds and requests exceeding `rate_limit` within `window` seconds are answered with 429 and a Retry-After
+    header of `retry_after` seconds. Credentials are checked if `username` and `password` are set. Requests are
+    served over https if `certfile` and `keyfile` are set
+    """
+
+    def __init__(
+        self,
+        data=None,
+        host='127.0.0.1',
+        port=0,
+        latency=0.0,
+        rate_limit=None,
+        window=60,
+        retry_after=1,
+        username=None,
+        password=None,
+        certfile=None,
+        keyfile=None,
+    ):
+        self.data = data if data is not None else generate()
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.window_size = window
+        self.retry_after = retry_after
+        self.username = username
+        self.password = password
+        self.certfile = certfile
+        self.keyfile = keyfile
+        self.tokens = set()
+        self.refresh_tokens = set()
+        self.sessions = set()
+        self.stats = {'requests': 0, 'throttled': 0}
+        self.window = deque()
+        self.httpd = None
+        self.thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def hostname(self):
+        """Hostname including the port, as used by fmc and afa clients
+        """
+        return f'{self.host}:{self.port}'
+
+    @property
+    def protocol(self):
+        return 'https' if self.certfile else 'http'
+
+    @property
+    def url(self):
+        return f'{self.protocol}://{self.hostname}'
+
+    def start(self):
+        self.httpd = ThreadingHTTPServer((self.host, self.port), MockHandler)
+        if self.certfile:
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(self.certfile, self.keyfile)
+            self.httpd.socket = context.wrap_socket(self.httpd.socket, server_side=True)
+        self.httpd.daemon_threads = True
+        self.httpd.mock = self
+        self.port = self.httpd.server_address[1]
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name='firecli-mock', daemon=True)
+        self.thread.start()
+        logger.info('Mock fmc and afa listening on %s', self.url)
+        return self
+
+    def stop(self):
+        if self.httpd is not None:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.thread.join()
+            self.httpd = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def expire_tokens(self):
+        """Invalidate all access tokens and afa sessions, e.g. to test re-authentication
+        """
+        with self._lock:
+            self.tokens.clear()
+            self.sessions.clear()
+
+    def throttled(self):
+        """Count a request and check whether it exceeds the rate limit of the current window
+        """
+        with self._lock:
+            self.stats['requests'] += 1
+            if not self.rate_limit:
+                return False
+            now = time.monotonic()
+            while self.window and now - self.window[0] >= self.window_size:
+                self.window.popleft()
+            if len(self.window) >= self.rate_limit:
+                self.stats['throttled'] += 1
+                return True
+            self.window.append(now)
+            return False
+
+    def handle(self, method: str, path: str, params: Dict, headers, body: bytes):
+        """Answer a request
+
+        :return: tuple of status code, response headers and json payload
+        """
+        if self.latency:
+            time.sleep(self.latency)
+        if self.throttled():
+            error = {'error': {'messages': [{'description': 'Too many requests'}]}}
+            return 429, {'Retry-After': str(self.retry_after)}, error
+        if path == defaults.API_AUTH_URL and method == 'POST':
+            return self.generate_token(headers)
+        if path == defaults.API_REFRESH_URL and method == 'POST':
+            return self.refresh_token(headers)
+        if path.startswith('/fa/'):
+            return self.afa(method, path, params, body)
+        if headers.get('X-auth-access-token') not in self.tokens:
+            return 401, {}, {'error': {'messages': [{'description': 'Access token invalid.'}]}}
+        for prefix in PREFIXES:
+            if path.startswith(f'{prefix}/'):
+                resource = path[len(prefix):].rstrip('/')
+                break
+        else:
+            return 404, {}, {'error': {'messages': [{'description': f'{path} not found'}]}}
+        data = json.loads(body) if body else None
+        with self._lock:
+            if method == 'GET':
+                return self.get(path, resource, params, headers)
+            return self.write(method, path, resource, data)
+
+    def _new_tokens(self):
+        access, refresh = str(uuid.uuid4()), str(uuid.uuid4())
+        self.tokens.add(access)
+        self.refresh_tokens.add(refresh)
+        return {'X-auth-access-token': access, 'X-auth-refresh-token': refresh}
+
+    def _authenticated(self, username: str, password: str):
+        return self.username is None or (username == self.username and password == self.password)
+
+    def generate_token(self, headers):
+        try:
+            username, password = b64decode(headers.get('Authorization', '').split(' ')[-1]).decode().split(':', 1)
+        except ValueError:
+            username, password = None, None
+        if not self._authenticated(username, password):
+            return 401, {}, {'error': {'messages': [{'description': 'Authentication failed.'}]}}
+        with self._lock:
+            tokens = self._new_tokens()
+        domains = [{'name': DOMAIN_NAME, 'uuid': DOMAIN_ID}]
+        return 204, {**tokens, 'DOMAINS': json.dumps(domains), 'DOMAIN_UUID': DOMAIN_ID}, None
+
+    def refresh_token(self, headers):
+        with self._lock:
+            if headers.get('X-auth-refresh-token') not in self.refresh_tokens:
+                return 401, {}, {'error': {'messages': [{'description': 'Refresh token invalid.'}]}}
+            self.refresh_tokens.discard(headers['X-auth-refresh-token'])
+            return 204, self._new_tokens(), None
+
+    def _page(self, items: List, path: str, params: Dict, headers):
+        offset = int(params.get('offset', 0))
+        limit = int(params.get('limit', PAGE_LIMIT))
+        payload = {
+            'links': {'self': f'http://{headers.get("Host")}{path}?{urlencode(params)}'},
+            'paging': {'offset': offset, 'limit': limit, 'count': len(items), 'pages': ceil(len(items) / limit)},
+        }
+        if items[offset : offset + limit]:
+            payload['items'] = items[offset : offset + limit]
+        if offset + limit < len(items):
+            next_params = urlencode({**params, 'offset': offset + limit, 'limit': limit})
+            payload['paging']['next'] = [f'http://{headers.get("Host")}{path}?{next_params}']
+        return payload
+
+    @staticmethod
+    def _filtered(items: List, search: str):
+        for condition in search.strip('"').split(';'):
+            key, _, value = condition.partition(':')
+            if key == 'deviceId':
+                items = [item for item in items if item.get('metadata', {}).get('device', {}).get('id') == value]
+        return items
+
+    def get(self, path: str, resource: str, params: Dict, headers):
+        collections = self.data['fmc']
+        if resource in collections:
+            items = collections[resource]
+            if 'overrideTargetId' in params:
+                items = [
+                    item
+                    for key, children in collections.items()
+                    if key.startswith(f'{resource}/') and key.endswith('/overrides')
+                    for item in children
+                    if item['overrides']['target']['id'] == params['overrideTargetId']
+                ]
+            if 'filter' in params:
+                items = self._filtered(items, params['filter'])
+            if resource == '/audit/auditrecords':
+                start, end = int(params.get('starttime', 0)), int(params.get('endtime', time.time() + 1))
+                items = [item for item in items if start <= item['time'] <= end]
+            return 200, {}, self._page(items, path, params, headers)
+        parent, _, uid = resource.rpartition('/')
+        if parent in collections:
+            for item in collections[parent]:
+                if item['id'] == uid:
+                    return 200, {}, item
+            return 404, {}, {'error': {'messages': [{'description': f'{uid} not found'}]}}
+        if UUID.match(uid):
+            return 404, {}, {'error': {'messages': [{'description': f'{uid} not found'}]}}
+        return 200, {}, self._page([], path, params, headers)
+
+    def _audit(self, method: str, path: str):
+        records = self.data['fmc'].setdefault('/audit/auditrecords', [])
+        records.append(
+            {
+                'id': str(uuid.uuid4()),
+                'type': 'AuditRecord',
+                'time': int(time.time()),
+                'subsystem': 'API',
+                'message': f'{method} {path}',
+            }
+        )
+
+    def write(self, method: str, path: str, resource: str, data):
+        collections = self.data['fmc']
+        parent, _, uid = resource.rpartition('/')
+        if method == 'POST':
+            created = list()
+            for item in data if isinstance(data, list) else [data]:
+                item = {**item, 'id': item.get('id') or str(uuid.uuid4())}
+                collections.setdefault(resource, []).append(item)
+                created.append(item)
+            if resource == '/deployment/deploymentrequests':
+                deployed = {uid for item in created for uid in item.get('deviceList', [])}
+                collections['/deployment/deployabledevices'] = [
+                    device
+                    for device in collections.get('/deployment/deployabledevices', [])
+                    if device['device']['id'] not in deployed
+                ]
+            self._audit(method, path)
+            return 201, {}, {'items': created} if isinstance(data, list) else created[0]
+        items = collections.get(parent, [])
+        index = next((index for index, item in enumerate(items) if item['id'] == uid), None)
+        if index is None:
+            return 404, {}, {'error': {'messages': [{'description': f'{uid} not found'}]}}
+        self._audit(method, path)
+        if method == 'DELETE':
+            collections.pop(f'{resource}/overrides', None)
+            return 200, {}, items.pop(index)
+        if data and 'overrides' in data:
+            overrides = collections.setdefault(f'{resource}/overrides', [])
+            target = data['overrides']['target']['id']
+            overrides[:] = [item for item in overrides if item['overrides']['target']['id'] != target]
+            overrides.append(data)
+            items[index]['overridable'] = True
+            return 200, {}, data
+        items[index] = {**data, 'id': uid}
+        return 200, {}, items[index]
+
+    def afa(self, method: str, path: str, params: Dict, body: bytes):
+        if path == AFA_LOGIN_URL and method == 'POST':
+            form = dict(parse_qsl(body.decode()))
+            if not self._authenticated(form.get('username'), form.get('password')):
+                return 401, {}, {'status': False, 'message': 'Authentication failed'}
+            session = uuid.uuid4().hex
+            with self._lock:
+                self.sessions.add(session)
+            return 200, {}, {'status': True, 'SessionID': session}
+        if params.get('session') not in self.sessions:
+            return 401, {}, {'status': False, 'message': 'Session expired'}
+        if path == AFA_RISKY_RULES_URL and method == 'GET':
+            risky_rules = self.data['afa'].get(params.get('entity'), [])
+            return 200, {}, {'entity': params.get('entity'), 'riskyRules': risky_rules}
+        return 404, {}, {'status': False, 'message': f'{path} not found'}
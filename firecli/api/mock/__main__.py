@@ -0,0 +1,51 @@
+import tempfile
+import time
+
+import click
+
+from firecli.api.mock import MockServer, generate, self_signed_certificate
+
+
+@click.command()
+@click.option('--host', default='127.0.0.1', help='Address the server listens on')
+@click.option('--port', default=8443, type=int, help='Port the server listens on')
+@click.option('--objects', default=1000, type=int, help='Number of generated objects')
+@click.option('--rules', default=1000, type=int, help='Number of generated accessrules')
+@click.option('--devices', default=4, type=int, help='Number of generated devices')
+@click.option('--policies', default=2, type=int, help='Number of generated accesspolicies')
+@click.option('--latency', default=0.0, type=float, help='Seconds every request is delayed')
+@click.option('--rate-limit', 'rate_limit', default=120, type=int, help='Requests per minute before 429 responses')
+@click.option('--seed', default=0, type=int, help='Seed of the data generator')
+@click.option('--tls', default=False, is_flag=True, help='Serve https using a self-signed certificate')
+@click.option('--certfile', default=None, type=click.Path(exists=True), help='Certificate used to serve https')
+@click.option('--keyfile', default=None, type=click.Path(exists=True), help='Private key of the certificate')
+def main(host, port, objects, rules, devices, policies, latency, rate_limit, seed, tls, certfile, keyfile):
+    """Serve synthetic fmc and afa data over http or https, e.g. for benchmarks
+
+    \b
+    Example:
+        python -m firecli.api.mock --objects 12000 --devices 80 --latency 0.2
+
+    \b
+    firecli connects using https by default. Serve https using a self-signed certificate with the --tls option or
+    set protocol to http in the fmc and afa section of firecli.yml
+    \b
+        python -m firecli.api.mock --tls
+    """
+    data = generate(objects=objects, rules=rules, devices=devices, policies=policies, seed=seed)
+    with tempfile.TemporaryDirectory() as directory:
+        if tls and certfile is None:
+            certfile, keyfile = self_signed_certificate(directory, host)
+        with MockServer(
+            data, host=host, port=port, latency=latency, rate_limit=rate_limit, certfile=certfile, keyfile=keyfile
+        ) as mock:
+            click.echo(f'Serving mock fmc and afa on {mock.url}. Press Ctrl+C to stop')
+            try:
+                while True:
+                    time.sleep(1)
+            except KeyboardInterrupt:
+                pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+import asyncio
+from logging import getLogger
+from math import ceil
+from typing import Dict, Iterable, List
+
+from fireREST import FMC, defaults
+from fireREST.exceptions import GenericApiError
+
+from firecli.api.aio import AsyncFMC
+
+logger = getLogger(__name__)
+
+# overrides are downloaded separately for each overridable object
+PER_OBJECT = 'object'
+# overridden objects of a type are downloaded once for each override target
+PER_TARGET = 'target'
+
+
+def override_targets(fmc: FMC):
+    """Devices and domains objects can be overridden on
+    """
+    return fmc.device.devicerecord.get() + fmc.system.info.domain.get()
+
+
+def override_strategy(count: int, targets: List, total: int = None):
+    """Strategy that needs fewer requests to download the overrides of `count` overridable objects of a single type
+    with `total` objects. Downloading per object needs one request for each object. Downloading per target pages
+    through all `total` objects of the type for each target
+    """
+    pages = max(ceil((total if total is not None else count) / defaults.API_PAGING_LIMIT), 1)
+    return PER_TARGET if len(targets) * pages < count else PER_OBJECT
+
+
+def target_overrides(resource, target: Dict):
+    """Overrides of all objects of `resource` on `target`
+    """
+    return resource.get(params={'overrideTargetId': target['id']})
+
+
+def grouped_overrides(overrides: Iterable[List]):
+    """Overrides of several targets grouped by the id of the overridden object
+    """
+    grouped = dict()
+    for items in overrides:
+        for item in items:
+            if 'overrides' in item:
+                grouped.setdefault(item['overrides']['parent']['id'], []).append(item)
+    return grouped
+
+
+async def _fetch_overrides(aio: AsyncFMC, name: str, overridable: List[Dict], targets: List, strategy: str):
+    if strategy == PER_TARGET:
+        resource = getattr(aio.fmc.object, name)
+        grouped = grouped_overrides(
+            await asyncio.gather(*(aio.call(target_overrides, resource, target) for target in targets))
+        )
+        return {obj['id']: grouped.get(obj['id'], []) for obj in overridable}
+    resource = getattr(aio.object, name)
+    overrides = await asyncio.gather(*(resource.override.get(container_uuid=obj['id']) for obj in overridable))
+    return {obj['id']: items for obj, items in zip(overridable, overrides)}
+
+
+def object_overrides(fmc: FMC, name: str, objects: List[Dict], targets=None, concurrency=None):
+    """Overrides of all overridable `objects` of object type `name` by object id. Overrides are downloaded using the
+    strategy that needs fewer requests. Override targets are downloaded if `targets` is not set. Up to `concurrency`
+    requests are sent at the same time, which defaults to the `concurrency` of `fmc`
+    """
+    resource = getattr(fmc.object, name)
+    overridable = [obj for obj in objects if obj.get('overridable')]
+    if not overridable:
+        return dict()
+    if targets is None:
+        targets = override_targets(fmc)
+    strategy = override_strategy(len(overridable), targets, len(objects))
+    logger.debug('Downloading overrides of %s %s objects per %s', len(overridable), name, strategy)
+    if concurrency is None:
+        concurrency = getattr(fmc, 'concurrency', 1)
+    if concurrency > 1:
+        with AsyncFMC(fmc, concurrency) as aio:
+            return aio.run(_fetch_overrides(aio, name, overridable, targets, strategy))
+    if strategy == PER_TARGET:
+        grouped = grouped_overrides(target_overrides(resource, target) for target in targets)
+        return {obj['id']: grouped.get(obj['id'], []) for obj in overridable}
+    return {obj['id']: resource.override.get(container_uuid=obj['id']) for obj in overridable}
+
+
+def update_overrides(fmc: FMC, name: str, updates: List[Dict], concurrency=None):
+    """Send override `updates` of object type `name`, each the payload of a single `fmc.object.<name>.update`. The
+    fmc api has no bulk operation for overrides, so up to `concurrency` updates are sent at the same time, which
+    defaults to the `concurrency` of `fmc`. Requests still pass through the rate limiter of the fmc session
+
+    :return: list of tuples of update and the error it failed with (None if successful) in the order of `updates`
+    """
+    resource = getattr(fmc.object, name)
+
+    def update(data: Dict):
+        try:
+            resource.update(data=data)
+        except GenericApiError as exc:
+            return data, exc
+        return data, None
+
+    if concurrency is None:
+        concurrency = getattr(fmc, 'concurrency', 1)
+    logger.debug('Updating %s %s object overrides using %s workers', len(updates), name, concurrency)
+    if concurrency > 1 and len(updates) > 1:
+        with AsyncFMC(fmc, concurrency) as aio:
+            return aio.map(update, updates)
+    return [update(data) for data in updates]
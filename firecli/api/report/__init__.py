@@ -3,9 +3,10 @@ import re
 
 from functools import partial
 from logging import getLogger
-from typing import Dict, List
+from typing import Callable, Dict, List
 
 from firecli.api.afa import AFA
+from firecli.api.cache import FmcCache
 
 from click import Context
 from fireREST import FMC
@@ -14,9 +15,26 @@ from fireREST.exceptions import ResourceNotFoundError
 logger = getLogger(__name__)
 
 
-def assigned_accesspolicies(fmc: FMC, accesspolicy=None):
+def _fresh_cache(cached: Callable[[str], FmcCache], name: str):
+    """Cache to read type `name` from. `cached` returns the cache only if the type was downloaded recently enough
+    (e.g. API.cached), so stale types are fetched from fmc
+
+    :return: cache or None if type `name` has to be fetched from fmc
+    """
+    return cached(name) if cached else None
+
+
+def assigned_accesspolicies(fmc: FMC, accesspolicy=None, cached: Callable[[str], FmcCache] = None):
+    """Policy assignments of accesspolicies. Assignments are read from cache if `cached` returns a cache for
+    policyassignment and fetched from fmc otherwise
+    """
+    cache = _fresh_cache(cached, 'policyassignment')
+    devices = cache.subcache('policyassignment') if cache else None
     assignments = []
     if accesspolicy:
+        assignment = devices.get(accesspolicy['id']) if devices else None
+        if assignment is not None:
+            return [assignment]
         try:
             assignment = fmc.assignment.policyassignment.get(uuid=accesspolicy['id'])
             assignments.append(assignment)
@@ -28,10 +46,11 @@ def assigned_accesspolicies(fmc: FMC, accesspolicy=None):
             raise
     else:
         try:
+            policyassignments = devices.items('policyassignment') if devices else None
+            if policyassignments is None:
+                policyassignments = fmc.assignment.policyassignment.get()
             assignments = [
-                assignment
-                for assignment in fmc.assignment.policyassignment.get()
-                if assignment['policy']['type'] == 'AccessPolicy'
+                assignment for assignment in policyassignments if assignment['policy']['type'] == 'AccessPolicy'
             ]
         except ResourceNotFoundError:
             logger.error('Accesspolicies are not assigned to any devices. Make sure policy assignments exist.')
@@ -95,24 +114,30 @@ def matches_relevant_risky_rules(exclusions: List, risky_rule: Dict):
     return True
 
 
-def accessrule_count(fmc: FMC, accesspolicy=None):
+def accessrule_count(fmc: FMC, accesspolicy=None, cached: Callable[[str], FmcCache] = None):
+    """Number of accessrules of each assigned accesspolicy. Assignments and rules are read from cache if `cached`
+    returns a cache for their type and fetched from fmc for stale types and policies that are not cached
+    """
     result = []
-    assignments = assigned_accesspolicies(fmc, accesspolicy)
+    assignments = assigned_accesspolicies(fmc, accesspolicy, cached)
+    cache = _fresh_cache(cached, 'accesspolicy')
     for assignment in assignments:
         device = assignment['targets'][0]['name']
         device_id = assignment['targets'][0]['id']
         policy = assignment['policy']['name']
         policy_id = assignment['policy']['id']
-        rulecount = len(fmc.policy.accesspolicy.accessrule.get(container_uuid=policy_id))
+        rulecount = cache.subcache('accesspolicy').rule_count(policy_id) if cache else None
+        if rulecount is None:
+            rulecount = len(fmc.policy.accesspolicy.accessrule.get(container_uuid=policy_id))
         result.append(
             {'device': device, 'device_id': device_id, 'policy': policy, 'policy_id': policy_id, 'rulecount': rulecount}
         )
     return result
 
 
-def accessrules_without_comments(fmc: FMC, accesspolicy=None):
+def accessrules_without_comments(fmc: FMC, accesspolicy=None, cached: Callable[[str], FmcCache] = None):
     result = []
-    assignments = assigned_accesspolicies(fmc, accesspolicy)
+    assignments = assigned_accesspolicies(fmc, accesspolicy, cached)
     for assignment in assignments:
         device = assignment['targets'][0]['name']
         device_id = assignment['targets'][0]['id']
@@ -138,9 +163,11 @@ def accessrules_without_comments(fmc: FMC, accesspolicy=None):
     return result
 
 
-def accessrules_without_ticket_id(fmc: FMC, patterns: List, accesspolicy=None):
+def accessrules_without_ticket_id(
+    fmc: FMC, patterns: List, accesspolicy=None, cached: Callable[[str], FmcCache] = None
+):
     result = []
-    assignments = assigned_accesspolicies(fmc, accesspolicy)
+    assignments = assigned_accesspolicies(fmc, accesspolicy, cached)
     for assignment in assignments:
         device = assignment['targets'][0]['name']
         device_id = assignment['targets'][0]['id']
@@ -192,19 +219,27 @@ def noncompliant_accessrules(afa: AFA, fmc: FMC, device, exclude=None, risks=Non
     return result
 
 
-def noncompliant_network_segments(fmc: FMC, device: Dict, networks: List):
+def noncompliant_network_segments(fmc: FMC, device: Dict, networks: List, cached: Callable[[str], FmcCache] = None):
+    """Network segments that are routed through the same interface. Static routes and network objects are read
+    from cache if `cached` returns a cache for their type and fetched from fmc for stale types and items that are
+    not cached
+    """
     result = []
-    routes = fmc.device.devicerecord.routing.ipv4staticroute.get(container_uuid=device['id'])
+    cache = _fresh_cache(cached, 'ipv4staticroute')
+    routes = cache.subcache('ipv4staticroute').device_config('ipv4staticroute', device['id']) if cache else None
+    if routes is None:
+        routes = fmc.device.devicerecord.routing.ipv4staticroute.get(container_uuid=device['id'])
     routing_table = {}
     for route in routes:
         if route['interfaceName'] not in routing_table.keys():
             routing_table[route['interfaceName']] = []
         for network in route['selectedNetworks']:
-            if network['type'] == 'Host':
-                obj = fmc.object.host.get(uuid=network['id'])['value']
-            else:
-                obj = fmc.object.network.get(uuid=network['id'])['value']
-            routing_table[route['interfaceName']].append(obj)
+            name = 'host' if network['type'] == 'Host' else 'network'
+            cache = _fresh_cache(cached, name)
+            obj = cache.subcache(name).get(network['id']) if cache else None
+            if obj is None:
+                obj = getattr(fmc.object, name).get(uuid=network['id'])
+            routing_table[route['interfaceName']].append(obj['value'])
     for network in networks:
         for _interface, entries in routing_table.items():
             for src in network['src']['values']:
@@ -0,0 +1,344 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from logging import getLogger
+from typing import Callable
+from urllib.parse import urlencode, urlsplit
+
+import requests
+
+logger = getLogger(__name__)
+
+# id of an fmc api resource or domain
+UUID = re.compile(r'^[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}$')
+# fmc accepts 120 api requests per minute
+DEFAULT_RATE = 120
+# seconds all requests are paused after a 429 response without Retry-After header
+DEFAULT_BACKOFF = 10
+
+_limiters = dict()
+_limiters_lock = threading.Lock()
+
+
+def resource_path(url: str):
+    """Path of the api resource `url` belongs to without ids of the resource or its children, e.g.
+    /api/fmc_config/v1/domain/<domain>/policy/accesspolicies for rules of an accesspolicy
+    """
+    segments = urlsplit(url).path.rstrip('/').split('/')
+    start = segments.index('domain') + 2 if 'domain' in segments else 0
+    for index in range(start, len(segments)):
+        if UUID.match(segments[index]):
+            return '/'.join(segments[:index])
+    return '/'.join(segments)
+
+
+def retry_after(response: requests.Response, default=DEFAULT_BACKOFF):
+    """Seconds to wait according to the Retry-After header of `response`, given either in seconds or as http date
+    """
+    value = response.headers.get('Retry-After')
+    if value is None:
+        return default
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max((parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds(), 0.0)
+    except (TypeError, ValueError):
+        return default
+
+
+class RateLimiter(object):
+    """Token bucket that limits requests to `rate` per minute with bursts of up to `burst` requests, combined with a
+    concurrency limit that adapts to the server (AIMD). The concurrency limit grows by one for every `limit`
+    responses that are faster than `max_latency` and is halved on slow responses and 429 responses. A 429 response
+    pauses all requests until its Retry-After period has passed
+    """
+
+    def __init__(
+        self,
+        rate=DEFAULT_RATE,
+        burst=10,
+        concurrency=4,
+        max_concurrency=16,
+        max_latency=5.0,
+        clock=time.monotonic,
+        sleep=time.sleep,
+    ):
+        self.rate = rate / 60 if rate else None
+        self.burst = burst
+        self.tokens = float(burst)
+        self.limit = float(concurrency)
+        self.max_concurrency = max_concurrency
+        self.max_latency = max_latency
+        self.clock = clock
+        self.sleep = sleep
+        self.active = 0
+        self.updated = clock()
+        self.paused_until = 0.0
+        self.stats = {'requests': 0, 'throttled': 0, 'waited': 0.0}
+        self._cond = threading.Condition()
+
+    def _refill(self, now: float):
+        if self.rate and now > self.updated:
+            self.tokens = min(float(self.burst), self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def _delay(self, now: float):
+        delay = self.paused_until - now
+        if self.rate and self.tokens < 1:
+            delay = max(delay, max(self.updated - now, 0.0) + (1 - self.tokens) / self.rate)
+        return delay
+
+    def acquire(self):
+        """Wait until a request may be sent. Every call must be followed by a call to `release`
+        """
+        while True:
+            with self._cond:
+                while self.active >= int(self.limit):
+                    self._cond.wait()
+                now = self.clock()
+                self._refill(now)
+                delay = self._delay(now)
+                if delay <= 0:
+                    if self.rate:
+                        self.tokens -= 1
+                    self.active += 1
+                    self.stats['requests'] += 1
+                    return
+                self.stats['waited'] += delay
+            self.sleep(delay)
+
+    def release(self, latency: float, throttled=False, pause=0.0):
+        """Record the outcome of a request and adapt the concurrency limit
+
+        :param latency: seconds until the response was received
+        :param throttled: request was answered with 429
+        :param pause: seconds to pause all requests if the request was throttled
+        """
+        with self._cond:
+            self.active -= 1
+            now = self.clock()
+            if throttled:
+                self.stats['throttled'] += 1
+                # concurrent requests that are throttled during the same pause only decrease the limit once
+                if now >= self.paused_until:
+                    self.limit = max(1.0, self.limit / 2)
+                self.paused_until = max(self.paused_until, now + pause)
+                # only a single request is sent right after the pause
+                self.tokens = 1.0
+                self.updated = max(self.updated, self.paused_until)
+            elif latency > self.max_latency:
+                self.limit = max(1.0, self.limit / 2)
+            else:
+                self.limit = min(float(self.max_concurrency), self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+
+def rate_limiter(hostname: str, **kwargs):
+    """Process-wide rate limiter shared by all requests to `hostname`. `kwargs` are only used to create the limiter
+    on first use
+    """
+    with _limiters_lock:
+        if hostname not in _limiters:
+            _limiters[hostname] = RateLimiter(**kwargs)
+        return _limiters[hostname]
+
+
+class ThrottledSession(requests.Session):
+    """Session that sends requests through `limiter` if set. Requests answered with 429 are sent again up to
+    `retries` times once the limiter allows it
+    """
+
+    def __init__(self, limiter: RateLimiter = None, retries=3):
+        super().__init__()
+        self.limiter = limiter
+        self.retries = retries
+
+    def request(self, method, url, *args, **kwargs):
+        if self.limiter is None:
+            return super().request(method, url, *args, **kwargs)
+        attempt = 0
+        while True:
+            self.limiter.acquire()
+            start = self.limiter.clock()
+            throttled, pause = False, 0.0
+            try:
+                response = super().request(method, url, *args, **kwargs)
+                throttled = response.status_code == 429
+                pause = retry_after(response) if throttled else 0.0
+            finally:
+                self.limiter.release(self.limiter.clock() - start, throttled, pause)
+            if not throttled or attempt >= self.retries:
+                return response
+            attempt += 1
+            logger.info('Rate limit of %s exceeded, retrying in %.1f seconds', urlsplit(url).hostname, pause)
+
+
+class ResponseMemo(object):
+    """Successful GET responses keyed by url and params. Responses are kept for at most `max_age` seconds and only
+    the `size` most recent responses are kept. A memo can be shared by several sessions
+    """
+
+    def __init__(self, max_age=60, size=128, clock=time.monotonic):
+        self.max_age = max_age
+        self.size = size
+        self.clock = clock
+        self.responses = OrderedDict()
+        self.stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(url: str, params=None):
+        return f'{url}?{urlencode(sorted((params or {}).items()), doseq=True)}'
+
+    def get(self, key: str):
+        """Memoized response of `key`, None if there is no valid response
+        """
+        with self._lock:
+            memoized = self.responses.get(key)
+            if memoized is not None and self.clock() - memoized[0] <= self.max_age:
+                self.responses.move_to_end(key)
+                self.stats['hits'] += 1
+                return memoized[1]
+            self.stats['misses'] += 1
+            return None
+
+    def put(self, key: str, response: requests.Response):
+        with self._lock:
+            self.responses[key] = (self.clock(), response)
+            self.responses.move_to_end(key)
+            while len(self.responses) > self.size:
+                self.responses.popitem(last=False)
+
+    def invalidate(self, url: str):
+        """Remove memoized responses of the api resource `url` belongs to
+        """
+        path = resource_path(url)
+        with self._lock:
+            keys = [key for key in self.responses if f'{urlsplit(key).path}/'.startswith(f'{path}/')]
+            for key in keys:
+                del self.responses[key]
+            self.stats['invalidations'] += len(keys)
+
+    def clear(self):
+        with self._lock:
+            self.responses.clear()
+
+
+class MemoizingSession(ThrottledSession):
+    """Session that memoizes successful GET responses within a single firecli run. Responses are keyed by url and
+    params and returned again for identical requests, e.g. listings of devices that are used to resolve several
+    names. POST, PUT and DELETE requests invalidate memoized responses of the same api resource including its
+    children. Responses are kept for at most `max_age` seconds and only the `size` most recent responses are kept.
+    Memoized responses are returned without passing `limiter`. Sessions of several threads can share a `memo`.
+    Long running commands such as cache watch `clear` the memo before each refresh
+    """
+
+    def __init__(
+        self,
+        max_age=60,
+        size=128,
+        clock=time.monotonic,
+        limiter: RateLimiter = None,
+        retries=3,
+        memo: ResponseMemo = None,
+    ):
+        super().__init__(limiter=limiter, retries=retries)
+        self.memo = memo if memo is not None else ResponseMemo(max_age=max_age, size=size, clock=clock)
+
+    @property
+    def responses(self):
+        return self.memo.responses
+
+    @property
+    def stats(self):
+        return self.memo.stats
+
+    key = staticmethod(ResponseMemo.key)
+
+    def request(self, method, url, params=None, **kwargs):
+        if method.lower() != 'get':
+            self.invalidate(url)
+            return super().request(method, url, params=params, **kwargs)
+        key = self.key(url, params)
+        memoized = self.memo.get(key)
+        if memoized is not None:
+            return memoized
+        response = super().request(method, url, params=params, **kwargs)
+        if response.ok:
+            self.memo.put(key, response)
+        return response
+
+    def invalidate(self, url: str):
+        """Remove memoized responses of the api resource `url` belongs to
+        """
+        self.memo.invalidate(url)
+
+    def clear(self):
+        self.memo.clear()
+
+
+class SessionPool(object):
+    """Drop-in replacement for a session that sends requests of each thread using a session of its own, so parallel
+    workers never share connection state. Sessions are created by `factory` on first use in a thread and keep up to
+    `pool_maxsize` connections per host alive, which is enough as each thread sends one request at a time. Auth
+    tokens are sent as request headers and therefore shared by all sessions. Other attributes are read from the
+    session of the current thread. Sessions of threads that have finished are closed once a new session is created,
+    so the pool never holds more sessions than threads that are alive plus those that finished since
+    """
+
+    def __init__(self, factory: Callable[[], requests.Session], pool_connections=1, pool_maxsize=1):
+        self.factory = factory
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self._sessions = dict()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    @property
+    def sessions(self):
+        """Sessions that have not been closed yet
+        """
+        with self._lock:
+            return list(self._sessions.values())
+
+    @property
+    def session(self):
+        """Session of the current thread
+        """
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self.factory()
+            adapter = requests.adapters.HTTPAdapter(
+                pool_connections=self.pool_connections, pool_maxsize=self.pool_maxsize
+            )
+            for prefix in ('https://', 'http://'):
+                if isinstance(session.get_adapter(prefix), requests.adapters.HTTPAdapter):
+                    session.mount(prefix, adapter)
+            self._local.session = session
+            with self._lock:
+                finished = [thread for thread in self._sessions if not thread.is_alive()]
+                stale = [self._sessions.pop(thread) for thread in finished]
+                self._sessions[threading.current_thread()] = session
+            for item in stale:
+                item.close()
+        return session
+
+    def __getattr__(self, name: str):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.session, name)
+
+    def request(self, method, url, *args, **kwargs):
+        return self.session.request(method, url, *args, **kwargs)
+
+    def close(self):
+        with self._lock:
+            sessions, self._sessions = list(self._sessions.values()), dict()
+        for session in sessions:
+            session.close()
+        self._local = threading.local()
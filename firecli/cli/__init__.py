@@ -40,6 +40,8 @@ HELP = {
     'debug': 'Enable debug loglevel',
     'trace': 'Enable trace loglevel. Includes debug logging for all api calls',
     'no_proxy': 'Ignore system proxy settings',
+    'cache_max_age': 'Read data from cache if it was downloaded within the given number of seconds. 0 disables reads '
+    'from cache',
 }
 
 DEFAULTS = {
@@ -56,6 +58,7 @@ DEFAULTS = {
     'debug': False,
     'trace': False,
     'no_proxy': False,
+    'cache_max_age': None,
 }
 
 logger = getLogger(__name__)
@@ -93,6 +96,9 @@ def log_exceptions(f):
 @click.option('--debug', default=DEFAULTS['debug'], is_flag=True, help=HELP['debug'])
 @click.option('--trace', default=DEFAULTS['trace'], is_flag=True, help=HELP['trace'])
 @click.option('--no-proxy', default=DEFAULTS['no_proxy'], is_flag=True, help=HELP['no_proxy'])
+@click.option(
+    '--cache-max-age', type=click.IntRange(min=0), default=DEFAULTS['cache_max_age'], help=HELP['cache_max_age']
+)
 @click.pass_context
 @log_exceptions
 def main(
@@ -110,6 +116,7 @@ def main(
     debug,
     trace,
     no_proxy,
+    cache_max_age,
 ):
     """FireCLI is a command line interface to Firepower Management Center that automates a variety of tasks
     """
@@ -141,6 +148,8 @@ def main(
 
         # configuration
         CFG['dry_run'] = dry_run
+        if cache_max_age is not DEFAULTS['cache_max_age']:
+            CFG['cache_max_age'] = cache_max_age
 
         # overwrite configuration if set manually
         fmc_options = {
@@ -173,6 +182,7 @@ def main(
         cfg = CFG
         console = Console()
         ctx.obj = State(api=api, cfg=cfg, console=console)
+        ctx.call_on_close(api.log_stats)
 
 
 main.add_command(accesspolicy)
@@ -35,11 +35,13 @@ HELP = {
 @click.option('--device', required=False, type=str, help=HELP['device'])
 @click.pass_obj
 def accesspolicy(obj, name, device):
-    fmc = obj.api.fmc  # type: FMC
+    api = obj.api  # type: API
     state = obj.state
 
     try:
-        state['accesspolicy'] = fmc.policy.accesspolicy.get(name=name)
+        state['accesspolicy'] = api.cached_get('accesspolicy', item_name=name) or api.fmc.policy.accesspolicy.get(
+            name=name
+        )
     except ResourceNotFoundError:
         logger.error('Accesspolicy "%s" not found. Exiting.', name)
         sys.exit(2)
@@ -47,21 +49,33 @@ def accesspolicy(obj, name, device):
     obj.state['device'] = {'name': None, 'id': None}
     if device:
         try:
-            devicehapair = fmc.devicehapair.ftdhapair.get(name=device)
+            devicehapair = api.cached_get('ftdhapair', item_name=device) or api.fmc.devicehapair.ftdhapair.get(
+                name=device
+            )
             state['device'] = devicehapair['primary']['id']
         except ResourceNotFoundError:
             try:
-                state['device'] = fmc.device.devicerecord.get(name=device)
+                state['device'] = api.cached_get('devicerecord', item_name=device) or api.fmc.device.devicerecord.get(
+                    name=device
+                )
             except ResourceNotFoundError:
                 logger.error('Device "%s" not found. Exiting.', device)
                 sys.exit(2)
     else:
         try:
-            policyassignment = fmc.assignment.policyassignment.get(uuid=state['accesspolicy']['id'])
+            policy_id = state['accesspolicy']['id']
+            policyassignment = api.cached_get(
+                'policyassignment', uuid=policy_id
+            ) or api.fmc.assignment.policyassignment.get(uuid=policy_id)
             if policyassignment['targets'][0]['type'] == 'DeviceHAPair':
                 hapair_id = policyassignment['targets'][0]['id']
-                device_id = fmc.devicehapair.ftdhapair.get(uuid=hapair_id)['primary']['id']
-                state['device'] = fmc.device.devicerecord.get(uuid=device_id)
+                devicehapair = api.cached_get('ftdhapair', uuid=hapair_id) or api.fmc.devicehapair.ftdhapair.get(
+                    uuid=hapair_id
+                )
+                device_id = devicehapair['primary']['id']
+                state['device'] = api.cached_get('devicerecord', uuid=device_id) or api.fmc.device.devicerecord.get(
+                    uuid=device_id
+                )
             else:
                 state['device'] = policyassignment['targets'][0]
             logger.debug(
@@ -96,7 +110,6 @@ def accesspolicy(obj, name, device):
 @click.pass_obj
 def export(obj, policy_filter, fmt, include_hitcount, export_dir):
     api = obj.api  # type: API
-    fmc = api.fmc  # type: FMC
     cfg = obj.cfg
     policy = obj.state['accesspolicy']
     device = obj.state['device']
@@ -104,23 +117,28 @@ def export(obj, policy_filter, fmt, include_hitcount, export_dir):
     export_filename = f'{export_dir}/{export_filename}' if export_dir != '' else export_filename
 
     logger.info('Exporting accesspolicy "%s" in %s format...', policy['name'], fmt)
-    cache = FmcCache(cfg['cache_dir']).load()
-    accessrules = api.filtered_accessrules(
-        policy['id'], fmc.policy.accesspolicy.accessrule.get(container_uuid=policy['id']), policy_filter
-    )
-    accessrules = api.expanded_accessrules(accessrules, cache['objects'].cache, device['id'])
-
+    cache = FmcCache.from_cfg(cfg).cache
+    cached = api.cached('accesspolicy')
+    accessrules = cached.subcache('accesspolicy').iter_rules(policy['id']) if cached else None
+    if accessrules is None:
+        accessrules = api.fmc.policy.accesspolicy.accessrule.get(container_uuid=policy['id'])
+    accessrules = api.filtered_accessrules(policy['id'], accessrules, policy_filter)
+    accessrules = api.iter_expanded_accessrules(accessrules, cache['objects'], device['id'])
+
+    hitcounts = dict()
     if include_hitcount:
-        hitcounts = fmc.policy.accesspolicy.operational.hitcount.get(
-            container_uuid=policy['id'], device_id=device['id']
-        )
-        for accessrule in accessrules:
-            for hitcount in hitcounts:
-                if hitcount['rule']['id'] == accessrule['id']:
-                    accessrule['hitcount'] = hitcount
+        hitcounts = {
+            hitcount['rule']['id']: hitcount
+            for hitcount in api.fmc.policy.accesspolicy.operational.hitcount.get(
+                container_uuid=policy['id'], device_id=device['id']
+            )
+        }
 
     report = [api.csv_header('accessrule')]
-    report.extend([api.accessrule_to_csv(item) for item in accessrules])
+    for accessrule in accessrules:
+        if accessrule['id'] in hitcounts:
+            accessrule['hitcount'] = hitcounts[accessrule['id']]
+        report.append(api.accessrule_to_csv(accessrule))
     report = api.csv_squashed(report)
 
     logger.info('Saving report to %s', export_filename)
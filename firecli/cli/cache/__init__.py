@@ -4,13 +4,47 @@ from typing import Dict
 import click
 
 from firecli.api.cache import FmcCache
+from firecli.api.cache.store import STORES, available_formats
+from firecli.api.cache.watch import CacheWatcher
 from firecli.api.click import FireCliGroup, FireCliCommand
 
 
 logger = getLogger(__name__)
 
 HELP: Dict[str, Dict]
-HELP = {'cache': {'cmd': 'Local cache management', 'init': {'cmd': 'Initialize configuration cache'}}}
+HELP = {
+    'cache': {
+        'cmd': 'Local cache management',
+        'init': {
+            'cmd': 'Initialize configuration cache',
+            'workers': 'Number of api requests that are performed in parallel',
+            'resume': 'Continue an interrupted download from its last checkpoint',
+        },
+        'refresh': {
+            'cmd': 'Refresh configuration cache with changes since last download',
+            'workers': 'Number of api requests that are performed in parallel',
+            'audit': 'Only download objects and policies that changed according to the fmc audit log',
+        },
+        'watch': {
+            'cmd': 'Refresh configuration cache periodically',
+            'interval': 'Minimum number of seconds between two refreshes of a cached type',
+            'max_interval': 'Maximum number of seconds between two refreshes of a cached type',
+            'jitter': 'Random variation of refresh intervals, e.g. 0.1 for +/- 10%',
+            'count': 'Stop after the given number of refresh rounds. 0 runs until interrupted',
+            'workers': 'Number of api requests that are performed in parallel',
+        },
+        'convert': {
+            'cmd': 'Convert configuration cache to another storage backend or file format',
+            'backend': 'Storage backend the cache is converted to',
+            'format': 'File format the cache is converted to',
+        },
+        'history': {
+            'cmd': 'Show or restore previous generations of the configuration cache',
+            'diff': 'Show changes between the given snapshot and the newest snapshot',
+            'restore': 'Save the given snapshot as current configuration cache',
+        },
+    }
+}
 
 
 @click.group(cls=FireCliGroup('cache'), short_help=HELP['cache']['cmd'])
@@ -19,14 +53,259 @@ def cache():
 
 
 @cache.command(cls=FireCliCommand('cache.init'), short_help=HELP['cache']['init']['cmd'])
+@click.option(
+    '-w', '--workers', default=1, required=False, type=click.IntRange(min=1), help=HELP['cache']['init']['workers']
+)
+@click.option('-r', '--resume', default=False, is_flag=True, help=HELP['cache']['init']['resume'])
 @click.pass_obj
-def init(obj):
+def init(obj, workers, resume):
+    """Download objects, policies and devices from firepower management center and save them to the local cache
+
+    \b
+    Example:
+        firecli cache init
+
+    \b
+    Object types, overrides, accessrules and device configuration can be downloaded in parallel by using the -w
+    option
+    \b
+        firecli cache init -w 8
+
+    \b
+    Completed types, overrides and accessrules are checkpointed while downloading. An interrupted download can be
+    continued by using the -r option
+    \b
+        firecli cache init -r
+    """
     api = obj.api
     cfg = obj.cfg
-    cache_dir = cfg['cache_dir']
 
     logger.info('Downloading firepower configuration...')
-    fmc_cache = FmcCache(cache_dir, api)
-    fmc_cache.download()
+    fmc_cache = FmcCache.from_cfg(cfg, api, workers)
+    fmc_cache.download(resume)
     fmc_cache.save()
     logger.info('Successfully saved cache files to %s', fmc_cache.directory)
+
+
+@cache.command(cls=FireCliCommand('cache.refresh'), short_help=HELP['cache']['refresh']['cmd'])
+@click.option(
+    '-w', '--workers', default=1, required=False, type=click.IntRange(min=1), help=HELP['cache']['refresh']['workers']
+)
+@click.option('-a', '--audit', default=False, is_flag=True, help=HELP['cache']['refresh']['audit'])
+@click.pass_obj
+def refresh(obj, workers, audit):
+    """Refresh local cache with changes since the last download. Object and policy listings are downloaded again,
+    but overrides and accessrules are only downloaded for items that changed since the last download according to
+    their metadata or the fmc audit log. Devices and their configuration are always downloaded again
+
+    \b
+    Example:
+        firecli cache refresh
+
+    \b
+    A complete cache is downloaded if the cache has not been initialized yet
+    \b
+        firecli cache refresh -w 8
+
+    \b
+    Objects and policies that were created, modified or deleted according to the fmc audit log can be refreshed
+    without downloading complete listings by using the -a option. Changes that cannot be mapped to cached items
+    result in a complete refresh
+    \b
+        firecli cache refresh -a
+    """
+    api = obj.api
+    cfg = obj.cfg
+
+    logger.info('Refreshing firepower configuration...')
+    fmc_cache = FmcCache.from_cfg(cfg, api, workers)
+    if audit:
+        fmc_cache.audit_refresh()
+    else:
+        fmc_cache.refresh()
+    fmc_cache.save()
+    logger.info('Successfully saved cache files to %s', fmc_cache.directory)
+
+
+@cache.command(cls=FireCliCommand('cache.watch'), short_help=HELP['cache']['watch']['cmd'])
+@click.option(
+    '-i',
+    '--interval',
+    default=300,
+    required=False,
+    type=click.IntRange(min=1),
+    help=HELP['cache']['watch']['interval'],
+)
+@click.option(
+    '-m',
+    '--max-interval',
+    'max_interval',
+    default=3600,
+    required=False,
+    type=click.IntRange(min=1),
+    help=HELP['cache']['watch']['max_interval'],
+)
+@click.option(
+    '-j',
+    '--jitter',
+    default=0.1,
+    required=False,
+    type=click.FloatRange(min=0, max=1),
+    help=HELP['cache']['watch']['jitter'],
+)
+@click.option(
+    '-c', '--count', default=0, required=False, type=click.IntRange(min=0), help=HELP['cache']['watch']['count']
+)
+@click.option(
+    '-w', '--workers', default=1, required=False, type=click.IntRange(min=1), help=HELP['cache']['watch']['workers']
+)
+@click.pass_obj
+def watch(obj, interval, max_interval, jitter, count, workers):
+    """Refresh local cache periodically until interrupted. Each refresh round is saved as a new cache generation,
+    so other commands always read a complete and recent cache
+
+    \b
+    Example:
+        firecli cache watch
+
+    \b
+    Types that changed since their last refresh are refreshed more often. Policies are refreshed first if several
+    types are due at the same time. Intervals can be set using the -i and -m options
+    \b
+        firecli cache watch -i 60 -m 1800 -w 8
+    """
+    api = obj.api
+    cfg = obj.cfg
+
+    fmc_cache = FmcCache.from_cfg(cfg, api, workers)
+    watcher = CacheWatcher(fmc_cache, interval, max_interval, jitter)
+    logger.info(
+        'Watching firepower configuration. Refreshing cache in %s every %s seconds...', fmc_cache.directory, interval
+    )
+    try:
+        watcher.run(count)
+    except KeyboardInterrupt:
+        logger.info('Stopped watching firepower configuration')
+
+
+@cache.command(cls=FireCliCommand('cache.convert'), short_help=HELP['cache']['convert']['cmd'])
+@click.option(
+    '-b',
+    '--backend',
+    required=False,
+    type=click.Choice(list(STORES.keys())),
+    help=HELP['cache']['convert']['backend'],
+)
+@click.option(
+    '-f',
+    '--format',
+    'fmt',
+    required=False,
+    type=click.Choice(available_formats()),
+    help=HELP['cache']['convert']['format'],
+)
+@click.pass_obj
+def convert(obj, backend, fmt):
+    """Convert local cache to another storage backend or file format. Cache files are read regardless of the format
+    they have been saved in. Use cache_backend and cache_format in firecli.yml to select the format that is used
+    for new cache files
+
+    \b
+    Example:
+        firecli cache convert -f gzip
+
+    \b
+    Compact json without indentation or msgpack (if installed) can be used to reduce load times
+    \b
+        firecli cache convert -f msgpack
+    \b
+    The cache can be converted to a sqlite database by using the -b option
+    \b
+        firecli cache convert -b sqlite
+    """
+    cfg = obj.cfg
+    target_cfg = dict(cfg)
+    target_cfg['cache_backend'] = backend if backend else cfg.get('cache_backend', 'json')
+    target_cfg['cache_format'] = fmt if fmt else cfg.get('cache_format', 'json')
+
+    src = FmcCache.from_cfg(cfg)
+    dst = FmcCache.from_cfg(target_cfg)
+    src.load()
+    logger.info(
+        'Converting cache to %s backend using %s format...', target_cfg['cache_backend'], target_cfg['cache_format']
+    )
+    for key, item in src.cache.items():
+        dst.cache[key].cache = item.cache
+        dst.cache[key].fetched = item.fetched
+    dst.save()
+    if target_cfg['cache_backend'] != cfg.get('cache_backend', 'json'):
+        logger.info('Set cache_backend to "%s" in firecli.yml to use the converted cache', target_cfg['cache_backend'])
+    logger.info('Successfully converted cache files in %s', dst.directory)
+
+
+@cache.command(cls=FireCliCommand('cache.history'), short_help=HELP['cache']['history']['cmd'])
+@click.option('-d', '--diff', required=False, type=click.IntRange(min=1), help=HELP['cache']['history']['diff'])
+@click.option('-r', '--restore', required=False, type=click.IntRange(min=1), help=HELP['cache']['history']['restore'])
+@click.pass_obj
+def history(obj, diff, restore):
+    """Show snapshots of previous cache generations. Snapshots are saved by cache init, refresh and watch if
+    cache_history is set in firecli.yml. Objects and rules that did not change are shared by all snapshots, so
+    each snapshot only needs disk space for changed items
+
+    \b
+    Example:
+        firecli cache history
+
+    \b
+    Changes between a snapshot and the newest snapshot can be displayed by using the -d option
+    \b
+        firecli cache history -d 3
+    \b
+    A snapshot can be saved as current cache by using the -r option. Commands that read from cache then use the
+    configuration of the snapshot until the cache is refreshed
+    \b
+        firecli cache history -r 3
+    """
+    cfg = obj.cfg
+
+    fmc_cache = FmcCache.from_cfg(cfg)
+    snapshots = fmc_cache.snapshots.snapshots()
+    if not snapshots:
+        logger.info(
+            'No cache snapshots found in %s. Set cache_history in firecli.yml to keep snapshots', fmc_cache.directory
+        )
+        return
+    generations = [snapshot['generation'] for snapshot in snapshots]
+    for generation in filter(None, [diff, restore]):
+        if generation not in generations:
+            raise click.BadParameter(f'Snapshot {generation} not found. Available snapshots: {generations}')
+
+    if diff:
+        changes = fmc_cache.snapshots.diff(diff, generations[-1])
+        logger.info('Changes between snapshot %s and snapshot %s:', diff, generations[-1])
+        for name, items in changes.items():
+            logger.info(
+                '%s: %s created, %s modified, %s deleted',
+                name,
+                len(items['created']),
+                len(items['modified']),
+                len(items['deleted']),
+            )
+            for change, uuids in items.items():
+                for uuid in uuids:
+                    logger.debug('%s %s %s', change, name, uuid)
+        if not changes:
+            logger.info('No changes found')
+    elif restore:
+        logger.info('Restoring cache snapshot %s...', restore)
+        fmc_cache.load_snapshot(restore)
+        fmc_cache.save()
+        logger.info('Successfully saved snapshot %s to %s', restore, fmc_cache.directory)
+    else:
+        for snapshot in snapshots:
+            logger.info(
+                'Snapshot %s saved %s: %s',
+                snapshot['generation'],
+                snapshot['saved'],
+                ', '.join(f'{count} {key}' for key, count in snapshot['items'].items()),
+            )
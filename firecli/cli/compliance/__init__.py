@@ -65,11 +65,10 @@ def inter_zone_communication(obj, accesspolicy, device):
             logger.error('Could not find device "%s". Exiting.', device)
             sys.exit(2)
 
-    fmc_cache = FmcCache(cfg['cache_dir']).load()
-    for policy in fmc_cache['policies'].cache['accesspolicy']:
-        if policy['id'] == accesspolicy['id']:
-            accessrules = policy['rules']
-            accessrules = api.expanded_accessrules(accessrules, fmc['objects'].cache, device['id'])
-            zone_compliance = ZoneCompliance(profile['zones'], profile['matrix'], accessrules)
-            report = zone_compliance.check_compliance()
-            pprint(report)
+    fmc_cache = FmcCache.from_cfg(cfg)
+    accessrules = fmc_cache.subcache('accesspolicy').iter_rules(accesspolicy['id'])
+    if accessrules is not None:
+        accessrules = api.iter_expanded_accessrules(accessrules, fmc_cache.cache['objects'], device['id'])
+        zone_compliance = ZoneCompliance(profile['zones'], profile['matrix'], accessrules)
+        report = zone_compliance.check_compliance()
+        pprint(report)
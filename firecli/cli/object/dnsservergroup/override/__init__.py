@@ -9,10 +9,10 @@ import click
 import yaml
 
 from fireREST import FMC
-from fireREST.exceptions import GenericApiError
 
 from firecli.api.click import FireCliCommand, FireCliGroup
 from firecli.api.click.callback import validate_and_load_yaml
+from firecli.api.override import object_overrides, update_overrides
 
 logger = getLogger(__name__)
 
@@ -111,12 +111,15 @@ def import_cfg(obj, src):
         sys.exit(os.EX_DATAERR)
 
     logger.info('Updating Object Override configuration according to configuration file')
+    imported = {dnsservergroup['id'] for dnsservergroup in src['objects']['dnsservergroups']}
+    existing = object_overrides(fmc, 'dnsservergroup', [item for item in dnsservergroups if item['id'] in imported])
+    updates = []
     for dnsservergroup in src['objects']['dnsservergroups']:
         container_uuid = None
         for item in dnsservergroups:
             if item['name'] == dnsservergroup['name']:
                 container_uuid = item['id']
-        existing_overrides = fmc.object.dnsservergroup.override.get(container_uuid=container_uuid)
+        existing_overrides = existing.get(container_uuid, [])
         for obj_override in dnsservergroup['overrides']:
             identical_override_already_exists = False
             override_for_device_already_exists = False
@@ -156,10 +159,7 @@ def import_cfg(obj, src):
                     'type': 'DNSServerGroupObject',
                     'id': dnsservergroup['id'],
                 }
-                try:
-                    fmc.object.dnsservergroup.update(data=data)
-                except GenericApiError as exc:
-                    logger.error('Operation failed with error: %s', str(exc))
+                updates.append(data)
 
             else:
                 logger.debug(
@@ -169,6 +169,10 @@ def import_cfg(obj, src):
                     obj_override['values'],
                 )
 
+    for data, exc in update_overrides(fmc, 'dnsservergroup', updates):
+        if exc is not None:
+            logger.error('Operation failed for %s with error: %s', data['name'], str(exc))
+
 
 @override.command(
     cls=FireCliCommand('object.dnsservergroup.override.export_cfg'), name='export', short_help=HELP['export']['cmd']
@@ -194,12 +198,11 @@ def export_cfg(obj, dst):
     fmc = obj.api.fmc  # type: FMC
     logger.info('Downloading DnsServerGroup Object Override configuration from FMC...')
     dnsservergroups = fmc.object.dnsservergroup.get()
-    overrides = []
-    for dnsservergroup in dnsservergroups:
-        if dnsservergroup['overridable']:
-            obj_override = fmc.object.dnsservergroup.override.get(container_uuid=dnsservergroup['id'])
-            if len(obj_override) > 0:
-                overrides.append(obj_override)
+    overrides = [
+        obj_override
+        for obj_override in object_overrides(fmc, 'dnsservergroup', dnsservergroups).values()
+        if len(obj_override) > 0
+    ]
 
     logger.info('Parsing DnsServerGroup Object Overrides...')
     report = {'objects': {'dnsservergroups': []}}
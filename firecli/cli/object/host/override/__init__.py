@@ -9,10 +9,10 @@ import click
 import yaml
 
 from fireREST import FMC
-from fireREST.exceptions import GenericApiError
 
 from firecli.api.click import FireCliCommand, FireCliGroup
 from firecli.api.click.callback import validate_and_load_yaml
+from firecli.api.override import object_overrides, update_overrides
 
 logger = getLogger(__name__)
 
@@ -107,12 +107,15 @@ def import_cfg(obj, src):
         sys.exit(os.EX_DATAERR)
 
     logger.info('Updating Object Override configuration according to configuration file')
+    imported = {host['id'] for host in src['objects']['hosts']}
+    existing = object_overrides(fmc, 'host', [item for item in hosts if item['id'] in imported])
+    updates = []
     for host in src['objects']['hosts']:
         container_uuid = None
         for item in hosts:
             if item['name'] == host['name']:
                 container_uuid = item['id']
-        existing_overrides = fmc.object.host.override.get(container_uuid=container_uuid)
+        existing_overrides = existing.get(container_uuid, [])
         for obj_override in host['overrides']:
             identical_override_already_exists = False
             override_for_device_already_exists = False
@@ -148,10 +151,7 @@ def import_cfg(obj, src):
                     'name': host['name'],
                     'id': host['id'],
                 }
-                try:
-                    fmc.object.host.update(data=data)
-                except GenericApiError as exc:
-                    logger.error('Operation failed with error: %s', str(exc))
+                updates.append(data)
 
             else:
                 logger.debug(
@@ -161,6 +161,10 @@ def import_cfg(obj, src):
                     obj_override['value'],
                 )
 
+    for data, exc in update_overrides(fmc, 'host', updates):
+        if exc is not None:
+            logger.error('Operation failed for %s with error: %s', data['name'], str(exc))
+
 
 @override.command(
     cls=FireCliCommand('object.host.override.export_cfg'), name='export', short_help=HELP['export']['cmd']
@@ -186,12 +190,9 @@ def export_cfg(obj, dst):
     fmc = obj.api.fmc  # type: FMC
     logger.info('Downloading Host Object Override configuration from FMC...')
     hosts = fmc.object.host.get()
-    overrides = []
-    for host in hosts:
-        if host['overridable']:
-            obj_override = fmc.object.host.override.get(container_uuid=host['id'])
-            if len(obj_override) > 0:
-                overrides.append(obj_override)
+    overrides = [
+        obj_override for obj_override in object_overrides(fmc, 'host', hosts).values() if len(obj_override) > 0
+    ]
 
     logger.info('Parsing Host Object Overrides...')
     report = {'objects': {'hosts': []}}
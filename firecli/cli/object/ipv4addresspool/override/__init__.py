@@ -10,11 +10,11 @@ import click
 import yaml
 
 from fireREST import FMC
-from fireREST.exceptions import GenericApiError
 
 from firecli.api.helper import cidr_to_netmask
 from firecli.api.click import FireCliCommand, FireCliGroup
 from firecli.api.click.callback import validate_and_load_yaml
+from firecli.api.override import object_overrides, update_overrides
 
 logger = getLogger(__name__)
 
@@ -109,12 +109,15 @@ def import_cfg(obj, src):
         sys.exit(os.EX_DATAERR)
 
     logger.info('Updating Object Override configuration according to configuration file')
+    imported = {ipv4addresspool['id'] for ipv4addresspool in src['objects']['ipv4addresspools']}
+    existing = object_overrides(fmc, 'ipv4addresspool', [item for item in ipv4addresspools if item['id'] in imported])
+    updates = []
     for ipv4addresspool in src['objects']['ipv4addresspools']:
         container_uuid = None
         for item in ipv4addresspools:
             if item['name'] == ipv4addresspool['name']:
                 container_uuid = item['id']
-        existing_overrides = fmc.object.ipv4addresspool.override.get(container_uuid=container_uuid)
+        existing_overrides = existing.get(container_uuid, [])
         for obj_override in ipv4addresspool['overrides']:
             identical_override_already_exists = False
             override_for_device_already_exists = False
@@ -158,10 +161,7 @@ def import_cfg(obj, src):
                     data['mask'] = cidr_to_netmask(obj_override['value'].split('/')[1])
                 else:
                     data['ipAddressRange'] = obj_override['value']
-                try:
-                    fmc.object.ipv4addresspool.update(data=data)
-                except GenericApiError as exc:
-                    logger.error('Operation failed with error: %s', str(exc))
+                updates.append(data)
 
             else:
                 logger.debug(
@@ -171,6 +171,10 @@ def import_cfg(obj, src):
                     obj_override['value'],
                 )
 
+    for data, exc in update_overrides(fmc, 'ipv4addresspool', updates):
+        if exc is not None:
+            logger.error('Operation failed for %s with error: %s', data['name'], str(exc))
+
 
 @override.command(
     cls=FireCliCommand('object.ipv4addresspool.override.export_cfg'), name='export', short_help=HELP['export']['cmd']
@@ -196,12 +200,11 @@ def export_cfg(obj, dst):
     fmc = obj.api.fmc  # type: FMC
     logger.info('Downloading Ipv4AddressPool Object Override configuration from FMC...')
     ipv4addresspools = fmc.object.ipv4addresspool.get()
-    overrides = []
-    for ipv4addresspool in ipv4addresspools:
-        if ipv4addresspool['overridable']:
-            obj_override = fmc.object.ipv4addresspool.override.get(container_uuid=ipv4addresspool['id'])
-            if len(obj_override) > 0:
-                overrides.append(obj_override)
+    overrides = [
+        obj_override
+        for obj_override in object_overrides(fmc, 'ipv4addresspool', ipv4addresspools).values()
+        if len(obj_override) > 0
+    ]
 
     logger.info('Parsing Ipv4AddressPool Object Overrides...')
     report = {'objects': {'ipv4addresspools': []}}
@@ -7,10 +7,10 @@ from typing import Any, Dict
 import click
 import yaml
 from fireREST import FMC
-from fireREST.exceptions import GenericApiError
 
 from firecli.api.click import FireCliCommand, FireCliGroup
 from firecli.api.click.callback import validate_and_load_yaml
+from firecli.api.override import object_overrides, update_overrides
 
 
 logger = getLogger(__name__)
@@ -106,13 +106,16 @@ def import_cfg(obj, src):
         sys.exit(os.EX_DATAERR)
 
     logger.info('Updating Object Override configuration according to configuration file')
+    imported = {network['id'] for network in src['objects']['networks']}
+    existing = object_overrides(fmc, 'network', [item for item in networks if item['id'] in imported])
+    updates = []
     for network in src['objects']['networks']:
         container_uuid = None
         for item in networks:
             if item['name'] == network['name']:
                 container_uuid = item['id']
                 network['type'] = item['type']
-        existing_overrides = fmc.object.network.override.get(container_uuid=container_uuid)
+        existing_overrides = existing.get(container_uuid, [])
         for override in network['overrides']:
             identical_override_already_exists = False
             override_for_device_already_exists = False
@@ -148,10 +151,7 @@ def import_cfg(obj, src):
                     'name': network['name'],
                     'id': network['id'],
                 }
-                try:
-                    fmc.object.network.update(data=data)
-                except GenericApiError as exc:
-                    logger.error('Operation failed with error: %s', str(exc))
+                updates.append(data)
 
             else:
                 logger.debug(
@@ -161,6 +161,10 @@ def import_cfg(obj, src):
                     override['value'],
                 )
 
+    for data, exc in update_overrides(fmc, 'network', updates):
+        if exc is not None:
+            logger.error('Operation failed for %s with error: %s', data['name'], str(exc))
+
 
 @override.command(
     cls=FireCliCommand('object.network.override.import_cfg'), name='export', short_help=HELP['export']['cmd']
@@ -186,12 +190,7 @@ def export_cfg(obj, dst):
     fmc = obj.api.fmc  # type: FMC
     logger.info('Downloading Network Object Override configuration from FMC...')
     networks = fmc.object.network.get()
-    overrides = []
-    for network in networks:
-        if network['overridable']:
-            override = fmc.object.network.override.get(container_uuid=network['id'])
-            if len(override) > 0:
-                overrides.append(override)
+    overrides = [override for override in object_overrides(fmc, 'network', networks).values() if len(override) > 0]
 
     logger.info('Parsing Network Object Overrides...')
     report = {'objects': {'networks': []}}
@@ -7,10 +7,10 @@ from typing import Any, Dict
 import click
 import yaml
 from fireREST import FMC
-from fireREST.exceptions import GenericApiError
 
 from firecli.api.click import FireCliCommand, FireCliGroup
 from firecli.api.click.callback import validate_and_load_yaml
+from firecli.api.override import object_overrides, update_overrides
 
 
 logger = getLogger(__name__)
@@ -112,13 +112,16 @@ def import_cfg(obj, src):
         sys.exit(os.EX_DATAERR)
 
     logger.info('Updating Object Override configuration according to configuration file')
+    imported = {networkgroup['id'] for networkgroup in src['objects']['networkgroups']}
+    existing = object_overrides(fmc, 'networkgroup', [item for item in networkgroups if item['id'] in imported])
+    updates = []
     for networkgroup in src['objects']['networkgroups']:
         container_uuid = None
         for item in networkgroups:
             if item['name'] == networkgroup['name']:
                 container_uuid = item['id']
                 networkgroup['type'] = item['type']
-        existing_overrides = fmc.object.networkgroup.override.get(container_uuid=container_uuid)
+        existing_overrides = existing.get(container_uuid, [])
         for override in networkgroup['overrides']:
             identical_override_already_exists = False
             override_for_device_already_exists = False
@@ -159,10 +162,7 @@ def import_cfg(obj, src):
                 for item in override['values']:
                     literal = {'value': item, 'type': 'Network' if '/' in item else 'Range' if '-' in item else 'Host'}
                     data['literals'].append(literal)
-                try:
-                    fmc.object.networkgroup.update(data=data)
-                except GenericApiError as exc:
-                    logger.error('Operation failed with error: %s', str(exc))
+                updates.append(data)
 
             else:
                 logger.debug(
@@ -172,6 +172,10 @@ def import_cfg(obj, src):
                     override['values'],
                 )
 
+    for data, exc in update_overrides(fmc, 'networkgroup', updates):
+        if exc is not None:
+            logger.error('Operation failed for %s with error: %s', data['name'], str(exc))
+
 
 @override.command(
     cls=FireCliCommand('object.networkgroup.override.export'), name='export', short_help=HELP['export']['cmd']
@@ -197,12 +201,9 @@ def export_cfg(obj, dst):
     fmc = obj.api.fmc  # type: FMC
     logger.info('Downloading Networkgroup Object Override configuration from FMC...')
     networkgroups = fmc.object.networkgroup.get()
-    overrides = []
-    for networkgroup in networkgroups:
-        if networkgroup['overridable']:
-            override = fmc.object.networkgroup.override.get(container_uuid=networkgroup['id'])
-            if len(override) > 0:
-                overrides.append(override)
+    overrides = [
+        override for override in object_overrides(fmc, 'networkgroup', networkgroups).values() if len(override) > 0
+    ]
     logger.info('Parsing Networkgroup Object Overrides...')
     report = {'objects': {'networkgroups': []}}
     for obj in overrides:
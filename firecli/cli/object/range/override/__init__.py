@@ -7,10 +7,10 @@ from typing import Any, Dict
 import click
 import yaml
 from fireREST import FMC
-from fireREST.exceptions import GenericApiError
 
 from firecli.api.click import FireCliCommand, FireCliGroup
 from firecli.api.click.callback import validate_and_load_yaml
+from firecli.api.override import object_overrides, update_overrides
 
 
 logger = getLogger(__name__)
@@ -104,13 +104,16 @@ def import_cfg(obj, src):
         sys.exit(os.EX_DATAERR)
 
     logger.info('Updating Object Override configuration according to configuration file')
+    imported = {range['id'] for range in src['objects']['ranges']}
+    existing = object_overrides(fmc, 'range', [item for item in ranges if item['id'] in imported])
+    updates = []
     for range in src['objects']['ranges']:
         container_uuid = None
         for item in ranges:
             if item['name'] == range['name']:
                 container_uuid = item['id']
                 range['type'] = item['type']
-        existing_overrides = fmc.object.range.override.get(container_uuid=container_uuid)
+        existing_overrides = existing.get(container_uuid, [])
         for override in range['overrides']:
             identical_override_already_exists = False
             override_for_device_already_exists = False
@@ -146,10 +149,7 @@ def import_cfg(obj, src):
                     'name': range['name'],
                     'id': range['id'],
                 }
-                try:
-                    fmc.object.range.update(data=data)
-                except GenericApiError as exc:
-                    logger.error('Operation failed with error: %s', str(exc))
+                updates.append(data)
 
             else:
                 logger.debug(
@@ -159,6 +159,10 @@ def import_cfg(obj, src):
                     override['value'],
                 )
 
+    for data, exc in update_overrides(fmc, 'range', updates):
+        if exc is not None:
+            logger.error('Operation failed for %s with error: %s', data['name'], str(exc))
+
 
 @override.command(cls=FireCliCommand('object.range.override.export'), name='export', short_help=HELP['export']['cmd'])
 @click.option(
@@ -182,12 +186,7 @@ def export_cfg(obj, dst):
     fmc = obj.api.fmc  # type: FMC
     logger.info('Downloading Range Object Override configuration from FMC...')
     network_ranges = fmc.object.range.get()
-    overrides = []
-    for network_Range in network_ranges:
-        if network_Range['overridable']:
-            override = fmc.object.range.override.get(container_uuid=network_Range['id'])
-            if len(override) > 0:
-                overrides.append(override)
+    overrides = [override for override in object_overrides(fmc, 'range', network_ranges).values() if len(override) > 0]
 
     logger.info('Parsing Range Object Overrides...')
     report = {'objects': {'ranges': []}}
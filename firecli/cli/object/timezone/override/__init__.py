@@ -9,10 +9,10 @@ import click
 import yaml
 
 from fireREST import FMC
-from fireREST.exceptions import GenericApiError
 
 from firecli.api.click import FireCliCommand, FireCliGroup
 from firecli.api.click.callback import validate_and_load_yaml
+from firecli.api.override import object_overrides, update_overrides
 
 logger = getLogger(__name__)
 
@@ -107,12 +107,15 @@ def import_cfg(obj, src):
         sys.exit(os.EX_DATAERR)
 
     logger.info('Updating Object Override configuration according to configuration file')
+    imported = {timezone['id'] for timezone in src['objects']['timezones']}
+    existing = object_overrides(fmc, 'timezone', [item for item in timezones if item['id'] in imported])
+    updates = []
     for timezone in src['objects']['timezones']:
         container_uuid = None
         for item in timezones:
             if item['name'] == timezone['name']:
                 container_uuid = item['id']
-        existing_overrides = fmc.object.timezone.override.get(container_uuid=container_uuid)
+        existing_overrides = existing.get(container_uuid, [])
         for obj_override in timezone['overrides']:
             identical_override_already_exists = False
             override_for_device_already_exists = False
@@ -148,10 +151,7 @@ def import_cfg(obj, src):
                     'name': timezone['name'],
                     'id': timezone['id'],
                 }
-                try:
-                    fmc.object.timezone.update(data=data)
-                except GenericApiError as exc:
-                    logger.error('Operation failed with error: %s', str(exc))
+                updates.append(data)
 
             else:
                 logger.debug(
@@ -161,6 +161,10 @@ def import_cfg(obj, src):
                     obj_override['value'],
                 )
 
+    for data, exc in update_overrides(fmc, 'timezone', updates):
+        if exc is not None:
+            logger.error('Operation failed for %s with error: %s', data['name'], str(exc))
+
 
 @override.command(
     cls=FireCliCommand('object.timezone.override.export_cfg'), name='export', short_help=HELP['export']['cmd']
@@ -186,12 +190,9 @@ def export_cfg(obj, dst):
     fmc = obj.api.fmc  # type: FMC
     logger.info('Downloading Timezone Object Override configuration from FMC...')
     timezones = fmc.object.timezone.get()
-    overrides = []
-    for timezone in timezones:
-        if timezone['overridable']:
-            obj_override = fmc.object.timezone.override.get(container_uuid=timezone['id'])
-            if len(obj_override) > 0:
-                overrides.append(obj_override)
+    overrides = [
+        obj_override for obj_override in object_overrides(fmc, 'timezone', timezones).values() if len(obj_override) > 0
+    ]
 
     logger.info('Parsing Timezone Object Overrides...')
     report = {'objects': {'timezones': []}}
@@ -7,10 +7,10 @@ from typing import Any, Dict
 import click
 import yaml
 from fireREST import FMC
-from fireREST.exceptions import GenericApiError
 
 from firecli.api.click import FireCliCommand, FireCliGroup
 from firecli.api.click.callback import validate_and_load_yaml
+from firecli.api.override import object_overrides, update_overrides
 
 
 logger = getLogger(__name__)
@@ -104,12 +104,15 @@ def import_cfg(obj, src):
         sys.exit(os.EX_DATAERR)
 
     logger.info('Updating Object Override configuration according to configuration file')
+    imported = {url['id'] for url in src['objects']['urls']}
+    existing = object_overrides(fmc, 'url', [item for item in urls if item['id'] in imported])
+    updates = []
     for url in src['objects']['urls']:
         container_uuid = None
         for item in urls:
             if item['name'] == url['name']:
                 container_uuid = item['id']
-        existing_overrides = fmc.object.url.override.get(container_uuid=container_uuid)
+        existing_overrides = existing.get(container_uuid, [])
         for override in url['overrides']:
             identical_override_already_exists = False
             override_for_device_already_exists = False
@@ -145,10 +148,7 @@ def import_cfg(obj, src):
                     'name': url['name'],
                     'id': url['id'],
                 }
-                try:
-                    fmc.object.url.update(data=data)
-                except GenericApiError as exc:
-                    logger.error('Operation failed with error: %s', str(exc))
+                updates.append(data)
 
             else:
                 logger.debug(
@@ -158,6 +158,10 @@ def import_cfg(obj, src):
                     override['value'],
                 )
 
+    for data, exc in update_overrides(fmc, 'url', updates):
+        if exc is not None:
+            logger.error('Operation failed for %s with error: %s', data['name'], str(exc))
+
 
 @override.command(cls=FireCliCommand('object.url.override.export'), name='export', short_help=HELP['export']['cmd'])
 @click.option(
@@ -181,12 +185,7 @@ def export_cfg(obj, dst):
     fmc = obj.api.fmc  # type: FMC
     logger.info('Downloading URL Object Override configuration from FMC...')
     urls = fmc.object.url.get()
-    overrides = []
-    for url in urls:
-        if url['overridable']:
-            override = fmc.object.url.override.get(container_uuid=url['id'])
-            if len(override) > 0:
-                overrides.append(override)
+    overrides = [override for override in object_overrides(fmc, 'url', urls).values() if len(override) > 0]
 
     logger.info('Parsing URL Object Overrides...')
     report = {'objects': {'urls': []}}
@@ -125,7 +125,7 @@ def no_of_accessrules(ctx, accesspolicy, fmt, output_dir):
     """
     fmc = ctx.obj.api.fmc  # type: FMC
     report_api.log_report_gen(ctx)
-    data = report_api.accessrule_count(fmc, accesspolicy)
+    data = report_api.accessrule_count(fmc, accesspolicy, ctx.obj.api.cached)
     path = report_api.report_path(ctx.command.name, output_dir, fmt)
     report_api.save(path, data)
 
@@ -202,7 +202,7 @@ def accessrules_without_comments(ctx, accesspolicy, fmt, output_dir, summary):
     """
     fmc = ctx.obj.api.fmc  # type: FMC
     report_api.log_report_gen(ctx)
-    data = report_api.accessrules_without_comments(fmc, accesspolicy)
+    data = report_api.accessrules_without_comments(fmc, accesspolicy, ctx.obj.api.cached)
     path = report_api.report_path(ctx.command.name, output_dir, fmt, summary)
     report_api.save(path, data)
 
@@ -294,7 +294,7 @@ def accessrules_without_ticketid(ctx, accesspolicy, fmt, output_dir, patterns, s
     """
     fmc = ctx.obj.api.fmc  # type: FMC
     report_api.log_report_gen(ctx)
-    data = report_api.accessrules_without_ticket_id(fmc, patterns, accesspolicy)
+    data = report_api.accessrules_without_ticket_id(fmc, patterns, accesspolicy, ctx.obj.api.cached)
     path = report_api.report_path(ctx.command.name, output_dir, fmt, summary)
     report_api.save(path, data)
 
@@ -476,6 +476,6 @@ def noncompliant_network_segments(ctx, device, fmt, networks, output_dir):
     """
     fmc = ctx.obj.api.fmc  # type: FMC
     report_api.log_report_gen(ctx)
-    data = report_api.noncompliant_network_segments(fmc, device, networks)
+    data = report_api.noncompliant_network_segments(fmc, device, networks, ctx.obj.api.cached)
     path = report_api.report_path(ctx.command.name, output_dir, fmt)
     report_api.save(path, data)
@@ -6,7 +6,6 @@ import click
 
 from firecli.api import API
 
-from fireREST import FMC
 from fireREST.exceptions import ResourceNotFoundError
 
 from firecli.api.click import FireCliCommand, FireCliGroup
@@ -37,12 +36,11 @@ def sync():
 @click.pass_obj
 def hapair(obj, src, dst):
     api = obj.api  # type: API
-    fmc = api.fmc  # type: FMC
 
     logger.info('Synchronizing configuration from %s to %s...', src, dst)
     try:
-        src = fmc.devicehapair.ftdhapair.get(name=src)
-        dst = fmc.devicehapair.ftdhapair.get(name=dst)
+        src = api.cached_get('ftdhapair', item_name=src) or api.fmc.devicehapair.ftdhapair.get(name=src)
+        dst = api.cached_get('ftdhapair', item_name=dst) or api.fmc.devicehapair.ftdhapair.get(name=dst)
     except ResourceNotFoundError as exc:
         logger.error(str(exc))
         sys.exit(2)
@@ -34,6 +34,7 @@ setuptools.setup(
         'rich>=9.2.0',
         'stackprinter>=0.2.5',
     ],
+    extras_require={'msgpack': ['msgpack>=1.0.0'], 'zstd': ['zstandard>=0.15.0']},
     setup_requires=['pytest-runner'],
     tests_require=['pytest'],
     classifiers=[
@@ -0,0 +1,80 @@
+import json
+from urllib.parse import parse_qs, urlsplit
+
+import requests
+
+from firecli.api.afa import AFA
+
+RISKY_RULES = 'https://afa.example.com/fa/server/risks/riskyRules'
+
+
+class FakeAdapter(requests.adapters.BaseAdapter):
+    """Transport adapter of an AlgoSec appliance that issues numbered session tokens. Requests with an `expired`
+    token are answered with 401 and the next `failures` api requests with 503
+    """
+
+    def __init__(self, failures=0):
+        super().__init__()
+        self.requests = []
+        self.logins = 0
+        self.expired = set()
+        self.failures = failures
+
+    def send(self, request, **kwargs):
+        url = urlsplit(request.url)
+        self.requests.append((request.method, url.path))
+        response = requests.Response()
+        response.status_code = 200
+        if url.path.endswith('/login'):
+            self.logins += 1
+            body = {'SessionID': f'token-{self.logins}'}
+        elif parse_qs(url.query)['session'][0] in self.expired:
+            response.status_code = 401
+            body = {}
+        elif self.failures > 0:
+            self.failures -= 1
+            response.status_code = 503
+            body = {}
+        else:
+            body = {'rules': []}
+        response._content = json.dumps(body).encode()
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+
+def _afa(adapter, **kwargs):
+    session = requests.Session()
+    session.mount('https://', adapter)
+    afa = AFA('afa.example.com', 'firecli', 'password', session=session, **kwargs)
+    afa.sleep = lambda seconds: afa.delays.append(seconds)
+    afa.delays = []
+    return afa
+
+
+def test_authenticates_lazily_and_again_after_session_expired():
+    adapter = FakeAdapter()
+    afa = _afa(adapter)
+    assert adapter.requests == []
+
+    assert afa.get(RISKY_RULES) == {'rules': []}
+    adapter.expired.add(afa.token)
+    assert afa.get(RISKY_RULES) == {'rules': []}
+
+    assert adapter.logins == 2
+    assert afa.token == 'token-2'
+    assert len(adapter.requests) == 5
+
+
+def test_idempotent_requests_are_retried_with_backoff():
+    adapter = FakeAdapter(failures=2)
+    afa = _afa(adapter, backoff=0.5)
+    assert afa.get(RISKY_RULES) == {'rules': []}
+    assert afa.delays == [0.5, 1.0]
+
+    adapter.failures = 1
+    assert afa.post(RISKY_RULES, data={}).status_code == 503
+    assert afa.delays == [0.5, 1.0]
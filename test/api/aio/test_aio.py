@@ -0,0 +1,54 @@
+import asyncio
+import threading
+import time
+
+from firecli.api.aio import AsyncFMC
+
+
+class FakeOverride:
+    def get(self, container_uuid=None):
+        return [{'id': f'{container_uuid}-override'}]
+
+
+class FakeHost:
+    def __init__(self):
+        self.override = FakeOverride()
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def get(self, uuid=None):
+        with self._lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(0.01)
+        with self._lock:
+            self.active -= 1
+        return {'id': uuid}
+
+
+class FakeObject:
+    def __init__(self):
+        self.host = FakeHost()
+
+
+class FakeFMC:
+    def __init__(self):
+        self.object = FakeObject()
+
+
+def test_async_resources_limit_requests_in_flight():
+    fmc = FakeFMC()
+
+    async def fetch(aio):
+        hosts = await asyncio.gather(*(aio.object.host.get(uuid=str(i)) for i in range(12)))
+        overrides = await aio.object.host.override.get(container_uuid='0')
+        return hosts, overrides
+
+    with AsyncFMC(fmc, concurrency=3) as aio:
+        hosts, overrides = aio.run(fetch(aio))
+        assert aio.map(lambda uuid: fmc.object.host.get(uuid=uuid), ['a', 'b']) == [{'id': 'a'}, {'id': 'b'}]
+
+    assert hosts == [{'id': str(i)} for i in range(12)]
+    assert overrides == [{'id': '0-override'}]
+    assert 1 < fmc.object.host.max_active <= 3
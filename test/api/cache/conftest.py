@@ -0,0 +1,129 @@
+import copy
+from types import SimpleNamespace
+
+import pytest
+from fireREST.exceptions import ResourceNotFoundError
+
+from firecli.api.cache import OBJECT_TYPES, OVERRIDABLE_OBJECT_TYPES
+
+
+class FakeResource:
+    """Minimal stand-in for a fireREST resource that serves static items"""
+
+    def __init__(self, items=None, containers=None, **children):
+        self.items = items if items is not None else []
+        self.containers = containers if containers is not None else {}
+        self.calls = 0
+        self.updates = []
+        for name, child in children.items():
+            setattr(self, name, child)
+
+    def get(self, container_uuid=None, uuid=None, name=None, params=None):
+        self.calls += 1
+        if params and 'overrideTargetId' in params:
+            return [
+                copy.deepcopy(item)
+                for items in self.override.containers.values()
+                for item in items
+                if item['overrides']['target']['id'] == params['overrideTargetId']
+            ]
+        items = self.containers.get(container_uuid, []) if container_uuid else self.items
+        if uuid or name:
+            for item in items:
+                if item['id'] == uuid or item['name'] == name:
+                    return copy.deepcopy(item)
+            raise ResourceNotFoundError(msg=f'{uuid or name} not found')
+        return copy.deepcopy(items)
+
+    def update(self, data):
+        if data['id'] not in {item['id'] for item in self.items}:
+            raise ResourceNotFoundError(msg=f'{data["id"]} not found')
+        self.updates.append(data)
+
+
+def fake_objects(name: str, count: int):
+    return [
+        {
+            'id': f'{name}-{index}',
+            'name': f'{name.upper()}_{index}',
+            'type': name.capitalize(),
+            'overridable': name in OVERRIDABLE_OBJECT_TYPES and index % 2 == 0,
+            'metadata': {'timestamp': 1000},
+        }
+        for index in range(count)
+    ]
+
+
+def fake_overrides(name: str, items):
+    return {
+        item['id']: [
+            {
+                'name': item['name'],
+                'value': f'{item["name"]}-override',
+                'overrides': {'parent': {'id': item['id']}, 'target': {'id': 'device-0'}},
+            }
+        ]
+        for item in items
+        if item['overridable']
+    }
+
+
+@pytest.fixture()
+def fake_fmc():
+    objects = dict()
+    for name in OBJECT_TYPES:
+        items = fake_objects(name, 5)
+        objects[name] = FakeResource(items, override=FakeResource(containers=fake_overrides(name, items)))
+    accesspolicies = [{'id': f'accesspolicy-{index}', 'name': f'ACP_{index}'} for index in range(3)]
+    prefilterpolicies = [{'id': f'prefilterpolicy-{index}', 'name': f'PRE_{index}'} for index in range(2)]
+    accessrules = {
+        policy['id']: [
+            {'id': f'{policy["id"]}-rule-{index}', 'name': f'RULE_{index}', 'metadata': {'accessPolicy': policy}}
+            for index in range(4)
+        ]
+        for policy in accesspolicies + prefilterpolicies
+    }
+    policy = {
+        'accesspolicy': FakeResource(accesspolicies, accessrule=FakeResource(containers=accessrules)),
+        'prefilterpolicy': FakeResource(prefilterpolicies, accessrule=FakeResource(containers=accessrules)),
+    }
+    devices = [{'id': f'device-{index}', 'name': f'ftd{index:02d}.example.com'} for index in range(4)]
+    ftdhapairs = [
+        {'id': f'ftdhapair-{index}', 'name': f'ftd{index}', 'primary': devices[index * 2]} for index in range(2)
+    ]
+    policyassignments = [
+        {
+            'id': policy['id'],
+            'policy': {'id': policy['id'], 'name': policy['name'], 'type': 'AccessPolicy'},
+            'targets': [{'id': ftdhapair['id'], 'name': ftdhapair['name'], 'type': 'DeviceHAPair'}],
+        }
+        for policy, ftdhapair in zip(accesspolicies, ftdhapairs)
+    ]
+    routes = {
+        device['id']: [{'id': f'{device["id"]}-route-0', 'interfaceName': 'inside', 'selectedNetworks': []}]
+        for device in devices
+    }
+    subinterfaces = {
+        device['id']: [{'id': f'{device["id"]}-subinterface-0', 'name': 'Port-channel1'}] for device in devices
+    }
+    device = SimpleNamespace(
+        devicerecord=FakeResource(
+            devices,
+            routing=SimpleNamespace(ipv4staticroute=FakeResource(containers=routes)),
+            subinterface=FakeResource(containers=subinterfaces),
+        )
+    )
+    return SimpleNamespace(
+        object=SimpleNamespace(**objects),
+        policy=SimpleNamespace(**policy),
+        device=device,
+        devicehapair=SimpleNamespace(ftdhapair=FakeResource(ftdhapairs)),
+        assignment=SimpleNamespace(policyassignment=FakeResource(policyassignments)),
+        audit=SimpleNamespace(auditrecord=FakeResource()),
+        system=SimpleNamespace(info=SimpleNamespace(domain=FakeResource([{'id': 'domain-0', 'name': 'Global'}]))),
+    )
+
+
+@pytest.fixture()
+def fake_api(fake_fmc):
+    return SimpleNamespace(fmc=fake_fmc)
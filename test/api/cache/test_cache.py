@@ -0,0 +1,693 @@
+import io
+import json
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+from firecli.api import API
+from firecli.api import report as report_api
+from firecli.api.cache import DEVICE_CONFIG_TYPES, OBJECT_TYPES, Cache, DeviceCache, FmcCache, ObjectCache, PolicyCache
+from firecli.api.cache import store
+from firecli.api.cache.store import Checkpoint, JsonStore, Store, atomic_write, available_formats, dumps, iter_items
+from firecli.api.override import PER_OBJECT, PER_TARGET, object_overrides, override_strategy, update_overrides
+
+
+HOST_ID = '00505683-0000-0ed3-0000-000000000001'
+POLICY_ID = '00505683-0000-0ed3-0000-000000000002'
+
+
+def _audit_record(method: str, path: str):
+    return {'message': f'{method} /api/fmc_config/v1/domain/e276abec-e0f2-11e3-8169-6d9ed49b625f/{path}'}
+
+
+def _read_cache_files(directory):
+    return {
+        str(f.relative_to(directory)): f.read_bytes()
+        for f in sorted(directory.rglob('*'))
+        if f.is_file() and not f.name.startswith('.')
+    }
+
+
+def test_object_cache_download_includes_overrides(tmp_path, fake_api):
+    cache = ObjectCache(str(tmp_path), fake_api)
+    cache.download()
+
+    for obj in cache.cache['host']:
+        assert ('overrides' in obj) == obj['overridable']
+    assert 'overrides' not in cache.cache['fqdn'][0]
+
+
+def test_overrides_are_downloaded_per_target_if_there_are_fewer_targets(tmp_path, fake_api):
+    per_object = ObjectCache(str(tmp_path / 'object'), fake_api)
+    per_object.download()
+    fake_api.fmc.device.devicerecord.items = fake_api.fmc.device.devicerecord.items[:1]
+    fake_api.fmc.object.host.override.calls = 0
+    per_target = ObjectCache(str(tmp_path / 'target'), fake_api, workers=4)
+    per_target.download()
+
+    assert fake_api.fmc.object.host.override.calls == 0
+    assert per_target.cache == per_object.cache
+
+
+def test_object_overrides_choose_strategy_with_fewer_requests(fake_api):
+    host = fake_api.fmc.object.host
+    by_object = object_overrides(fake_api.fmc, 'host', host.items, targets=[{'id': f'device-{i}'} for i in range(4)])
+    assert host.override.calls == 3
+
+    by_target = object_overrides(fake_api.fmc, 'host', host.items, targets=[{'id': 'device-0'}])
+    assert host.override.calls == 3
+    assert by_target == by_object
+    assert object_overrides(fake_api.fmc, 'fqdn', fake_api.fmc.object.fqdn.items) == dict()
+
+
+def test_override_strategy_includes_pages_of_target_listings():
+    targets = [{'id': f'device-{i}'} for i in range(81)]
+
+    assert override_strategy(1000, targets, 40000) == PER_OBJECT
+    assert override_strategy(1000, targets, 10000) == PER_TARGET
+    assert override_strategy(100, targets[:4], 100) == PER_TARGET
+    assert override_strategy(4, targets[:4]) == PER_OBJECT
+
+
+@pytest.mark.parametrize('targets', [[{'id': f'device-{i}'} for i in range(4)], [{'id': 'device-0'}]])
+def test_concurrent_object_overrides_are_identical(fake_api, targets):
+    host = fake_api.fmc.object.host
+    sequential = object_overrides(fake_api.fmc, 'host', host.items, targets=targets)
+    concurrent = object_overrides(fake_api.fmc, 'host', host.items, targets=targets, concurrency=4)
+
+    assert list(concurrent) == list(sequential)
+    assert concurrent == sequential
+
+
+@pytest.mark.parametrize('concurrency', [1, 4])
+def test_override_updates_report_result_of_each_update(fake_api, concurrency):
+    host = fake_api.fmc.object.host
+    updates = [{'id': item['id'], 'name': item['name'], 'value': '198.18.0.1'} for item in host.items]
+    updates.insert(1, {'id': 'missing', 'name': 'missing', 'value': '198.18.0.1'})
+    results = update_overrides(fake_api.fmc, 'host', updates, concurrency=concurrency)
+
+    assert [data for data, _ in results] == updates
+    assert [data['id'] for data, exc in results if exc is not None] == ['missing']
+    assert sorted(data['id'] for data in host.updates) == sorted(item['id'] for item in host.items)
+
+
+def test_parallel_download_is_identical_to_sequential_download(tmp_path, fake_api):
+    sequential = FmcCache(str(tmp_path / 'sequential'), fake_api)
+    sequential.download()
+    sequential.save()
+    parallel = FmcCache(str(tmp_path / 'parallel'), fake_api, workers=8)
+    parallel.download()
+    parallel.save()
+
+    assert _read_cache_files(tmp_path / 'sequential') == _read_cache_files(tmp_path / 'parallel')
+
+
+def test_refresh_only_downloads_overrides_of_changed_objects(tmp_path, fake_api):
+    cache = ObjectCache(str(tmp_path), fake_api)
+    cache.download()
+    cache.save()
+    host = fake_api.fmc.object.host
+    host.items[0]['metadata']['timestamp'] = 2000
+    host.items[0]['value'] = '198.18.0.1'
+    host.override.calls = 0
+
+    cache.refresh()
+
+    assert host.override.calls == 1
+    assert all('overrides' in obj for obj in cache.cache['host'] if obj['overridable'])
+
+
+def _refreshed_fmc_cache(tmp_path, fake_api):
+    fake_api.fmc.object.host.items[2]['id'] = HOST_ID
+    override = fake_api.fmc.object.host.override
+    override.containers[HOST_ID] = override.containers.pop('host-2')
+    accessrule = fake_api.fmc.policy.accesspolicy.accessrule
+    fake_api.fmc.policy.accesspolicy.items[1]['id'] = POLICY_ID
+    accessrule.containers[POLICY_ID] = accessrule.containers.pop('accesspolicy-1')
+    cache = FmcCache(str(tmp_path), fake_api)
+    cache.download()
+    cache.save()
+    override.calls = accessrule.calls = fake_api.fmc.policy.prefilterpolicy.accessrule.calls = 0
+    return cache
+
+
+def test_refresh_downloads_children_of_items_modified_according_to_audit_log(tmp_path, fake_api):
+    cache = _refreshed_fmc_cache(tmp_path, fake_api)
+    override = fake_api.fmc.object.host.override
+    override.containers[HOST_ID].append({'name': 'HOST_2', 'value': 'HOST_2-override-1'})
+    accessrule = fake_api.fmc.policy.accesspolicy.accessrule
+    accessrule.containers[POLICY_ID].append({'id': 'rule-4', 'name': 'RULE_4'})
+    fake_api.fmc.audit.auditrecord.items = [
+        _audit_record('POST', f'object/hosts/{HOST_ID}/overrides'),
+        _audit_record('POST', f'policy/accesspolicies/{POLICY_ID}/accessrules'),
+    ]
+
+    assert cache.refresh() == 2
+    assert override.calls == 1
+    assert len(cache.get(HOST_ID)['overrides']) == 2
+    assert accessrule.calls == 1
+    assert cache.cache['policies'].rule_count(POLICY_ID) == 5
+    assert cache.cache['policies'].rule_count('accesspolicy-0') == 4
+
+
+def test_refresh_downloads_all_children_if_audit_log_cannot_be_mapped(tmp_path, fake_api):
+    cache = _refreshed_fmc_cache(tmp_path, fake_api)
+    fake_api.fmc.audit.auditrecord.items = [{'message': 'Modified Access Control Policy ACP_0'}]
+
+    assert cache.refresh() == 17
+    assert fake_api.fmc.object.host.override.calls == 3
+    assert fake_api.fmc.policy.accesspolicy.accessrule.calls == 3
+    assert fake_api.fmc.policy.prefilterpolicy.accessrule.calls == 2
+
+
+def test_refresh_without_manifest_downloads_complete_cache(tmp_path, fake_api):
+    cache = PolicyCache(str(tmp_path), fake_api)
+    cache.refresh()
+
+    assert fake_api.fmc.policy.accesspolicy.accessrule.calls == 3
+    assert all('rules' in policy for policy in cache.cache['accesspolicy'])
+
+
+def test_refresh_reuses_rules_of_unchanged_policies(tmp_path, fake_api):
+    cache = PolicyCache(str(tmp_path), fake_api)
+    cache.download()
+    cache.save()
+    accessrule = fake_api.fmc.policy.accesspolicy.accessrule
+    accessrule.calls = 0
+
+    cache.refresh()
+
+    assert accessrule.calls == 0
+    assert all(len(policy['rules']) == 4 for policy in cache.cache['accesspolicy'])
+
+
+def test_index_lookups(tmp_path, fake_api):
+    cache = FmcCache(str(tmp_path), fake_api)
+    cache.download()
+    cache.save()
+
+    cache = FmcCache(str(tmp_path))
+    cache.load()
+
+    assert cache.get('host-1')['name'] == 'HOST_1'
+    assert cache.get('accesspolicy-2-rule-3')['name'] == 'RULE_3'
+    assert cache.get_by_name('accesspolicy', 'ACP_1')['id'] == 'accesspolicy-1'
+    assert cache.get('unknown') is None
+    assert [rule['id'] for rule in cache.children('accesspolicy-0')] == [f'accesspolicy-0-rule-{i}' for i in range(4)]
+
+
+def test_index_is_persisted(tmp_path, fake_api):
+    cache = ObjectCache(str(tmp_path), fake_api)
+    cache.download()
+    cache.save()
+
+    cache = ObjectCache(str(tmp_path))
+    cache.load()
+
+    assert cache.index is not None
+    assert cache.index['id']['network-3'] == ['network', 3]
+
+
+def test_sqlite_backend_roundtrip(tmp_path, fake_api):
+    cache = FmcCache(str(tmp_path), fake_api, backend='sqlite')
+    cache.download()
+    cache.save()
+    expected = {key: item.cache for key, item in cache.cache.items()}
+
+    cache = FmcCache(str(tmp_path), backend='sqlite')
+    cache.load()
+
+    assert {key: item.cache for key, item in cache.cache.items()} == expected
+
+
+def test_sqlite_backend_queries_rows_without_loading_cache(tmp_path, fake_api):
+    cache = FmcCache(str(tmp_path), fake_api, backend='sqlite')
+    cache.download()
+    cache.save()
+
+    cache = FmcCache(str(tmp_path), backend='sqlite')
+
+    assert cache.get('host-0')['overrides'][0]['value'] == 'HOST_0-override'
+    assert cache.get('accesspolicy-1-rule-2')['name'] == 'RULE_2'
+    assert cache.get_by_name('network', 'NETWORK_4')['id'] == 'network-4'
+    assert len(cache.children('prefilterpolicy-1')) == 4
+    assert len(cache.cache['objects'].store.children_by_device('device-0')) == 12
+    assert all(item.cache is None for item in cache.cache.values())
+
+
+def test_load_reads_types_on_first_access(tmp_path, fake_api):
+    cache = ObjectCache(str(tmp_path), fake_api)
+    cache.download()
+    cache.save()
+
+    cache = ObjectCache(str(tmp_path))
+    cache.load()
+
+    assert cache.cache.loaded == []
+    assert cache.get('range-2')['name'] == 'RANGE_2'
+    assert cache.cache.loaded == ['range']
+    assert sorted(cache.cache) == sorted(OBJECT_TYPES)
+
+
+@pytest.mark.parametrize('fmt', available_formats())
+def test_cache_formats_are_detected_on_load(tmp_path, fake_api, fmt):
+    cache = ObjectCache(str(tmp_path), fake_api)
+    cache.download()
+    cache.save()
+    expected = dict(cache.cache)
+    converted = ObjectCache(str(tmp_path), fmt=fmt)
+    converted.cache = expected
+    converted.save()
+
+    cache = ObjectCache(str(tmp_path))
+    cache.load()
+
+    assert dict(cache.cache) == expected
+    assert len(list((tmp_path / 'objects').glob('host.*'))) == 1
+
+
+def test_compact_formats_are_smaller(tmp_path, fake_api):
+    cache = ObjectCache(str(tmp_path), fake_api)
+    cache.download()
+    sizes = {fmt: len(dumps(cache.cache, fmt)) for fmt in ('json', 'compact', 'gzip')}
+
+    assert sizes['gzip'] < sizes['compact'] < sizes['json']
+
+
+def test_atomic_write_keeps_previous_file_on_failure(tmp_path, monkeypatch):
+    path = tmp_path / 'host.json'
+    atomic_write(path, b'[]')
+
+    def fsync(fd):
+        raise OSError('disk full')
+
+    monkeypatch.setattr('os.fsync', fsync)
+    with pytest.raises(OSError):
+        atomic_write(path, b'[{}]')
+    assert path.read_bytes() == b'[]'
+    assert [f.name for f in tmp_path.iterdir()] == ['host.json']
+
+
+def test_save_publishes_new_generation(tmp_path, fake_api):
+    cache = ObjectCache(str(tmp_path), fake_api)
+    assert cache.store.generation() == 0
+    cache.download()
+    cache.save()
+    cache.save()
+
+    assert cache.store.generation() == 2
+    assert not [f for f in (tmp_path / 'objects').iterdir() if f.name.endswith('.tmp')]
+
+
+def test_readers_wait_for_writer_lock(tmp_path, fake_api):
+    cache = ObjectCache(str(tmp_path), fake_api)
+    cache.download()
+    cache.save()
+    reader = JsonStore(cache.directory, root=tmp_path)
+    result = dict()
+
+    with cache.store.lock():
+        thread = threading.Thread(target=lambda: result.update(host=reader.read('host')))
+        thread.start()
+        thread.join(timeout=0.2)
+        assert thread.is_alive()
+    thread.join(timeout=5)
+
+    assert result['host'] == cache.cache['host']
+
+
+def test_lazy_reads_switch_to_newer_generation_consistently(tmp_path, fake_api):
+    cache = FmcCache(str(tmp_path), fake_api)
+    cache.download()
+    cache.save()
+    loaded = FmcCache(str(tmp_path))
+    loaded.load()
+    assert loaded.get_by_name('ftdhapair', 'ftd1')['id'] == 'ftdhapair-1'
+    del fake_api.fmc.object.host.items[2]
+    del fake_api.fmc.policy.accesspolicy.items[0]
+    cache.refresh()
+    cache.save()
+
+    assert loaded.get('host-3')['name'] == 'HOST_3'
+    assert loaded.get('host-4')['name'] == 'HOST_4'
+    assert loaded.get('host-2') is None
+    assert loaded.cache['policies'].get('accesspolicy-2')['rules'][0]['id'] == 'accesspolicy-2-rule-0'
+    assert loaded.cache['policies'].get('accesspolicy-0') is None
+    assert {item.cache.generation for item in loaded.cache.values()} == {2}
+    assert 'ftdhapair' not in loaded.cache['devices'].cache.loaded
+    assert (tmp_path / '.lock').exists()
+    assert not (tmp_path / 'objects' / '.lock').exists()
+
+
+def test_policy_cache_is_sharded_per_policy(tmp_path, fake_api):
+    cache = PolicyCache(str(tmp_path), fake_api)
+    cache.download()
+    cache.save()
+    directory = tmp_path / 'policies'
+
+    assert sorted(f.name for f in (directory / 'accesspolicy').iterdir()) == [
+        f'accesspolicy-{index}.json' for index in range(3)
+    ]
+    assert all('rules' not in policy for policy in json.loads((directory / 'accesspolicy.json').read_text()))
+
+    cache = PolicyCache(str(tmp_path))
+    cache.load()
+    assert [rule['id'] for rule in cache.children('accesspolicy-1')] == [f'accesspolicy-1-rule-{i}' for i in range(4)]
+    assert cache.get('prefilterpolicy-1-rule-2')['name'] == 'RULE_2'
+    assert cache.cache.loaded == []
+    assert [len(policy['rules']) for policy in cache.cache['accesspolicy']] == [4, 4, 4]
+
+
+def test_policy_shards_of_deleted_policies_are_removed(tmp_path, fake_api):
+    cache = PolicyCache(str(tmp_path), fake_api)
+    cache.download()
+    cache.save()
+    fake_api.fmc.policy.accesspolicy.items.pop()
+    cache.download()
+    cache.save()
+
+    assert not (tmp_path / 'policies' / 'accesspolicy' / 'accesspolicy-2.json').exists()
+
+
+def test_cached_reads_respect_max_age(tmp_path, fake_api):
+    cache = FmcCache(str(tmp_path), fake_api)
+    cache.download()
+    cache.cache['policies'].fetched['accesspolicy'] = (datetime.now() - timedelta(seconds=600)).isoformat()
+    cache.save()
+    api = API(cfg={'cache_dir': str(tmp_path), 'cache_max_age': 300})
+
+    assert api.cached_get('host', item_name='HOST_1')['id'] == 'host-1'
+    assert api.cached_get('host', item_name='UNKNOWN') is None
+    assert api.cached_get('accesspolicy', item_name='ACP_1') is None
+
+    api = API(cfg={'cache_dir': str(tmp_path), 'cache_max_age': 900})
+    assert api.cached_get('accesspolicy', item_name='ACP_1')['id'] == 'accesspolicy-1'
+
+    api = API(cfg={'cache_dir': str(tmp_path), 'cache_max_age': 0})
+    assert api.cached('host') is None
+
+
+def test_cached_items_have_the_shape_of_api_items(tmp_path, fake_api, fake_fmc):
+    cache = FmcCache(str(tmp_path), fake_api)
+    cache.download()
+    cache.save()
+    api = API(cfg={'cache_dir': str(tmp_path), 'cache_max_age': 300})
+
+    assert api.cached_get('accesspolicy', item_name='ACP_1') == fake_fmc.policy.accesspolicy.get(name='ACP_1')
+    assert api.cached_get('host', uuid='host-2') == fake_fmc.object.host.get(uuid='host-2')
+    assert api.cached_get('devicerecord', uuid='device-1') == fake_fmc.device.devicerecord.get(uuid='device-1')
+
+
+def test_device_cache_includes_device_configuration(tmp_path, fake_api):
+    cache = FmcCache(str(tmp_path), fake_api, workers=4)
+    cache.download()
+    cache.save()
+
+    cache = FmcCache(str(tmp_path))
+    cache.load()
+    devices = cache.subcache('devicerecord')
+
+    assert isinstance(devices, DeviceCache)
+    assert cache.get_by_name('ftdhapair', 'ftd1')['primary']['id'] == 'device-2'
+    assert devices.device_config('ipv4staticroute', 'device-3')[0]['id'] == 'device-3-route-0'
+    assert devices.device_config('subinterface', 'device-1')[0]['name'] == 'Port-channel1'
+    assert devices.device_config('subinterface', 'unknown') is None
+
+
+def test_cached_device_configuration_is_fresh_after_reload(tmp_path, fake_api):
+    cache = FmcCache(str(tmp_path), fake_api)
+    cache.download()
+    cache.save()
+    api = API(cfg={'cache_dir': str(tmp_path), 'cache_max_age': 300})
+
+    assert set(DEVICE_CONFIG_TYPES) <= set(api.cache.subcache('devicerecord').fetched)
+    assert api.cached_device_config('ipv4staticroute', 'device-3')[0]['id'] == 'device-3-route-0'
+    assert api.cached_device_config('subinterface', 'device-1')[0]['name'] == 'Port-channel1'
+
+
+def test_every_cached_type_has_a_resource(tmp_path, fake_api, fake_fmc):
+    cache = FmcCache(str(tmp_path), fake_api)
+
+    assert cache.resource('host') is fake_fmc.object.host
+    assert cache.resource('accesspolicy') is fake_fmc.policy.accesspolicy
+    assert cache.resource('policyassignment') is fake_fmc.assignment.policyassignment
+    assert cache.resource('subinterface') is fake_fmc.device.devicerecord.subinterface
+    with pytest.raises(TypeError):
+        Cache(str(tmp_path))
+    with pytest.raises(TypeError):
+        Store(tmp_path)
+
+
+def test_assigned_accesspolicies_are_read_from_cache(tmp_path, fake_api):
+    cache = FmcCache(str(tmp_path), fake_api)
+    cache.download()
+    policyassignment = fake_api.fmc.assignment.policyassignment
+    calls = policyassignment.calls
+
+    assignments = report_api.assigned_accesspolicies(fake_api.fmc, cached=lambda name: cache)
+    assert [assignment['id'] for assignment in assignments] == ['accesspolicy-0', 'accesspolicy-1']
+    assignments = report_api.assigned_accesspolicies(fake_api.fmc, {'id': 'accesspolicy-1'}, lambda name: cache)
+    assert assignments[0]['targets'][0]['name'] == 'ftd1'
+    assert policyassignment.calls == calls
+
+
+def test_reports_check_max_age_of_each_cached_type(tmp_path, fake_api):
+    cache = FmcCache(str(tmp_path), fake_api)
+    cache.download()
+    cache.cache['devices'].fetched['policyassignment'] = (datetime.now() - timedelta(seconds=600)).isoformat()
+    cache.save()
+    api = API(cfg={'cache_dir': str(tmp_path), 'cache_max_age': 300})
+    fake_api.fmc.assignment.policyassignment.items[0]['targets'][0]['name'] = 'ftd-renamed'
+    policyassignment = fake_api.fmc.assignment.policyassignment
+    accessrule = fake_api.fmc.policy.accesspolicy.accessrule
+    policyassignment.calls = accessrule.calls = 0
+
+    result = report_api.accessrule_count(fake_api.fmc, cached=api.cached)
+
+    assert [row['device'] for row in result] == ['ftd-renamed', 'ftd1']
+    assert [row['rulecount'] for row in result] == [4, 4]
+    assert policyassignment.calls == 1
+    assert accessrule.calls == 0
+
+
+@pytest.mark.parametrize('fmt', ['json', 'compact', 'gzip', 'zstd', 'msgpack'])
+def test_cache_files_are_streamed_one_item_at_a_time(tmp_path, fmt):
+    if fmt not in available_formats():
+        pytest.skip(f'{fmt} is not installed')
+    items = [
+        {'id': f'rule-{index}', 'name': f'RULE_{index} ä', 'values': list(range(index * 50))} for index in range(40)
+    ]
+    path = tmp_path / 'rules'
+    path.write_bytes(dumps(items, fmt))
+
+    with open(path, 'rb') as f:
+        assert list(iter_items(f)) == items
+    assert list(store._iter_json(io.BytesIO(dumps(items, 'json')), chunk_size=7)) == items
+
+
+@pytest.mark.parametrize('backend', ['json', 'sqlite'])
+def test_policy_rules_are_streamed(tmp_path, fake_api, backend):
+    cache = PolicyCache(str(tmp_path), fake_api, backend=backend)
+    cache.download()
+    cache.save()
+
+    cache = PolicyCache(str(tmp_path), backend=backend)
+    cache.load()
+    rules = cache.iter_rules('accesspolicy-2')
+
+    assert next(rules)['id'] == 'accesspolicy-2-rule-0'
+    assert [rule['id'] for rule in rules] == [f'accesspolicy-2-rule-{index}' for index in range(1, 4)]
+    policies = [policy['id'] for policy in cache.iter_items('prefilterpolicy')]
+    assert policies == ['prefilterpolicy-0', 'prefilterpolicy-1']
+    assert cache.iter_rules('accesspolicy-2-rule-0') is None
+    assert cache.iter_rules('unknown') is None
+
+
+def _child_policy(fake_api):
+    accesspolicy = fake_api.fmc.policy.accesspolicy
+    parent_rules = accesspolicy.accessrule.containers['accesspolicy-0']
+    child = {'id': 'accesspolicy-child', 'name': 'ACP_CHILD'}
+    own_rules = [
+        {'id': f'accesspolicy-child-rule-{index}', 'name': f'CHILD_{index}', 'metadata': {'accessPolicy': child}}
+        for index in range(2)
+    ]
+    accesspolicy.items.append(child)
+    accesspolicy.accessrule.containers[child['id']] = parent_rules[:2] + own_rules + parent_rules[2:]
+    return accesspolicy.accessrule.containers[child['id']]
+
+
+@pytest.mark.parametrize('backend', ['json', 'sqlite'])
+def test_inherited_rules_are_saved_once(tmp_path, fake_api, backend):
+    effective = _child_policy(fake_api)
+    cache = PolicyCache(str(tmp_path), fake_api, backend=backend)
+    cache.download()
+    cache.save()
+
+    cache = PolicyCache(str(tmp_path), backend=backend)
+    cache.load()
+
+    child = cache.get('accesspolicy-child')
+    assert [rule['id'] for rule in child['rules']] == ['accesspolicy-child-rule-0', 'accesspolicy-child-rule-1']
+    assert child['ruleSegments'] == [['accesspolicy-0', 2], ['accesspolicy-child', 2], ['accesspolicy-0', 2]]
+    assert cache.children('accesspolicy-child') == effective
+    assert list(cache.iter_rules('accesspolicy-child')) == effective
+    assert cache.rule_count('accesspolicy-child') == 6
+    assert cache.children('accesspolicy-0') == fake_api.fmc.policy.accesspolicy.accessrule.containers['accesspolicy-0']
+
+
+def test_refresh_downloads_rules_of_policies_inheriting_from_changed_policy(tmp_path, fake_api):
+    effective = _child_policy(fake_api)
+    cache = PolicyCache(str(tmp_path), fake_api)
+    cache.download()
+    cache.save()
+    accesspolicy = fake_api.fmc.policy.accesspolicy
+    accesspolicy.items[0]['description'] = 'changed'
+    parent_rule = {'id': 'accesspolicy-0-rule-4', 'name': 'RULE_4', 'metadata': {'accessPolicy': accesspolicy.items[0]}}
+    accesspolicy.accessrule.containers['accesspolicy-0'].append(parent_rule)
+    effective.append(parent_rule)
+    accesspolicy.accessrule.calls = 0
+
+    cache.refresh()
+    cache.save()
+
+    assert accesspolicy.accessrule.calls == 2
+    assert PolicyCache(str(tmp_path)).children('accesspolicy-child') == effective
+
+
+def test_interrupted_download_is_resumed_from_checkpoint(tmp_path, fake_api, monkeypatch):
+    monkeypatch.setattr(Checkpoint, 'BATCH_SIZE', 1)
+    override = fake_api.fmc.object.host.override
+    get = override.get
+
+    def flaky(container_uuid=None, **kwargs):
+        if container_uuid == 'host-4':
+            raise ConnectionError('token expired')
+        return get(container_uuid=container_uuid, **kwargs)
+
+    override.get = flaky
+    with pytest.raises(ConnectionError):
+        ObjectCache(str(tmp_path), fake_api).download()
+    override.get = get
+    calls = {name: getattr(fake_api.fmc.object, name).calls for name in OBJECT_TYPES}
+
+    cache = ObjectCache(str(tmp_path), fake_api)
+    cache.download(resume=True)
+    cache.save()
+
+    assert override.calls == 3
+    assert {name: getattr(fake_api.fmc.object, name).calls for name in OBJECT_TYPES} == calls
+    assert [obj['overrides'][0]['value'] for obj in cache.cache['host'] if obj['overridable']] == [
+        'HOST_0-override',
+        'HOST_2-override',
+        'HOST_4-override',
+    ]
+    assert not (tmp_path / 'objects' / '.checkpoint').exists()
+
+
+def test_download_without_resume_discards_checkpoint(tmp_path, fake_api):
+    cache = ObjectCache(str(tmp_path), fake_api)
+    cache.checkpoint.begin().save_listing('host', [], datetime.now().isoformat())
+    cache.download()
+
+    assert len(cache.cache['host']) == 5
+
+
+def _audited_fmc_cache(tmp_path, fake_api):
+    fake_api.fmc.object.host.items[1]['id'] = HOST_ID
+    fake_api.fmc.policy.accesspolicy.items[0]['id'] = POLICY_ID
+    fake_api.fmc.policy.accesspolicy.accessrule.containers[POLICY_ID] = [{'id': 'rule-0', 'name': 'RULE_0'}]
+    cache = FmcCache(str(tmp_path), fake_api)
+    cache.download()
+    cache.save()
+    fake_api.fmc.object.host.calls = 0
+    fake_api.fmc.object.host.override.calls = 0
+    fake_api.fmc.policy.accesspolicy.accessrule.calls = 0
+    return FmcCache(str(tmp_path), fake_api)
+
+
+def test_audit_refresh_downloads_modified_items(tmp_path, fake_api):
+    cache = _audited_fmc_cache(tmp_path, fake_api)
+    host = fake_api.fmc.object.host
+    host.items[1]['value'] = '198.18.0.1'
+    fake_api.fmc.policy.accesspolicy.accessrule.containers[POLICY_ID].append({'id': 'rule-1', 'name': 'RULE_1'})
+    fake_api.fmc.audit.auditrecord.items = [
+        _audit_record('PUT', f'object/hosts/{HOST_ID}'),
+        _audit_record('POST', f'policy/accesspolicies/{POLICY_ID}/accessrules'),
+        {'message': 'Login success'},
+    ]
+
+    assert cache.audit_refresh() == 2
+    assert host.calls == 1
+    assert host.override.calls == 0
+    assert fake_api.fmc.policy.accesspolicy.accessrule.calls == 1
+    assert cache.get(HOST_ID)['value'] == '198.18.0.1'
+    assert len(cache.get(POLICY_ID)['rules']) == 2
+    assert all('overrides' in obj for obj in cache.cache['objects'].cache['host'] if obj['overridable'])
+
+
+def test_audit_refresh_removes_deleted_items_and_lists_created_types(tmp_path, fake_api):
+    cache = _audited_fmc_cache(tmp_path, fake_api)
+    host = fake_api.fmc.object.host
+    del host.items[1]
+    host.items.append({'id': 'host-5', 'name': 'HOST_5', 'overridable': True, 'metadata': {'timestamp': 1000}})
+    host.override.containers['host-5'] = [{'value': 'HOST_5-override'}]
+    fake_api.fmc.audit.auditrecord.items = [
+        _audit_record('DELETE', f'object/hosts/{HOST_ID}'),
+        _audit_record('POST', 'object/hosts'),
+    ]
+
+    assert cache.audit_refresh() == 2
+    assert host.override.calls == 1
+    assert cache.get(HOST_ID) is None
+    assert cache.get('host-5')['overrides'] == [{'value': 'HOST_5-override'}]
+    assert all('overrides' in obj for obj in cache.cache['objects'].cache['host'] if obj['overridable'])
+
+
+def test_audit_refresh_falls_back_to_full_refresh(tmp_path, fake_api):
+    cache = _audited_fmc_cache(tmp_path, fake_api)
+    fake_api.fmc.audit.auditrecord.items = [{'message': 'Modified Access Control Policy ACP_0'}]
+
+    cache.audit_refresh()
+
+    assert fake_api.fmc.object.host.calls == 1
+    assert fake_api.fmc.policy.accesspolicy.accessrule.calls == 3
+
+
+def _snapshot_blobs(directory):
+    for path in (directory / 'snapshots' / 'blobs').glob('*/*'):
+        yield path.name, json.loads(path.read_bytes())
+
+
+def test_snapshots_share_unchanged_items(tmp_path, fake_api):
+    cache = FmcCache(str(tmp_path), fake_api, history=2)
+    cache.download()
+    cache.save()
+    blobs = len(list((tmp_path / 'snapshots' / 'blobs').glob('*/*')))
+    expected = {key: item.cache for key, item in cache.cache.items()}
+    fake_api.fmc.object.host.items[1]['value'] = '198.18.0.1'
+    del fake_api.fmc.object.network.items[0]
+    cache.refresh()
+    cache.save()
+
+    assert len(list((tmp_path / 'snapshots' / 'blobs').glob('*/*'))) == blobs + 1
+    assert cache.snapshots.diff(1, 2) == {
+        'host': {'created': [], 'modified': ['host-1'], 'deleted': []},
+        'network': {'created': [], 'modified': [], 'deleted': ['network-0']},
+    }
+    snapshot = FmcCache(str(tmp_path)).load_snapshot(1)
+    assert {key: item.cache for key, item in snapshot.cache.items()} == expected
+    assert snapshot.get('network-0')['name'] == 'NETWORK_0'
+
+
+def test_old_snapshots_are_pruned(tmp_path, fake_api):
+    cache = FmcCache(str(tmp_path), fake_api, history=2)
+    cache.download()
+    for index in range(3):
+        fake_api.fmc.object.host.items[1]['value'] = f'198.18.0.{index}'
+        cache.refresh()
+        cache.save()
+
+    assert [snapshot['generation'] for snapshot in cache.snapshots.snapshots()] == [2, 3]
+    values = [item['value'] for _hash, item in _snapshot_blobs(tmp_path) if item.get('id') == 'host-1']
+    assert sorted(values) == ['198.18.0.1', '198.18.0.2']
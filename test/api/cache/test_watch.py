@@ -0,0 +1,109 @@
+from types import SimpleNamespace
+
+import requests
+
+from firecli.api.cache import FmcCache
+from firecli.api.cache.watch import CacheWatcher
+from firecli.api.session import MemoizingSession, SessionPool
+
+POLICY_ID = '00505683-0000-0ed3-0000-000000000002'
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def test_watcher_refreshes_policies_first(tmp_path, fake_api):
+    clock = FakeClock()
+    watcher = CacheWatcher(FmcCache(str(tmp_path), fake_api), 60, 600, jitter=0, clock=clock, sleep=clock.sleep)
+
+    assert watcher.run_pending() == ['policies', 'objects', 'devices']
+    assert watcher.cache.root.generation() == 1
+    assert watcher.run_pending() == []
+
+
+def test_watcher_refreshes_changing_types_more_often(tmp_path, fake_api):
+    clock = FakeClock()
+    watcher = CacheWatcher(FmcCache(str(tmp_path), fake_api), 60, 600, jitter=0, clock=clock, sleep=clock.sleep)
+    watcher.run(count=1)
+    assert watcher.intervals == {'objects': 60, 'policies': 60, 'devices': 60}
+
+    fake_api.fmc.policy.accesspolicy.items[0]['name'] = 'ACP_RENAMED'
+    watcher.run(count=1)
+
+    assert watcher.intervals == {'objects': 120, 'policies': 60, 'devices': 120}
+    assert clock.now == 60
+    assert watcher.cache.cache['policies'].get_by_name('accesspolicy', 'ACP_RENAMED') is not None
+
+
+def test_watcher_keeps_running_if_refresh_fails(tmp_path, fake_api):
+    clock = FakeClock()
+    watcher = CacheWatcher(FmcCache(str(tmp_path), fake_api), 60, jitter=0, clock=clock, sleep=clock.sleep)
+
+    def fail(*args, **kwargs):
+        raise ConnectionError('fmc unreachable')
+
+    fake_api.fmc.policy.accesspolicy.get = fail
+    watcher.run(count=2)
+
+    assert watcher.cache.root.generation() == 2
+    assert watcher.cache.cache['objects'].load_manifest()
+    assert watcher.cache.cache['policies'].load_manifest() == {}
+
+
+def test_watcher_saves_snapshot_after_refresh_round(tmp_path, fake_api):
+    clock = FakeClock()
+    cache = FmcCache(str(tmp_path), fake_api, history=5)
+    watcher = CacheWatcher(cache, 60, jitter=0, clock=clock, sleep=clock.sleep)
+    watcher.run(count=1)
+
+    snapshots = cache.snapshots.snapshots()
+    assert [snapshot['generation'] for snapshot in snapshots] == [1]
+    assert snapshots[0]['items']['policies'] == 5
+
+    fake_api.fmc.object.host.items[1]['value'] = '198.18.0.1'
+    watcher.run(count=2)
+
+    assert [snapshot['generation'] for snapshot in cache.snapshots.snapshots()] == [1, 2]
+    assert cache.snapshots.diff(1, 2) == {'host': {'created': [], 'modified': ['host-1'], 'deleted': []}}
+
+
+def test_watcher_treats_policies_with_changed_rules_as_changed(tmp_path, fake_api):
+    accesspolicy = fake_api.fmc.policy.accesspolicy
+    accesspolicy.items[0]['id'] = POLICY_ID
+    accesspolicy.accessrule.containers[POLICY_ID] = accesspolicy.accessrule.containers.pop('accesspolicy-0')
+    clock = FakeClock()
+    cache = FmcCache(str(tmp_path), fake_api, history=5)
+    watcher = CacheWatcher(cache, 60, 600, jitter=0, clock=clock, sleep=clock.sleep)
+    watcher.run(count=1)
+
+    accesspolicy.accessrule.containers[POLICY_ID].append({'id': 'rule-4', 'name': 'RULE_4'})
+    fake_api.fmc.audit.auditrecord.items = [
+        {'message': f'POST /api/fmc_config/v1/domain/default/policy/accesspolicies/{POLICY_ID}/accessrules'}
+    ]
+    watcher.run(count=1)
+
+    assert watcher.intervals == {'objects': 120, 'policies': 60, 'devices': 120}
+    assert cache.root.generation() == 2
+    assert [snapshot['generation'] for snapshot in cache.snapshots.snapshots()] == [1, 2]
+    assert cache.cache['policies'].rule_count(POLICY_ID) == 5
+
+
+def test_watcher_discards_memoized_responses_before_each_round(tmp_path, fake_api):
+    clock = FakeClock()
+    session = SessionPool(MemoizingSession)
+    fake_api.fmc.conn = SimpleNamespace(session=session)
+    watcher = CacheWatcher(FmcCache(str(tmp_path), fake_api), 10, jitter=0, clock=clock, sleep=clock.sleep)
+    key = session.key('https://fmc.example.com/api/fmc_config/v1/domain/default/object/hosts', {'expanded': True})
+
+    for _round in range(2):
+        session.memo.put(key, requests.Response())
+        watcher.run(count=1)
+        assert session.memo.responses == {}
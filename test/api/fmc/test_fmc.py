@@ -0,0 +1,76 @@
+import stat
+
+import fireREST.fmc
+
+from firecli.api.fmc import FMC, TOKEN_LIFETIME, TokenStore, namespaces
+from firecli.api.session import ThrottledSession
+
+DOMAINS = [{'name': 'Global', 'uuid': 'e276abec-e0f2-11e3-8169-6d9ed49b625f'}]
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def _token(issued, access_token='access'):
+    return {
+        'access_token': access_token,
+        'refresh_token': 'refresh',
+        'domains': DOMAINS,
+        'refresh_counter': 0,
+        'issued': issued,
+        'version': '7.0.1',
+    }
+
+
+def test_token_store_expires_tokens(tmp_path):
+    clock = FakeClock()
+    store = TokenStore(str(tmp_path), clock=clock)
+    store.save('fmc.example.com', 'firecli', _token(clock.now))
+
+    assert store.load('fmc.example.com', 'firecli')['access_token'] == 'access'
+    assert store.load('fmc.example.com', 'other') is None
+    assert stat.S_IMODE((tmp_path / TokenStore.FILENAME).stat().st_mode) == 0o600
+    clock.now += TOKEN_LIFETIME
+    assert store.load('fmc.example.com', 'firecli') is None
+
+
+def test_saved_token_is_reused_without_login(tmp_path, monkeypatch):
+    def login(conn):
+        raise AssertionError('login must not be called')
+
+    monkeypatch.setattr(fireREST.fmc.Connection, 'login', login)
+    store = TokenStore(str(tmp_path))
+    store.save('127.0.0.1', 'firecli', _token(store.clock()))
+
+    session = ThrottledSession()
+    fmc = FMC('127.0.0.1', 'firecli', 'password', domain='Global', token_store=store, session=session)
+
+    assert fmc.conn.session is session
+    assert fmc.conn.headers['X-auth-access-token'] == 'access'
+    assert fmc.domain == {'id': DOMAINS[0]['uuid'], 'name': 'Global'}
+    assert str(fmc.version) == '7.0.1'
+    assert set(namespaces()) <= set(vars(fmc))
+    assert fmc.object.host.conn is fmc.conn
+
+
+def test_refreshed_token_is_saved(tmp_path, monkeypatch):
+    def refresh(conn):
+        conn.headers['X-auth-access-token'] = 'refreshed'
+        conn.refresh_counter += 1
+
+    monkeypatch.setattr(fireREST.fmc.Connection, 'refresh', refresh)
+    store = TokenStore(str(tmp_path))
+    store.save('127.0.0.1', 'firecli', _token(store.clock() - 600))
+    fmc = FMC('127.0.0.1', 'firecli', 'password', domain='Global', token_store=store)
+
+    fmc.conn.refresh()
+
+    token = store.load('127.0.0.1', 'firecli')
+    assert token['access_token'] == 'refreshed'
+    assert token['refresh_counter'] == 1
+    assert token['issued'] > store.clock() - 600
@@ -0,0 +1,92 @@
+import pytest
+
+from firecli.api.afa import AFA
+from firecli.api.cache.audit import AuditChanges
+from firecli.api.fmc import FMC
+from firecli.api.mock import MockServer, generate
+from firecli.api.override import object_overrides, update_overrides
+from firecli.api.session import RateLimiter, ThrottledSession
+
+
+@pytest.fixture
+def mock():
+    with MockServer(generate(objects=60, rules=40, devices=3, policies=2)) as server:
+        yield server
+
+
+def _fmc(mock, **kwargs):
+    return FMC(mock.hostname, 'firecli', 'password', protocol='http', **kwargs)
+
+
+def test_generated_data_is_reproducible():
+    data = generate(objects=10, rules=6, devices=2, policies=2, seed=1)
+
+    assert data == generate(objects=10, rules=6, devices=2, policies=2, seed=1)
+    assert len(data['fmc']['/object/hosts']) == 2
+    policies = data['fmc']['/policy/accesspolicies']
+    assert sum(len(data['fmc'][f'/policy/accesspolicies/{policy["id"]}/accessrules']) for policy in policies) == 6
+
+
+def test_fmc_client_reads_paged_resources_and_overrides(mock):
+    fmc = _fmc(mock)
+    hosts = fmc.object.host.get(params={'limit': 5})
+    policy = fmc.policy.accesspolicy.get()[0]
+    device = fmc.assignment.policyassignment.get(uuid=policy['id'])['targets'][0]
+
+    assert [host['id'] for host in hosts] == [host['id'] for host in mock.data['fmc']['/object/hosts']]
+    assert str(fmc.version) == '7.0.1'
+    targets = fmc.device.devicerecord.get()
+    by_object = object_overrides(fmc, 'host', hosts, targets=targets * 10)
+    by_target = object_overrides(fmc, 'host', hosts, targets=targets)
+    assert by_object == by_target
+    assert any(by_object.values())
+    hitcounts = fmc.policy.accesspolicy.operational.hitcount.get(container_uuid=policy['id'], device_id=device['id'])
+    assert len(hitcounts) == 20
+
+
+def test_override_updates_are_audited(mock):
+    fmc = _fmc(mock, concurrency=4)
+    host = fmc.object.host.get()[0]
+    target = {key: fmc.device.devicerecord.get()[0][key] for key in ('id', 'name')}
+    data = {
+        'overrides': {'parent': {'id': host['id']}, 'target': {**target, 'type': 'Device'}},
+        'value': '198.18.255.1',
+        'name': host['name'],
+        'id': host['id'],
+    }
+    results = update_overrides(fmc, 'host', [data, {**data, 'id': '00000000-0000-4000-8000-000000000000'}])
+
+    assert [exc is None for _, exc in results] == [True, False]
+    overrides = fmc.object.host.override.get(container_uuid=host['id'])
+    values = [item['value'] for item in overrides if item['overrides']['target']['id'] == target['id']]
+    assert values == ['198.18.255.1']
+    changes = AuditChanges.from_records(fmc.audit.auditrecord.get())
+    assert changes.modified == {'host': {host['id']}}
+
+
+def test_throttled_requests_are_retried_after_retry_after(mock):
+    mock.rate_limit, mock.window_size, mock.retry_after = 3, 0.2, 0.2
+    session = ThrottledSession(RateLimiter(rate=None), retries=5)
+    fmc = _fmc(mock, session=session)
+    for _ in range(3):
+        fmc.device.devicerecord.get()
+
+    assert mock.stats['throttled'] > 0
+    assert session.limiter.stats['throttled'] == mock.stats['throttled']
+
+
+def test_afa_client_authenticates_again_after_session_expired(mock):
+    afa = AFA(mock.hostname, 'firecli', 'password', protocol='http')
+    device = mock.data['fmc']['/devices/devicerecords'][0]['name']
+    risky_rules = afa.get_risky_rules(device)['riskyRules']
+    mock.expire_tokens()
+
+    assert afa.get_risky_rules(device)['riskyRules'] == risky_rules
+    assert risky_rules == mock.data['afa'][device]
+
+
+def test_credentials_are_checked():
+    with MockServer(generate(objects=1, rules=1, devices=1), username='firecli', password='secret') as mock:
+        afa = AFA(mock.hostname, 'firecli', 'wrong', protocol='http')
+        with pytest.raises(KeyError):
+            afa.get_risky_rules('ftd01.example.com')
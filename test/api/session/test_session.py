@@ -0,0 +1,206 @@
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from firecli.api.session import (
+    MemoizingSession,
+    RateLimiter,
+    ResponseMemo,
+    SessionPool,
+    ThrottledSession,
+    resource_path,
+    retry_after,
+)
+
+DOMAIN = 'https://fmc.example.com/api/fmc_config/v1/domain/e276abec-e0f2-11e3-8169-6d9ed49b625f'
+DOMAIN_PATH = '/api/fmc_config/v1/domain/e276abec-e0f2-11e3-8169-6d9ed49b625f'
+HOST_ID = '00505683-0000-0ed3-0000-000000000001'
+POLICY_ID = '00505683-0000-0ed3-0000-000000000002'
+
+
+class FakeAdapter(requests.adapters.BaseAdapter):
+    """Transport adapter that answers every request with the request method and url. The first `throttled`
+    requests are answered with 429
+    """
+
+    def __init__(self, throttled=0):
+        super().__init__()
+        self.requests = []
+        self.throttled = throttled
+
+    def send(self, request, **kwargs):
+        self.requests.append((request.method, request.url))
+        response = requests.Response()
+        response.status_code = 404 if 'missing' in request.url else 200
+        if len(self.requests) <= self.throttled:
+            response.status_code = 429
+            response.headers['Retry-After'] = '5'
+        response._content = json.dumps({'method': request.method, 'url': request.url}).encode()
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def _session(**kwargs):
+    session = MemoizingSession(**kwargs)
+    adapter = FakeAdapter()
+    session.mount('https://', adapter)
+    return session, adapter
+
+
+def test_resource_path_strips_ids():
+    assert resource_path(f'{DOMAIN}/object/hosts/{HOST_ID}') == f'{DOMAIN_PATH}/object/hosts'
+    assert resource_path(f'{DOMAIN}/policy/accesspolicies/{POLICY_ID}/accessrules') == (
+        f'{DOMAIN_PATH}/policy/accesspolicies'
+    )
+    assert resource_path(f'{DOMAIN}/object/hosts?limit=1000') == f'{DOMAIN_PATH}/object/hosts'
+
+
+def test_identical_gets_are_memoized():
+    session, adapter = _session()
+    first = session.get(f'{DOMAIN}/object/hosts', params={'limit': 1000, 'expanded': True})
+    second = session.get(f'{DOMAIN}/object/hosts', params={'expanded': True, 'limit': 1000})
+    session.get(f'{DOMAIN}/object/hosts', params={'limit': 1})
+    session.get(f'{DOMAIN}/object/missing')
+    session.get(f'{DOMAIN}/object/missing')
+
+    assert first.json() == second.json()
+    assert len(adapter.requests) == 4
+    assert session.stats == {'hits': 1, 'misses': 4, 'invalidations': 0}
+
+
+def test_writes_invalidate_responses_of_same_resource():
+    session, adapter = _session()
+    session.get(f'{DOMAIN}/object/hosts')
+    session.get(f'{DOMAIN}/object/hosts/{HOST_ID}/overrides')
+    session.get(f'{DOMAIN}/object/hostscanpackages')
+    session.get(f'{DOMAIN}/object/networks')
+
+    session.put(f'{DOMAIN}/object/hosts/{HOST_ID}', data='{}')
+    for url in ('hosts', f'hosts/{HOST_ID}/overrides', 'hostscanpackages', 'networks'):
+        session.get(f'{DOMAIN}/object/{url}')
+
+    assert len(adapter.requests) == 7
+    assert session.stats['invalidations'] == 2
+
+
+def test_memoized_responses_expire():
+    clock = FakeClock()
+    session, adapter = _session(max_age=60, clock=clock)
+    session.get(f'{DOMAIN}/object/hosts')
+    clock.now = 61
+    session.get(f'{DOMAIN}/object/hosts')
+
+    assert len(adapter.requests) == 2
+
+
+def _limiter(clock, **kwargs):
+    return RateLimiter(clock=clock, sleep=clock.sleep, **kwargs)
+
+
+def test_rate_limiter_spreads_requests_after_burst():
+    clock = FakeClock()
+    limiter = _limiter(clock, rate=120, burst=2)
+    for _ in range(4):
+        limiter.acquire()
+        limiter.release(0.1)
+
+    assert clock.now == 1.0
+    assert limiter.stats['requests'] == 4
+
+
+def test_rate_limiter_adapts_concurrency():
+    clock = FakeClock()
+    limiter = _limiter(clock, concurrency=4, max_concurrency=5, max_latency=2.0)
+    for _ in range(10):
+        limiter.acquire()
+        limiter.release(0.1)
+    assert limiter.limit == 5
+
+    limiter.acquire()
+    limiter.release(3.0)
+    assert limiter.limit == 2.5
+    limiter.acquire()
+    limiter.acquire()
+    limiter.release(0.1, throttled=True, pause=5)
+    limiter.release(0.1, throttled=True, pause=5)
+    assert limiter.limit == 1.25
+    assert limiter.paused_until == clock.now + 5
+
+
+def test_throttled_session_honours_retry_after():
+    clock = FakeClock()
+    session = ThrottledSession(_limiter(clock))
+    adapter = FakeAdapter(throttled=2)
+    session.mount('https://', adapter)
+    response = session.get(f'{DOMAIN}/object/hosts')
+
+    assert response.status_code == 200
+    assert len(adapter.requests) == 3
+    assert clock.now == 10.0
+    assert session.limiter.stats['throttled'] == 2
+
+
+def test_retry_after_http_date():
+    response = requests.Response()
+    response.headers['Retry-After'] = 'Wed, 21 Oct 2015 07:28:00 GMT'
+    assert retry_after(response) == 0.0
+    response.headers['Retry-After'] = 'soon'
+    assert retry_after(response, default=3) == 3
+
+
+def test_session_pool_uses_one_session_per_thread():
+    adapter = FakeAdapter()
+    memo = ResponseMemo()
+
+    def factory():
+        session = MemoizingSession(memo=memo)
+        session.mount('https://', adapter)
+        return session
+
+    def worker(_):
+        barrier.wait()
+        pool.get(f'{DOMAIN}/object/hosts')
+        return pool.session
+
+    pool = SessionPool(factory)
+    barrier = threading.Barrier(4)
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        sessions = list(executor.map(worker, range(4)))
+        list(executor.map(lambda _: pool.get(f'{DOMAIN}/object/hosts'), range(4)))
+
+    assert len(set(map(id, sessions))) == 4
+    assert set(map(id, pool.sessions)) == set(map(id, sessions))
+    assert pool.session not in sessions
+    assert pool.stats['hits'] + pool.stats['misses'] == 8
+    assert len(adapter.requests) == pool.stats['misses']
+    pool.close()
+    assert pool.sessions == []
+
+
+def test_session_pool_closes_sessions_of_finished_threads():
+    pool = SessionPool(ThrottledSession)
+
+    for _round in range(10):
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(lambda _: pool.session, range(32)))
+
+    assert len(pool.sessions) <= 8
+    pool.session
+    assert len(pool.sessions) == 1
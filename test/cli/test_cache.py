@@ -0,0 +1,76 @@
+import shutil
+
+import pytest
+
+from firecli import CFG
+from firecli.api.cache import FmcCache
+from firecli.api.mock import MockServer, generate, self_signed_certificate
+from firecli.cli import main
+
+
+@pytest.fixture(params=['http', 'https'])
+def mock(request, tmp_path):
+    certfile = keyfile = None
+    if request.param == 'https':
+        if shutil.which('openssl') is None:
+            pytest.skip('openssl is not installed')
+        certfile, keyfile = self_signed_certificate(str(tmp_path))
+    data = generate(objects=60, rules=40, devices=3, policies=2)
+    with MockServer(data, certfile=certfile, keyfile=keyfile) as server:
+        yield server
+
+
+def test_cache_init_help_page(cli_runner):
+    result = cli_runner.invoke(main, ['cache', 'init', '--help'], catch_exceptions=False, prog_name='firecli')
+
+    assert result.exit_code == 0
+
+
+def test_cache_refresh_help_page(cli_runner):
+    result = cli_runner.invoke(main, ['cache', 'refresh', '--help'], catch_exceptions=False, prog_name='firecli')
+
+    assert result.exit_code == 0
+
+
+def test_cache_convert_help_page(cli_runner):
+    result = cli_runner.invoke(main, ['cache', 'convert', '--help'], catch_exceptions=False, prog_name='firecli')
+
+    assert result.exit_code == 0
+
+
+def test_cache_watch_help_page(cli_runner):
+    result = cli_runner.invoke(main, ['cache', 'watch', '--help'], catch_exceptions=False, prog_name='firecli')
+
+    assert result.exit_code == 0
+
+
+def test_cache_history_help_page(cli_runner):
+    result = cli_runner.invoke(main, ['cache', 'history', '--help'], catch_exceptions=False, prog_name='firecli')
+
+    assert result.exit_code == 0
+
+
+def test_cache_init_downloads_configuration_of_mock(cli_runner, mock, tmp_path, monkeypatch):
+    fmc = {
+        **CFG['fmc'],
+        'hostname': mock.hostname,
+        'protocol': mock.protocol,
+        'username': 'firecli',
+        'password': 'password',
+        'domain': 'Global',
+        'persist_token': False,
+        'rate_limit': 0,
+    }
+    monkeypatch.setitem(CFG, 'fmc', fmc)
+    monkeypatch.setitem(CFG, 'cache_dir', str(tmp_path / 'cache'))
+    monkeypatch.setitem(CFG, 'dry_run', False)
+
+    result = cli_runner.invoke(main, ['cache', 'init'], catch_exceptions=False, prog_name='firecli')
+
+    assert result.exit_code == 0
+    cache = FmcCache(str(tmp_path / 'cache' / mock.hostname / 'Global'))
+    cache.load()
+    hosts = cache.cache['objects'].cache['host']
+    assert [host['id'] for host in hosts] == [host['id'] for host in mock.data['fmc']['/object/hosts']]
+    policies = mock.data['fmc']['/policy/accesspolicies']
+    assert sum(cache.cache['policies'].rule_count(policy['id']) for policy in policies) == 40